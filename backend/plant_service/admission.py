@@ -0,0 +1,243 @@
+"""
+Upstream Admission Control
+Client-side admission controller for the Plant.id API: a token bucket that keeps the
+request rate within our quota, and an AIMD concurrency limit that backs off when the
+upstream slows down or starts rejecting requests. Requests that cannot be admitted
+right away wait in a queue for a bounded time instead of failing.
+"""
+import asyncio
+import collections
+import logging
+import time
+from typing import Any, Deque, Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+# Constants
+DEFAULT_RATE = 5.0
+DEFAULT_BURST = 10
+DEFAULT_MIN_CONCURRENCY = 1
+DEFAULT_MAX_CONCURRENCY = 20
+DEFAULT_TARGET_LATENCY = 10.0
+DEFAULT_MAX_QUEUE_WAIT = 10.0
+DECREASE_FACTOR = 0.7
+# Minimum seconds between two decreases, so one burst of failures counts once
+DECREASE_COOLDOWN = 1.0
+# Status passed to release() for a request the caller cancelled before it completed
+CANCELLED = -1
+
+
+class AdmissionRejected(Exception):
+    """Raised when a request could not be admitted within the maximum queue wait"""
+
+
+class TokenBucket:
+    """Token bucket rate limiter"""
+
+    def __init__(self, rate: float, burst: int):
+        """
+        Args:
+            rate: Tokens added per second
+            burst: Maximum number of tokens in the bucket
+        """
+        self.rate = rate
+        self.burst = burst
+        self.tokens = float(burst)
+        self.updated = time.monotonic()
+
+    def _refill(self) -> None:
+        now = time.monotonic()
+        self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def delay(self) -> float:
+        """Seconds until a token would be available to a new reservation"""
+        self._refill()
+        return max(0.0, (1 - self.tokens) / self.rate)
+
+    def reserve(self) -> float:
+        """
+        Take a token, going into debt if necessary
+
+        Returns:
+            Seconds the caller must wait before using the token
+        """
+        delay = self.delay()
+        self.tokens -= 1
+        return delay
+
+    def refund(self) -> None:
+        """Return a reserved token that was not used"""
+        self.tokens = min(self.burst, self.tokens + 1)
+
+    def drain(self) -> None:
+        """Empty the bucket, e.g. after the upstream reported we are over quota"""
+        self._refill()
+        self.tokens = min(self.tokens, 0.0)
+
+
+class AdmissionController:
+    """Token bucket plus AIMD concurrency limit in front of upstream requests"""
+
+    def __init__(
+        self,
+        rate: float = DEFAULT_RATE,
+        burst: int = DEFAULT_BURST,
+        min_concurrency: int = DEFAULT_MIN_CONCURRENCY,
+        max_concurrency: int = DEFAULT_MAX_CONCURRENCY,
+        target_latency: float = DEFAULT_TARGET_LATENCY,
+        max_queue_wait: float = DEFAULT_MAX_QUEUE_WAIT
+    ):
+        """
+        Initialize the admission controller
+
+        Args:
+            rate: Sustained upstream requests per second (0 disables rate limiting)
+            burst: Number of requests allowed in a burst above the sustained rate
+            min_concurrency: Lower bound of the adaptive concurrency limit
+            max_concurrency: Upper bound (and starting value) of the concurrency limit
+            target_latency: Upstream latency in seconds above which the limit is reduced
+            max_queue_wait: Maximum seconds a request waits to be admitted
+        """
+        self.bucket = TokenBucket(rate, burst) if rate > 0 else None
+        self.min_concurrency = min_concurrency
+        self.max_concurrency = max_concurrency
+        self.target_latency = target_latency
+        self.max_queue_wait = max_queue_wait
+        self.limit = float(max_concurrency)
+        self.in_flight = 0
+        self.queued = 0
+        self._last_decrease = 0.0
+        self._waiters: Deque["asyncio.Future[None]"] = collections.deque()
+
+        self.admitted = 0
+        self.rejected = 0
+        self.throttled = 0
+        self.failures = 0
+        self.total_wait = 0.0
+        self.max_wait = 0.0
+
+    async def acquire(self) -> None:
+        """
+        Wait until a request may be sent upstream
+
+        Raises:
+            AdmissionRejected: If the request could not be admitted in time
+        """
+        started = time.monotonic()
+        reserved = False
+        self.queued += 1
+        try:
+            if self.bucket is not None:
+                delay = self.bucket.delay()
+                if delay > self.max_queue_wait:
+                    raise AdmissionRejected(f"Upstream rate limit exceeded (retry in {delay:.1f}s)")
+                delay = self.bucket.reserve()
+                reserved = True
+                if delay > 0:
+                    await asyncio.sleep(delay)
+
+            remaining = self.max_queue_wait - (time.monotonic() - started)
+            try:
+                await asyncio.wait_for(self._acquire_slot(), timeout=max(remaining, 0.001))
+            except asyncio.TimeoutError:
+                raise AdmissionRejected("Upstream concurrency limit reached")
+        except AdmissionRejected:
+            self.rejected += 1
+            if reserved:
+                # Nothing was sent with the token, so it goes back to the rate budget
+                self.bucket.refund()
+            raise
+        except asyncio.CancelledError:
+            if reserved:
+                self.bucket.refund()
+            raise
+        finally:
+            self.queued -= 1
+
+        waited = time.monotonic() - started
+        self.admitted += 1
+        self.total_wait += waited
+        self.max_wait = max(self.max_wait, waited)
+
+    def release(self, latency: float, status_code: Optional[int]) -> None:
+        """
+        Release a slot and adapt the concurrency limit
+
+        Args:
+            latency: Upstream request time in seconds
+            status_code: Upstream HTTP status, None if the request failed, or
+                CANCELLED if it was abandoned (the limit is left unchanged)
+        """
+        if status_code == CANCELLED:
+            # Says nothing about the upstream's health; just free the slot
+            pass
+        elif status_code == 429:
+            # Over quota: back off and stop handing out tokens for a while
+            self.throttled += 1
+            self._decrease()
+            if self.bucket is not None:
+                self.bucket.drain()
+        elif status_code is None or status_code >= 500:
+            self.failures += 1
+            self._decrease()
+        elif latency > self.target_latency:
+            self._decrease()
+        else:
+            # Additive increase: roughly one more slot per limit's worth of successes
+            self.limit = min(self.max_concurrency, self.limit + 1 / self.limit)
+
+        self.in_flight -= 1
+        self._wake()
+
+    def stats(self) -> Dict[str, Any]:
+        """Return queue and concurrency counters"""
+        return {
+            "queue_depth": self.queued,
+            "in_flight": self.in_flight,
+            "concurrency_limit": round(self.limit, 2),
+            "admitted": self.admitted,
+            "rejected": self.rejected,
+            "throttled": self.throttled,
+            "failures": self.failures,
+            "avg_wait_ms": round(self.total_wait / self.admitted * 1000, 1) if self.admitted else 0.0,
+            "max_wait_ms": round(self.max_wait * 1000, 1),
+        }
+
+    def _decrease(self) -> None:
+        """Multiplicative decrease of the concurrency limit"""
+        now = time.monotonic()
+        if now - self._last_decrease < DECREASE_COOLDOWN:
+            return
+        self._last_decrease = now
+        limit = max(self.min_concurrency, self.limit * DECREASE_FACTOR)
+        if int(limit) < int(self.limit):
+            logger.warning(f"Reducing upstream concurrency limit to {int(limit)}")
+        self.limit = limit
+
+    async def _acquire_slot(self) -> None:
+        """Take a concurrency slot, queueing in FIFO order if none is free"""
+        if not self._waiters and self.in_flight < int(self.limit):
+            self.in_flight += 1
+            return
+
+        waiter = asyncio.get_running_loop().create_future()
+        self._waiters.append(waiter)
+        try:
+            await waiter
+        except asyncio.CancelledError:
+            if waiter.done() and not waiter.cancelled():
+                # The slot was handed over just as we gave up; pass it on
+                self.in_flight -= 1
+                self._wake()
+            elif waiter in self._waiters:
+                self._waiters.remove(waiter)
+            raise
+
+    def _wake(self) -> None:
+        """Hand free slots to queued requests"""
+        while self._waiters and self.in_flight < int(self.limit):
+            waiter = self._waiters.popleft()
+            if not waiter.done():
+                self.in_flight += 1
+                waiter.set_result(None)
@@ -0,0 +1,261 @@
+"""
+Plant Service Load Test
+Drives /identify and /plant/{plant_id} at fixed concurrency levels and reports
+throughput, latency percentiles and the service's peak RSS.
+
+By default the fake Plant.id API and the plant service are started as subprocesses on
+local ports, so the benchmark needs no API key or network access:
+
+    python benchmarks/load_test.py --concurrency 1 8 32 --requests 500 --output results.json
+    python benchmarks/load_test.py --compare results.json
+
+Use --service-url to benchmark an already running service instead.
+"""
+import argparse
+import asyncio
+import json
+import os
+import platform
+import random
+import socket
+import subprocess
+import sys
+import time
+from typing import Any, Dict, List, Optional
+
+import httpx
+
+SERVICE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def free_port() -> int:
+    """Return a free local TCP port"""
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def process_tree(pid: int) -> List[int]:
+    """Return a process and all of its descendants (Linux only)"""
+    pids = [pid]
+    index = 0
+    while index < len(pids):
+        task_dir = f"/proc/{pids[index]}/task"
+        index += 1
+        try:
+            for task in os.listdir(task_dir):
+                with open(f"{task_dir}/{task}/children") as f:
+                    pids.extend(int(child) for child in f.read().split())
+        except OSError:
+            continue
+    return pids
+
+
+def peak_rss_mb(pid: int) -> Optional[float]:
+    """Sum of the peak resident set size (VmHWM) of a process tree, in MB"""
+    total_kb = 0
+    for process in process_tree(pid):
+        try:
+            with open(f"/proc/{process}/status") as f:
+                for line in f:
+                    if line.startswith("VmHWM:"):
+                        total_kb += int(line.split()[1])
+        except OSError:
+            continue
+    return round(total_kb / 1024, 1) if total_kb else None
+
+
+async def wait_until_ready(url: str, timeout: float = 30.0) -> None:
+    """Poll a URL until it answers"""
+    deadline = time.monotonic() + timeout
+    async with httpx.AsyncClient() as client:
+        while True:
+            try:
+                await client.get(url)
+                return
+            except httpx.HTTPError:
+                if time.monotonic() > deadline:
+                    raise RuntimeError(f"{url} did not start within {timeout}s")
+                await asyncio.sleep(0.1)
+
+
+def start_process(args: List[str], env: Dict[str, str]) -> subprocess.Popen:
+    """Start a subprocess in the service directory"""
+    return subprocess.Popen(
+        args,
+        cwd=SERVICE_DIR,
+        env={**os.environ, **env},
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL,
+    )
+
+
+def percentile(ordered: List[float], value: float) -> float:
+    """Percentile of an already sorted list"""
+    index = min(len(ordered) - 1, int(len(ordered) * value / 100))
+    return ordered[index]
+
+
+async def run_level(
+    client: httpx.AsyncClient,
+    endpoint: str,
+    concurrency: int,
+    requests: int,
+    image_size: int,
+    plant_ids: int
+) -> Dict[str, Any]:
+    """Send a fixed number of requests with a fixed number of concurrent clients"""
+    latencies: List[float] = []
+    errors = 0
+    remaining = requests
+
+    async def send() -> httpx.Response:
+        if endpoint == "identify":
+            # Random bytes so every request misses the caches
+            image = os.urandom(image_size)
+            return await client.post("/identify", files={"file": ("plant.jpg", image, "image/jpeg")})
+        return await client.get(f"/plant/plant-{random.randrange(plant_ids)}")
+
+    async def worker():
+        nonlocal remaining, errors
+        while remaining > 0:
+            remaining -= 1
+            started = time.perf_counter()
+            try:
+                response = await send()
+                if response.status_code != 200:
+                    errors += 1
+            except httpx.HTTPError:
+                errors += 1
+            latencies.append(time.perf_counter() - started)
+
+    started = time.perf_counter()
+    await asyncio.gather(*[worker() for _ in range(concurrency)])
+    elapsed = time.perf_counter() - started
+
+    latencies.sort()
+    return {
+        "endpoint": endpoint,
+        "concurrency": concurrency,
+        "requests": len(latencies),
+        "errors": errors,
+        "rps": round(len(latencies) / elapsed, 1),
+        "p50_ms": round(percentile(latencies, 50) * 1000, 1),
+        "p95_ms": round(percentile(latencies, 95) * 1000, 1),
+        "p99_ms": round(percentile(latencies, 99) * 1000, 1),
+    }
+
+
+async def run_benchmark(args: argparse.Namespace) -> Dict[str, Any]:
+    """Start the processes (unless a service URL was given) and run every level"""
+    processes: List[subprocess.Popen] = []
+    service_pid = args.service_pid
+    service_url = args.service_url
+    try:
+        if service_url is None:
+            fake_port = free_port()
+            processes.append(start_process(
+                [sys.executable, "-m", "uvicorn", "fake_plant_id:app", "--port", str(fake_port)],
+                {"FAKE_PLANT_ID_LATENCY_MS": str(args.upstream_latency_ms)},
+            ))
+            await wait_until_ready(f"http://127.0.0.1:{fake_port}/_stats")
+
+            service_port = free_port()
+            service = start_process(
+                [sys.executable, "-m", "uvicorn", "main:app", "--port", str(service_port)],
+                {
+                    "PLANT_ID_API_KEY": "benchmark",
+                    "PLANT_ID_API_BASE_URL": f"http://127.0.0.1:{fake_port}",
+                    "PLANT_ID_RATE_LIMIT": "0",
+                    "PLANT_ID_MAX_CONCURRENCY": "1000",
+                    # Start cold every run instead of reading the last run's data/plant_details.db
+                    "PLANT_STORE_PATH": ":memory:",
+                },
+            )
+            processes.append(service)
+            service_pid = service.pid
+            service_url = f"http://127.0.0.1:{service_port}"
+            await wait_until_ready(service_url)
+
+        results = []
+        limits = httpx.Limits(max_connections=max(args.concurrency))
+        async with httpx.AsyncClient(base_url=service_url, timeout=60, limits=limits) as client:
+            for endpoint in args.endpoints:
+                for concurrency in args.concurrency:
+                    result = await run_level(
+                        client, endpoint, concurrency, args.requests, args.image_size, args.plant_ids
+                    )
+                    result["peak_rss_mb"] = peak_rss_mb(service_pid) if service_pid else None
+                    print(format_result(result))
+                    results.append(result)
+    finally:
+        for process in processes:
+            process.terminate()
+            process.wait()
+
+    return {
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "python": platform.python_version(),
+        "settings": {
+            "requests": args.requests,
+            "image_size": args.image_size,
+            "plant_ids": args.plant_ids,
+            "upstream_latency_ms": args.upstream_latency_ms,
+        },
+        "results": results,
+    }
+
+
+def format_result(result: Dict[str, Any]) -> str:
+    """One-line summary of a benchmark level"""
+    return (
+        f"{result['endpoint']:>8} c={result['concurrency']:<4} "
+        f"rps={result['rps']:<8} p50={result['p50_ms']:<7}ms p95={result['p95_ms']:<7}ms "
+        f"p99={result['p99_ms']:<7}ms errors={result['errors']:<4} "
+        f"peak_rss={result['peak_rss_mb']}MB"
+    )
+
+
+def compare(current: Dict[str, Any], baseline: Dict[str, Any]) -> None:
+    """Print the change of each metric against a baseline run"""
+    previous = {(r["endpoint"], r["concurrency"]): r for r in baseline["results"]}
+    print("\nChange against baseline:")
+    for result in current["results"]:
+        old = previous.get((result["endpoint"], result["concurrency"]))
+        if old is None:
+            continue
+        changes = []
+        for metric in ("rps", "p50_ms", "p95_ms", "p99_ms", "peak_rss_mb"):
+            if old.get(metric) and result.get(metric) is not None:
+                changes.append(f"{metric} {(result[metric] - old[metric]) / old[metric]:+.1%}")
+        print(f"{result['endpoint']:>8} c={result['concurrency']:<4} " + "  ".join(changes))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--endpoints", nargs="+", default=["identify", "plant"], choices=["identify", "plant"])
+    parser.add_argument("--concurrency", nargs="+", type=int, default=[1, 8, 32, 64])
+    parser.add_argument("--requests", type=int, default=500, help="Requests per concurrency level")
+    parser.add_argument("--image-size", type=int, default=500_000, help="Upload size in bytes")
+    parser.add_argument("--plant-ids", type=int, default=100, help="Number of distinct plant IDs requested")
+    parser.add_argument("--upstream-latency-ms", type=float, default=50, help="Latency of the fake Plant.id API")
+    parser.add_argument("--service-url", help="Benchmark a running service instead of starting one")
+    parser.add_argument("--service-pid", type=int, help="PID of the running service, for peak RSS")
+    parser.add_argument("--output", help="Write results to this JSON file")
+    parser.add_argument("--compare", help="Compare against a previous JSON results file")
+    args = parser.parse_args()
+
+    report = asyncio.run(run_benchmark(args))
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+        print(f"\nResults written to {args.output}")
+
+    if args.compare:
+        with open(args.compare) as f:
+            compare(report, json.load(f))
+
+
+if __name__ == "__main__":
+    main()
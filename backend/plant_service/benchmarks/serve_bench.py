@@ -0,0 +1,151 @@
+"""
+Server Mode Benchmark
+Compares the single-process `uvicorn main:app` mode with the production server
+(serve.py: several workers, uvloop and httptools) on startup time, throughput and
+peak RSS, against the fake Plant.id API.
+
+    python benchmarks/serve_bench.py --workers 4 --concurrency 8 64 --requests 2000
+
+Startup time is measured from process start until the service answers `GET /`.
+"""
+import argparse
+import asyncio
+import os
+import statistics
+import subprocess
+import sys
+import time
+from typing import Any, Dict, List
+
+import httpx
+
+from load_test import free_port, peak_rss_mb, run_level, start_process, wait_until_ready
+
+MODES = ("single", "production")
+
+
+def service_command(mode: str, port: int) -> List[str]:
+    """Command line starting the service in a mode"""
+    if mode == "single":
+        return [sys.executable, "-m", "uvicorn", "main:app", "--port", str(port)]
+    return [sys.executable, "serve.py"]
+
+
+async def measure_startup(command: List[str], env: Dict[str, str], url: str) -> float:
+    """Seconds from starting the process until it answers, then stop it"""
+    started = time.perf_counter()
+    process = start_process(command, env)
+    try:
+        async with httpx.AsyncClient() as client:
+            while True:
+                try:
+                    await client.get(url)
+                    return time.perf_counter() - started
+                except httpx.HTTPError:
+                    if process.poll() is not None:
+                        raise RuntimeError(f"{' '.join(command)} exited with {process.returncode}")
+                    await asyncio.sleep(0.01)
+    finally:
+        process.terminate()
+        process.wait()
+
+
+async def run_mode(mode: str, fake_url: str, args: argparse.Namespace) -> List[Dict[str, Any]]:
+    """Measure startup and throughput of one server mode"""
+    port = free_port()
+    env = {
+        "PLANT_ID_API_KEY": "benchmark",
+        "PLANT_ID_API_BASE_URL": fake_url,
+        "PLANT_ID_RATE_LIMIT": "0",
+        "PLANT_ID_MAX_CONCURRENCY": "1000",
+        # Start cold every run instead of reading the last run's data/plant_details.db
+        "PLANT_STORE_PATH": ":memory:",
+        "HOST": "127.0.0.1",
+        "PORT": str(port),
+        "LOG_LEVEL": "warning",
+    }
+    if mode == "production":
+        env["SERVER_WORKERS"] = str(args.workers)
+    command = service_command(mode, port)
+    url = f"http://127.0.0.1:{port}"
+
+    startups = [await measure_startup(command, env, url) for _ in range(args.startup_runs)]
+    startup = statistics.median(startups)
+    print(f"{mode:>10} startup={startup * 1000:.0f}ms")
+
+    results = []
+    service = start_process(command, env)
+    try:
+        await wait_until_ready(url)
+        limits = httpx.Limits(max_connections=max(args.concurrency))
+        async with httpx.AsyncClient(base_url=url, timeout=60, limits=limits) as client:
+            for endpoint in args.endpoints:
+                for concurrency in args.concurrency:
+                    result = await run_level(
+                        client, endpoint, concurrency, args.requests, args.image_size, args.plant_ids
+                    )
+                    result.update(
+                        mode=mode,
+                        startup_ms=round(startup * 1000),
+                        peak_rss_mb=peak_rss_mb(service.pid),
+                    )
+                    print(
+                        f"{mode:>10} {endpoint:>8} c={concurrency:<4} rps={result['rps']:<8} "
+                        f"p50={result['p50_ms']}ms p99={result['p99_ms']}ms "
+                        f"errors={result['errors']} peak_rss={result['peak_rss_mb']}MB"
+                    )
+                    results.append(result)
+    finally:
+        service.terminate()
+        service.wait()
+    return results
+
+
+async def run_benchmark(args: argparse.Namespace) -> List[Dict[str, Any]]:
+    """Start the fake Plant.id API and benchmark every mode against it"""
+    fake_port = free_port()
+    fake: subprocess.Popen = start_process(
+        [sys.executable, "-m", "uvicorn", "fake_plant_id:app", "--port", str(fake_port)],
+        {"FAKE_PLANT_ID_LATENCY_MS": str(args.upstream_latency_ms)},
+    )
+    try:
+        fake_url = f"http://127.0.0.1:{fake_port}"
+        await wait_until_ready(f"{fake_url}/_stats")
+        results = []
+        for mode in args.modes:
+            results.extend(await run_mode(mode, fake_url, args))
+        return results
+    finally:
+        fake.terminate()
+        fake.wait()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--modes", nargs="+", default=list(MODES), choices=MODES)
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1, help="Workers in production mode")
+    parser.add_argument("--endpoints", nargs="+", default=["plant", "identify"], choices=["identify", "plant"])
+    parser.add_argument("--concurrency", nargs="+", type=int, default=[8, 64])
+    parser.add_argument("--requests", type=int, default=2000, help="Requests per concurrency level")
+    parser.add_argument("--image-size", type=int, default=100_000, help="Upload size in bytes")
+    parser.add_argument("--plant-ids", type=int, default=100, help="Number of distinct plant IDs requested")
+    parser.add_argument("--upstream-latency-ms", type=float, default=20, help="Latency of the fake Plant.id API")
+    parser.add_argument("--startup-runs", type=int, default=3, help="Startups measured per mode")
+    args = parser.parse_args()
+
+    results = asyncio.run(run_benchmark(args))
+
+    by_mode = {mode: {(r["endpoint"], r["concurrency"]): r for r in results if r["mode"] == mode} for mode in MODES}
+    if all(by_mode.values()):
+        print("\nProduction against single-process:")
+        for key, single in by_mode["single"].items():
+            production = by_mode["production"].get(key)
+            if production:
+                print(
+                    f"{key[0]:>8} c={key[1]:<4} rps {(production['rps'] - single['rps']) / single['rps']:+.1%}  "
+                    f"p99 {(production['p99_ms'] - single['p99_ms']) / single['p99_ms']:+.1%}"
+                )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,179 @@
+"""
+Response Transform Micro-Benchmark
+Compares the CPU time per /identify response of the original path (json decode,
+per-field transform helpers, pydantic validation and serialization) with the
+service's path (orjson decode, one-pass transform, orjson serialization without
+re-validation).
+
+Usage:
+    python benchmarks/transform_bench.py [--suggestions 10] [--similar-images 20]
+"""
+import argparse
+import json
+import os
+import sys
+import timeit
+from typing import Any, Dict, Optional
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault("PLANT_ID_API_KEY", "benchmark")
+
+import orjson  # noqa: E402
+
+from main import IdentificationResponse  # noqa: E402
+from plant_id_client import PlantIdClient  # noqa: E402
+
+
+def make_response(suggestions: int, similar_images: int, description_bytes: int) -> bytes:
+    """Build a raw Plant.id identification response"""
+    description = ("A fictional plant. " * (description_bytes // 19 + 1))[:description_bytes]
+    return json.dumps({
+        "id": 123456,
+        "is_plant": True,
+        "suggestions": [
+            {
+                "id": index,
+                "name": f"Plantae fictus {index}",
+                "probability": 0.9 / (index + 1),
+                "plant_details": {
+                    "common_names": [f"Fake plant {index}", "Other name"],
+                    "url": f"https://example.com/plants/{index}",
+                    "wiki_description": {"value": description},
+                    "taxonomy": {"family": "Fictaceae", "genus": "Plantae"},
+                    "synonyms": [f"Synonym {n}" for n in range(5)],
+                    "watering": {"text": "Water weekly"},
+                    "sunlight": ["full sun", "part shade"],
+                    "soil": {"text": "Well-drained"},
+                    "propagation": ["cuttings"],
+                    "pruning": {"text": "Prune in spring"},
+                },
+                "similar_images": [
+                    {
+                        "id": f"{index}-{image}",
+                        "url": f"https://example.com/images/{index}-{image}.jpg",
+                        "url_small": f"https://example.com/images/{index}-{image}-small.jpg",
+                        "similarity": 0.5,
+                        "citation": "Example",
+                        "license_name": "CC BY-SA 4.0",
+                    }
+                    for image in range(similar_images)
+                ],
+                "health_assessment": {
+                    "is_healthy": False,
+                    "diseases": [
+                        {"name": "leaf spot", "probability": 0.4, "treatment": {"overview": "Remove leaves"}}
+                    ],
+                },
+            }
+            for index in range(suggestions)
+        ],
+    }).encode("utf-8")
+
+
+# The original transform, kept here as the baseline
+
+
+def _legacy_extract_care_info(plant_details: Dict[str, Any], care_type: str) -> Optional[str]:
+    if care_type in plant_details:
+        care_info = plant_details[care_type]
+        if isinstance(care_info, dict) and "text" in care_info:
+            return care_info["text"]
+        return str(care_info)
+    return None
+
+
+def _legacy_get_common_name(plant_data: Dict[str, Any]) -> str:
+    common_names = plant_data.get("common_names", [])
+    if common_names and len(common_names) > 0:
+        return common_names[0]
+    plant_details = plant_data.get("plant_details", {})
+    if "common_names" in plant_details and plant_details["common_names"]:
+        return plant_details["common_names"][0]
+    return plant_data.get("name", "")
+
+
+def _legacy_get_image_url(plant_data: Dict[str, Any]) -> Optional[str]:
+    similar_images = plant_data.get("similar_images", [])
+    if similar_images and len(similar_images) > 0:
+        return similar_images[0].get("url")
+    return None
+
+
+def legacy_transform(result: Dict[str, Any]) -> Dict[str, Any]:
+    transformed_suggestions = []
+    for suggestion in result.get("suggestions", []):
+        plant_details = suggestion.get("plant_details", {})
+        care_info = {
+            care_type: _legacy_extract_care_info(plant_details, care_type)
+            for care_type in ("watering", "sunlight", "soil", "propagation", "pruning")
+        }
+        health_assessment = None
+        if "health_assessment" in suggestion:
+            health = suggestion["health_assessment"]
+            diseases = health.get("diseases", [])
+            if diseases:
+                top_disease = diseases[0]
+                health_assessment = {
+                    "is_healthy": health.get("is_healthy", True),
+                    "disease_name": top_disease.get("name"),
+                    "probability": top_disease.get("probability"),
+                    "treatment": top_disease.get("treatment", {}).get("overview")
+                }
+            else:
+                health_assessment = {"is_healthy": health.get("is_healthy", True)}
+        transformed_suggestions.append({
+            "id": suggestion.get("id", ""),
+            "scientific_name": suggestion.get("name", ""),
+            "common_name": _legacy_get_common_name(suggestion),
+            "family": plant_details.get("taxonomy", {}).get("family"),
+            "probability": suggestion.get("probability", 0.0),
+            "description": plant_details.get("wiki_description", {}).get("value"),
+            "care_info": care_info,
+            "health_assessment": health_assessment,
+            "image_url": _legacy_get_image_url(suggestion)
+        })
+    return {
+        "results": transformed_suggestions,
+        "is_plant": result.get("is_plant", True),
+        "submission_id": result.get("id", "")
+    }
+
+
+def legacy_path(raw: bytes) -> bytes:
+    """json decode, transform, validate through the response model, serialize"""
+    result = legacy_transform(json.loads(raw))
+    return IdentificationResponse(**result).json().encode("utf-8")
+
+
+def current_path(raw: bytes, client: PlantIdClient) -> bytes:
+    """orjson decode, one-pass transform, serialize without validation"""
+    return orjson.dumps(client._transform_identification_result(orjson.loads(raw)))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--suggestions", type=int, default=10)
+    parser.add_argument("--similar-images", type=int, default=20)
+    parser.add_argument("--description-bytes", type=int, default=2000)
+    parser.add_argument("--number", type=int, default=2000, help="Iterations per path")
+    args = parser.parse_args()
+
+    raw = make_response(args.suggestions, args.similar_images, args.description_bytes)
+    client = PlantIdClient(api_key="benchmark")
+
+    # Both paths must produce the same response
+    legacy = json.loads(legacy_path(raw))
+    current = json.loads(current_path(raw, client))
+    assert legacy == current, "transform output differs from the response model"
+
+    print(f"Upstream response: {len(raw) / 1024:.1f} KB, {args.suggestions} suggestions")
+    timings = {}
+    for name, run in (("legacy", lambda: legacy_path(raw)), ("current", lambda: current_path(raw, client))):
+        best = min(timeit.repeat(run, number=args.number, repeat=5)) / args.number
+        timings[name] = best
+        print(f"{name:>8}: {best * 1e6:8.1f} us/response")
+    print(f"speedup: {timings['legacy'] / timings['current']:.1f}x")
+
+
+if __name__ == "__main__":
+    main()
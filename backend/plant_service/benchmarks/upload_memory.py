@@ -0,0 +1,87 @@
+"""
+Upload Encoding Memory Benchmark
+Compares peak memory per /identify request of the original read/b64encode/json path
+with the streaming encode path used by the service.
+
+Usage:
+    python benchmarks/upload_memory.py [size_mb ...]
+"""
+import asyncio
+import base64
+import json
+import os
+import sys
+import tempfile
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from image_encoding import encode_upload, upload_digest  # noqa: E402
+from plant_id_client import ImageJsonBody  # noqa: E402
+
+PAYLOAD = {
+    "modifiers": ["similar_images"],
+    "plant_details": ["common_names", "url", "wiki_description", "taxonomy", "synonyms"],
+    "health": "all",
+}
+
+
+def make_upload(size: int) -> tempfile.SpooledTemporaryFile:
+    """Create a spooled upload like the one starlette hands to the endpoint"""
+    upload = tempfile.SpooledTemporaryFile(max_size=1024 * 1024)
+    upload.write(os.urandom(size))
+    upload.seek(0)
+    return upload
+
+
+def original_path(upload) -> int:
+    """read() + b64encode().decode() + json serialization of the payload"""
+    image_data = upload.read()
+    encoded_image = base64.b64encode(image_data).decode("ascii")
+    body = json.dumps(
+        {"images": [encoded_image], **PAYLOAD}, separators=(",", ":")
+    ).encode("utf-8")
+    return len(body)
+
+
+def streaming_path(upload) -> int:
+    """Chunked digest + pre-sized base64 buffer + chunked JSON body"""
+    upload_digest(upload)
+    encoded_image = encode_upload(upload)
+    body = ImageJsonBody([encoded_image], PAYLOAD)
+
+    async def drain() -> int:
+        return sum([len(chunk) async for chunk in body])
+
+    return asyncio.run(drain())
+
+
+def measure(fn, size: int):
+    """Return (body length, peak traced bytes) for one request"""
+    upload = make_upload(size)
+    tracemalloc.start()
+    try:
+        length = fn(upload)
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+        upload.close()
+    return length, peak
+
+
+def main():
+    sizes_mb = [float(arg) for arg in sys.argv[1:]] or [1, 10, 20]
+    print(f"{'size':>8} {'original peak':>15} {'streaming peak':>15} {'reduction':>10}")
+    for size_mb in sizes_mb:
+        size = int(size_mb * 1024 * 1024)
+        original_length, original_peak = measure(original_path, size)
+        streaming_length, streaming_peak = measure(streaming_path, size)
+        assert original_length == streaming_length
+        print(
+            f"{size_mb:>6.1f}MB {original_peak / 2**20:>13.1f}MB "
+            f"{streaming_peak / 2**20:>13.1f}MB {original_peak / streaming_peak:>9.1f}x"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,303 @@
+"""
+Identification Result Cache
+Content-addressed cache for plant identification results, keyed on the image digest
+plus the request modifiers. Keeps a bounded in-memory LRU tier with TTL, an optional
+backend shared by the server workers (see cache_backends.py) and an optional on-disk
+tier that survives restarts. The disk tier is bounded: when it holds more than its
+maximum number of entries, expired entries and then the oldest ones are removed.
+"""
+import asyncio
+import hashlib
+import json
+import logging
+import os
+import tempfile
+import threading
+import time
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+from cache_backends import CacheBackend, MemoryBackend
+
+logger = logging.getLogger(__name__)
+
+# Constants
+DEFAULT_MAX_ENTRIES = 1024
+DEFAULT_TTL_SECONDS = 24 * 60 * 60
+DEFAULT_DISK_MAX_ENTRIES = 10000
+# A full disk tier is swept down to this fraction of its maximum, so sweeps are rare
+DISK_SWEEP_TARGET = 0.9
+# Seconds after which a temporary file left by an interrupted write is removed
+DISK_TMP_MAX_AGE = 60 * 60
+
+
+def combined_digest(image_digests: List[str]) -> str:
+    """
+    Combine the digests of a multi-image submission into one digest
+
+    A single image keeps its own digest, so it shares cache entries with
+    single-image uploads. Image order is significant.
+
+    Args:
+        image_digests: SHA-256 hex digests of each uploaded image
+
+    Returns:
+        Hex digest identifying the whole submission
+    """
+    if len(image_digests) == 1:
+        return image_digests[0]
+    return hashlib.sha256(",".join(image_digests).encode("ascii")).hexdigest()
+
+
+def modifiers_key(
+    include_health_assessment: bool,
+    detailed_info: bool,
+    fields: Optional[Sequence[str]] = None
+) -> str:
+    """
+    Build the part of a cache key that identifies the request modifiers
+
+    Args:
+        include_health_assessment: Whether health assessment was requested
+        detailed_info: Whether detailed plant information was requested
+        fields: Projected response fields, None for all
+
+    Returns:
+        Key identifying the request modifiers
+    """
+    key = f"h{int(include_health_assessment)}:d{int(detailed_info)}"
+    if fields is not None:
+        key += ":f" + ",".join(sorted(fields))
+    return key
+
+
+def identification_cache_key(
+    image_digest: str,
+    include_health_assessment: bool,
+    detailed_info: bool,
+    fields: Optional[Sequence[str]] = None
+) -> str:
+    """
+    Build the cache key for an identification request
+
+    Args:
+        image_digest: SHA-256 hex digest of the raw uploaded image bytes
+            (see ``combined_digest`` for multi-image submissions)
+        include_health_assessment: Whether health assessment was requested
+        detailed_info: Whether detailed plant information was requested
+        fields: Projected response fields, None for all
+
+    Returns:
+        Key identifying the image and request modifiers
+    """
+    return f"{image_digest}:{modifiers_key(include_health_assessment, detailed_info, fields)}"
+
+
+class IdentificationCache:
+    """Tiered (memory + optional shared backend + optional disk) cache with TTL for identification results"""
+
+    def __init__(
+        self,
+        max_entries: int = DEFAULT_MAX_ENTRIES,
+        ttl_seconds: float = DEFAULT_TTL_SECONDS,
+        disk_path: Optional[str] = None,
+        shared: Optional[CacheBackend] = None,
+        disk_max_entries: int = DEFAULT_DISK_MAX_ENTRIES
+    ):
+        """
+        Initialize the cache
+
+        Args:
+            max_entries: Maximum number of entries kept in memory
+            ttl_seconds: Time in seconds after which an entry expires
+            disk_path: Directory for the on-disk tier (disabled if None)
+            shared: Backend shared by the server workers (disabled if None)
+            disk_max_entries: Maximum number of entries kept on disk
+        """
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.disk_path = disk_path
+        self.shared = shared
+        self.disk_max_entries = disk_max_entries
+        self._memory = MemoryBackend(max_entries)
+        # Files in the disk tier, counted by the first sweep (None until then)
+        self._disk_entries: Optional[int] = None
+        self._disk_lock = threading.Lock()
+        self._sweep_lock = threading.Lock()
+        self.shared_hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.disk_expirations = 0
+        self.disk_evictions = 0
+
+        if self.disk_path:
+            os.makedirs(self.disk_path, exist_ok=True)
+
+    async def get(self, key: str) -> Optional[Dict[str, Any]]:
+        """
+        Look up a cached result
+
+        Args:
+            key: Cache key from ``identification_cache_key``
+
+        Returns:
+            Cached identification result, or None on a miss
+        """
+        value = await self._memory.get(key)
+        if value is not None:
+            return value
+
+        if self.shared is not None:
+            entry = await self.shared.get(f"identify:{key}")
+            if entry is not None:
+                expires_at, value = entry
+                self._memory.put(key, value, expires_at)
+                self.shared_hits += 1
+                return value
+
+        if self.disk_path:
+            entry = await asyncio.to_thread(self._read_disk, key)
+            if entry is not None:
+                expires_at, value = entry
+                self._memory.put(key, value, expires_at)
+                self.disk_hits += 1
+                return value
+
+        self.misses += 1
+        return None
+
+    async def set(self, key: str, value: Dict[str, Any]) -> None:
+        """
+        Store a result in the cache
+
+        Args:
+            key: Cache key from ``identification_cache_key``
+            value: Identification result to cache
+        """
+        expires_at = time.time() + self.ttl_seconds
+        self._memory.put(key, value, expires_at)
+
+        if self.shared is not None:
+            # The expiry travels with the value so every tier expires it together
+            await self.shared.set(f"identify:{key}", [expires_at, value], self.ttl_seconds)
+
+        if self.disk_path:
+            await asyncio.to_thread(self._write_disk, key, value, expires_at)
+
+    def stats(self) -> Dict[str, Any]:
+        """Return cache counters"""
+        return {
+            "entries": len(self._memory),
+            "max_entries": self.max_entries,
+            "hits": self._memory.hits,
+            "shared_hits": self.shared_hits,
+            "disk_hits": self.disk_hits,
+            "misses": self.misses,
+            "evictions": self._memory.evictions,
+            "expirations": self._memory.expirations + self.disk_expirations,
+            "disk_entries": self._disk_entries,
+            "disk_evictions": self.disk_evictions,
+            "shared": self.shared.stats() if self.shared is not None else None,
+        }
+
+    def _disk_file(self, key: str) -> str:
+        """Path of the on-disk entry for a key"""
+        return os.path.join(self.disk_path, key.replace(":", "_") + ".json")
+
+    def _read_disk(self, key: str) -> Optional[Tuple[float, Dict[str, Any]]]:
+        """Read an entry from the disk tier, removing it if expired or unreadable"""
+        path = self._disk_file(key)
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                entry = json.load(f)
+        except FileNotFoundError:
+            return None
+        except (OSError, ValueError) as e:
+            logger.error(f"Error reading cache entry {path}: {str(e)}")
+            self._remove_disk(path)
+            return None
+
+        expires_at = entry.get("expires_at", 0)
+        if expires_at <= time.time():
+            self._remove_disk(path)
+            self.disk_expirations += 1
+            return None
+        return expires_at, entry.get("value")
+
+    def _write_disk(self, key: str, value: Dict[str, Any], expires_at: float) -> None:
+        """Atomically write an entry to the disk tier"""
+        path = self._disk_file(key)
+        tmp_path = None
+        try:
+            existed = os.path.exists(path)
+            fd, tmp_path = tempfile.mkstemp(dir=self.disk_path, suffix=".tmp")
+            with os.fdopen(fd, "w", encoding="utf-8") as f:
+                json.dump({"expires_at": expires_at, "value": value}, f)
+            os.replace(tmp_path, path)
+        except OSError as e:
+            logger.error(f"Error writing cache entry {path}: {str(e)}")
+            if tmp_path:
+                self._remove_disk(tmp_path)
+            return
+
+        with self._disk_lock:
+            if self._disk_entries is not None and not existed:
+                self._disk_entries += 1
+            full = self._disk_entries is None or self._disk_entries > self.disk_max_entries
+        if full:
+            self._sweep_disk()
+
+    def _sweep_disk(self) -> None:
+        """
+        Bring the disk tier back under its maximum number of entries
+
+        Removes expired entries and abandoned temporary files, then, if the tier
+        is still over its maximum, the oldest entries down to ``DISK_SWEEP_TARGET``
+        of it. Entry ages come from the file modification times, so no entry has
+        to be read.
+        """
+        if not self._sweep_lock.acquire(blocking=False):
+            # Another write is already sweeping
+            return
+        try:
+            now = time.time()
+            entries: List[Tuple[float, str]] = []
+            try:
+                with os.scandir(self.disk_path) as files:
+                    for file in files:
+                        try:
+                            modified = file.stat().st_mtime
+                        except OSError:
+                            continue
+                        if file.name.endswith(".tmp"):
+                            if now - modified > DISK_TMP_MAX_AGE:
+                                self._remove_disk(file.path)
+                        elif file.name.endswith(".json"):
+                            if modified + self.ttl_seconds <= now:
+                                self._remove_disk(file.path)
+                                self.disk_expirations += 1
+                            else:
+                                entries.append((modified, file.path))
+            except OSError as e:
+                logger.error(f"Error sweeping cache directory {self.disk_path}: {str(e)}")
+                return
+
+            if len(entries) > self.disk_max_entries:
+                entries.sort()
+                excess = len(entries) - int(self.disk_max_entries * DISK_SWEEP_TARGET)
+                for _, path in entries[:excess]:
+                    self._remove_disk(path)
+                self.disk_evictions += excess
+                entries = entries[excess:]
+                logger.info(f"Evicted {excess} identification cache entries from disk")
+
+            with self._disk_lock:
+                self._disk_entries = len(entries)
+        finally:
+            self._sweep_lock.release()
+
+    def _remove_disk(self, path: str) -> None:
+        """Remove a file from the disk tier, ignoring missing files"""
+        try:
+            os.remove(path)
+        except OSError:
+            pass
@@ -0,0 +1,438 @@
+"""
+Cache Backends
+Key-value stores with per-entry expiry behind one interface, used by the
+identification cache and the plant details store:
+
+- ``MemoryBackend``: per-process LRU of Python objects (the in-memory tiers)
+- ``MmapBackend``: fixed-size table in a memory-mapped file, shared by the server
+  workers on one host
+- ``RedisBackend``: any Redis-protocol server, shared by every host
+
+The shared backends store values as msgpack, which is smaller and faster to
+decode than JSON.
+"""
+import asyncio
+import fcntl
+import hashlib
+import logging
+import mmap
+import os
+import struct
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Optional, Tuple
+
+import msgpack
+import redis.asyncio as redis_asyncio
+from redis.exceptions import RedisError
+
+logger = logging.getLogger(__name__)
+
+# Constants
+DEFAULT_MMAP_SLOTS = 4096
+DEFAULT_MMAP_SLOT_SIZE = 64 * 1024
+# Slots a key can occupy; a full set replaces the entry that expires first
+MMAP_WAYS = 4
+MMAP_MAGIC = b"FLCACHE1"
+# File header: magic, number of slots, slot size (padded to one page)
+MMAP_FILE_HEADER = struct.Struct("<8sII")
+MMAP_HEADER_SIZE = mmap.PAGESIZE
+# Slot header: key digest, expiry time, value length
+MMAP_SLOT_HEADER = struct.Struct("<16sdI")
+MMAP_EMPTY_DIGEST = bytes(16)
+DEFAULT_REDIS_TIMEOUT = 0.5
+# Seconds the Redis backend is skipped after an error
+REDIS_RETRY_AFTER = 5.0
+
+
+def pack(value: Any) -> bytes:
+    """Serialize a cache value with msgpack"""
+    return msgpack.packb(value, use_bin_type=True)
+
+
+def unpack(data: bytes) -> Any:
+    """Deserialize a cache value written by ``pack``"""
+    return msgpack.unpackb(data, raw=False)
+
+
+def _expires_at(ttl_seconds: Optional[float]) -> float:
+    """Absolute expiry time of an entry (infinite without a TTL)"""
+    return time.time() + ttl_seconds if ttl_seconds is not None else float("inf")
+
+
+class CacheBackend:
+    """Interface of a key-value cache with per-entry expiry"""
+
+    name = "base"
+
+    def open(self) -> None:
+        """Acquire the backend's resources (called once per server worker)"""
+
+    async def close(self) -> None:
+        """Release the backend's resources"""
+
+    async def get(self, key: str) -> Optional[Any]:
+        """
+        Look up a value
+
+        Args:
+            key: Cache key
+
+        Returns:
+            The stored value, or None if it is missing or expired
+        """
+        raise NotImplementedError
+
+    async def set(self, key: str, value: Any, ttl_seconds: Optional[float] = None) -> None:
+        """
+        Store a value
+
+        Args:
+            key: Cache key
+            value: msgpack-serializable value
+            ttl_seconds: Time in seconds after which the entry expires (None keeps
+                it until it is evicted)
+        """
+        raise NotImplementedError
+
+    async def delete(self, key: str) -> None:
+        """Remove a value if present"""
+        raise NotImplementedError
+
+    def stats(self) -> Dict[str, Any]:
+        """Return backend counters"""
+        return {"backend": self.name}
+
+
+class MemoryBackend(CacheBackend):
+    """Bounded LRU of Python objects in the current process"""
+
+    name = "memory"
+
+    def __init__(self, max_entries: int):
+        """
+        Args:
+            max_entries: Maximum number of entries, the least recently used are evicted
+        """
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[str, Tuple[float, Any]]" = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    async def get(self, key: str) -> Optional[Any]:
+        entry = self._entries.get(key)
+        if entry is not None:
+            expires_at, value = entry
+            if expires_at > time.time():
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return value
+            del self._entries[key]
+            self.expirations += 1
+        self.misses += 1
+        return None
+
+    async def set(self, key: str, value: Any, ttl_seconds: Optional[float] = None) -> None:
+        self.put(key, value, _expires_at(ttl_seconds))
+
+    def put(self, key: str, value: Any, expires_at: float) -> None:
+        """Store a value with an absolute expiry time (e.g. one read from another tier)"""
+        self._entries[key] = (expires_at, value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+    async def delete(self, key: str) -> None:
+        self._entries.pop(key, None)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "backend": self.name,
+            "entries": len(self._entries),
+            "max_entries": self.max_entries,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "expirations": self.expirations,
+        }
+
+
+class MmapBackend(CacheBackend):
+    """
+    Set-associative hash table in a memory-mapped file
+
+    Every server worker maps the same file, so an entry written by one worker is
+    read by the others without a network hop. Each key hashes to a set of
+    ``MMAP_WAYS`` fixed-size slots guarded by a byte-range lock on the file.
+    Values larger than a slot are not cached. The file is sparse, so only used
+    slots take memory and disk space.
+
+    Lookups copy at most one slot while holding the lock, so they run on the
+    event loop instead of a thread.
+    """
+
+    name = "mmap"
+
+    def __init__(
+        self,
+        path: str,
+        slots: int = DEFAULT_MMAP_SLOTS,
+        slot_size: int = DEFAULT_MMAP_SLOT_SIZE
+    ):
+        """
+        Args:
+            path: Cache file; it is recreated if its layout does not match
+            slots: Number of entries the file holds (rounded up to a multiple of
+                ``MMAP_WAYS``)
+            slot_size: Bytes per entry, including a 28-byte header
+        """
+        self.path = path
+        self.sets = max(1, -(-slots // MMAP_WAYS))
+        self.slots = self.sets * MMAP_WAYS
+        self.slot_size = slot_size
+        self.max_value_size = slot_size - MMAP_SLOT_HEADER.size
+        self._fd: Optional[int] = None
+        self._map: Optional[mmap.mmap] = None
+        self.hits = 0
+        self.misses = 0
+        self.expirations = 0
+        self.evictions = 0
+        self.oversized = 0
+
+    def open(self) -> None:
+        """Map the cache file, creating or resetting it if needed"""
+        if self._map is not None:
+            return
+        size = MMAP_HEADER_SIZE + self.slots * self.slot_size
+        header = MMAP_FILE_HEADER.pack(MMAP_MAGIC, self.slots, self.slot_size)
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+        fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o600)
+        try:
+            # Workers starting together must not initialize the file twice
+            fcntl.flock(fd, fcntl.LOCK_EX)
+            try:
+                if os.fstat(fd).st_size != size or os.pread(fd, len(header), 0) != header:
+                    logger.info(f"Initializing shared cache file {self.path} ({self.slots} slots)")
+                    os.ftruncate(fd, 0)
+                    os.ftruncate(fd, size)
+                    os.pwrite(fd, header, 0)
+            finally:
+                fcntl.flock(fd, fcntl.LOCK_UN)
+            self._map = mmap.mmap(fd, size)
+        except OSError:
+            os.close(fd)
+            raise
+        self._fd = fd
+
+    async def close(self) -> None:
+        if self._map is not None:
+            self._map.close()
+            self._map = None
+        if self._fd is not None:
+            os.close(self._fd)
+            self._fd = None
+
+    async def get(self, key: str) -> Optional[Any]:
+        if self._map is None:
+            self.open()
+
+        digest, offset = self._locate(key)
+        data = None
+        now = time.time()
+        self._lock(offset, fcntl.LOCK_SH)
+        try:
+            for slot in self._slots(offset):
+                slot_digest, expires_at, length = MMAP_SLOT_HEADER.unpack_from(self._map, slot)
+                if slot_digest == digest:
+                    if expires_at > now:
+                        start = slot + MMAP_SLOT_HEADER.size
+                        data = self._map[start:start + length]
+                    else:
+                        self.expirations += 1
+                    break
+        finally:
+            self._lock(offset, fcntl.LOCK_UN)
+
+        if data is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        return unpack(data)
+
+    async def set(self, key: str, value: Any, ttl_seconds: Optional[float] = None) -> None:
+        if self._map is None:
+            self.open()
+
+        data = pack(value)
+        if len(data) > self.max_value_size:
+            self.oversized += 1
+            return
+
+        digest, offset = self._locate(key)
+        now = time.time()
+        self._lock(offset, fcntl.LOCK_EX)
+        try:
+            # Reuse the key's slot, else a free one, else an expired one, else the one
+            # expiring first. The whole set is checked for the key before any other
+            # slot is taken, so a key never occupies two slots.
+            headers = [
+                (slot,) + MMAP_SLOT_HEADER.unpack_from(self._map, slot)[:2]
+                for slot in self._slots(offset)
+            ]
+            target = next((slot for slot, slot_digest, _ in headers if slot_digest == digest), None)
+            if target is None:
+                target = next(
+                    (slot for slot, slot_digest, _ in headers if slot_digest == MMAP_EMPTY_DIGEST), None
+                )
+            if target is None:
+                target = next((slot for slot, _, expires_at in headers if expires_at <= now), None)
+            if target is None:
+                target = min(headers, key=lambda header: header[2])[0]
+                self.evictions += 1
+
+            start = target + MMAP_SLOT_HEADER.size
+            self._map[start:start + len(data)] = data
+            MMAP_SLOT_HEADER.pack_into(self._map, target, digest, _expires_at(ttl_seconds), len(data))
+        finally:
+            self._lock(offset, fcntl.LOCK_UN)
+
+    async def delete(self, key: str) -> None:
+        if self._map is None:
+            self.open()
+
+        digest, offset = self._locate(key)
+        self._lock(offset, fcntl.LOCK_EX)
+        try:
+            for slot in self._slots(offset):
+                # Every slot is checked, in case a file written by an older version
+                # holds the key twice
+                if MMAP_SLOT_HEADER.unpack_from(self._map, slot)[0] == digest:
+                    MMAP_SLOT_HEADER.pack_into(self._map, slot, MMAP_EMPTY_DIGEST, 0.0, 0)
+        finally:
+            self._lock(offset, fcntl.LOCK_UN)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "backend": self.name,
+            "path": self.path,
+            "slots": self.slots,
+            "slot_size": self.slot_size,
+            "hits": self.hits,
+            "misses": self.misses,
+            "expirations": self.expirations,
+            "evictions": self.evictions,
+            "oversized": self.oversized,
+        }
+
+    def _locate(self, key: str) -> Tuple[bytes, int]:
+        """Digest of a key and the file offset of its set"""
+        digest = hashlib.blake2b(key.encode("utf-8"), digest_size=16).digest()
+        set_index = int.from_bytes(digest[:8], "little") % self.sets
+        return digest, MMAP_HEADER_SIZE + set_index * MMAP_WAYS * self.slot_size
+
+    def _slots(self, offset: int) -> range:
+        """File offsets of the slots of a set"""
+        return range(offset, offset + MMAP_WAYS * self.slot_size, self.slot_size)
+
+    def _lock(self, offset: int, operation: int) -> None:
+        """Lock or unlock the byte range of a set for the other worker processes"""
+        fcntl.lockf(self._fd, operation, MMAP_WAYS * self.slot_size, offset)
+
+
+class RedisBackend(CacheBackend):
+    """
+    Cache in a Redis-protocol server (Redis, Valkey, KeyDB, ...)
+
+    Errors and timeouts are logged and treated as misses; after an error the
+    server is skipped for ``REDIS_RETRY_AFTER`` seconds so an outage does not
+    add a timeout to every request.
+    """
+
+    name = "redis"
+
+    def __init__(
+        self,
+        url: str = "redis://localhost:6379/0",
+        prefix: str = "florai:",
+        timeout: float = DEFAULT_REDIS_TIMEOUT,
+        client: Optional[Any] = None
+    ):
+        """
+        Args:
+            url: Server URL, e.g. redis://cache:6379/0
+            prefix: Prefix of every key, so several services can share a server
+            timeout: Connect and command timeout in seconds
+            client: redis.asyncio-compatible client to use instead of connecting
+                to ``url`` (e.g. fakeredis)
+        """
+        self.url = url
+        self.prefix = prefix
+        self.timeout = timeout
+        self._client = client
+        self._down_until = 0.0
+        self.hits = 0
+        self.misses = 0
+        self.errors = 0
+        self.skipped = 0
+
+    def open(self) -> None:
+        if self._client is None:
+            self._client = redis_asyncio.Redis.from_url(
+                self.url, socket_timeout=self.timeout, socket_connect_timeout=self.timeout
+            )
+
+    async def close(self) -> None:
+        if self._client is not None:
+            client, self._client = self._client, None
+            await client.aclose()
+
+    async def get(self, key: str) -> Optional[Any]:
+        data = await self._call("GET", key)
+        if data is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        return unpack(data)
+
+    async def set(self, key: str, value: Any, ttl_seconds: Optional[float] = None) -> None:
+        expiry = ("PX", max(1, int(ttl_seconds * 1000))) if ttl_seconds is not None else ()
+        await self._call("SET", key, pack(value), *expiry)
+
+    async def delete(self, key: str) -> None:
+        await self._call("DEL", key)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "backend": self.name,
+            "hits": self.hits,
+            "misses": self.misses,
+            "errors": self.errors,
+            "skipped": self.skipped,
+            "available": time.monotonic() >= self._down_until,
+        }
+
+    async def _call(self, command: str, key: str, *args: Any) -> Optional[bytes]:
+        """Run a command, returning None if the server is unavailable"""
+        if time.monotonic() < self._down_until:
+            self.skipped += 1
+            return None
+        if self._client is None:
+            self.open()
+
+        try:
+            result = await self._client.execute_command(command, self.prefix + key, *args)
+        except (RedisError, OSError, asyncio.TimeoutError) as e:
+            self.errors += 1
+            self._down_until = time.monotonic() + REDIS_RETRY_AFTER
+            logger.warning(f"Redis cache {command} failed, skipping it for {REDIS_RETRY_AFTER:.0f}s: {str(e)}")
+            return None
+        return result if command == "GET" else None
@@ -0,0 +1,143 @@
+"""
+Fake Plant.id API
+Local stand-in for the Plant.id API with configurable latency, error rates and payload
+sizes, for exercising and benchmarking the plant service without an API key or network
+access.
+
+Run it next to the service and point the client at it:
+
+    uvicorn fake_plant_id:app --port 9000
+    PLANT_ID_API_BASE_URL=http://127.0.0.1:9000 uvicorn main:app
+
+Faults and payload sizes can be set with environment variables at startup or changed
+at runtime with ``PUT /_faults``; ``GET /_stats`` returns request counters.
+"""
+import asyncio
+import os
+import random
+from typing import Any, Dict, Optional
+
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse
+from pydantic import BaseModel
+
+app = FastAPI(title="Fake Plant.id API")
+
+
+class Faults(BaseModel):
+    latency_ms: float = float(os.getenv("FAKE_PLANT_ID_LATENCY_MS", "50"))
+    latency_jitter_ms: float = float(os.getenv("FAKE_PLANT_ID_LATENCY_JITTER_MS", "0"))
+    error_rate: float = float(os.getenv("FAKE_PLANT_ID_ERROR_RATE", "0"))
+    error_status: int = int(os.getenv("FAKE_PLANT_ID_ERROR_STATUS", "503"))
+    hang_rate: float = float(os.getenv("FAKE_PLANT_ID_HANG_RATE", "0"))
+    hang_seconds: float = float(os.getenv("FAKE_PLANT_ID_HANG_SECONDS", "60"))
+    # Payload size
+    suggestions: int = int(os.getenv("FAKE_PLANT_ID_SUGGESTIONS", "3"))
+    similar_images: int = int(os.getenv("FAKE_PLANT_ID_SIMILAR_IMAGES", "1"))
+    description_bytes: int = int(os.getenv("FAKE_PLANT_ID_DESCRIPTION_BYTES", "200"))
+
+
+faults = Faults()
+counters: Dict[str, int] = {"identify": 0, "images": 0, "plants": 0, "errors": 0, "hangs": 0}
+# Payload of the last identification request, without its images
+last_identify_payload: Dict[str, Any] = {}
+
+
+def _suggestion(index: int, plant_id: Optional[str] = None) -> Dict[str, Any]:
+    """Build one suggestion in the Plant.id response format"""
+    description = f"A fictional plant number {index}. "
+    description = (description * (faults.description_bytes // len(description) + 1))[:faults.description_bytes]
+    return {
+        "id": plant_id or f"fake-plant-{index}",
+        "name": f"Plantae fictus {index}",
+        "probability": round(0.9 / (index + 1), 4),
+        "plant_details": {
+            "common_names": [f"Fake plant {index}"],
+            "url": f"https://example.com/plants/{index}",
+            "wiki_description": {"value": description},
+            "taxonomy": {"family": "Fictaceae", "genus": "Plantae"},
+            "synonyms": [],
+            "watering": {"text": "Water weekly"},
+            "sunlight": ["full sun", "part shade"],
+            "soil": {"text": "Well-drained"},
+            "propagation": ["cuttings"],
+            "pruning": {"text": "Prune in spring"},
+        },
+        "similar_images": [
+            {"url": f"https://example.com/images/{index}-{image}.jpg", "similarity": 0.5}
+            for image in range(faults.similar_images)
+        ],
+    }
+
+
+async def _apply_faults() -> Optional[JSONResponse]:
+    """Sleep for the configured latency and possibly inject a fault"""
+    if random.random() < faults.hang_rate:
+        counters["hangs"] += 1
+        await asyncio.sleep(faults.hang_seconds)
+
+    latency = faults.latency_ms + random.uniform(0, faults.latency_jitter_ms)
+    await asyncio.sleep(latency / 1000)
+
+    if random.random() < faults.error_rate:
+        counters["errors"] += 1
+        return JSONResponse({"error": "injected fault"}, status_code=faults.error_status)
+    return None
+
+
+@app.post("/identify")
+async def identify(request: Request):
+    global last_identify_payload
+    counters["identify"] += 1
+    payload = await request.json()
+    counters["images"] += len(payload.get("images", []))
+    last_identify_payload = {key: value for key, value in payload.items() if key != "images"}
+    error = await _apply_faults()
+    if error is not None:
+        return error
+
+    suggestions = [_suggestion(index) for index in range(faults.suggestions)]
+    # Like the real API, only return the requested details and modifiers
+    requested_details = set(payload.get("plant_details", []))
+    for suggestion in suggestions:
+        suggestion["plant_details"] = {
+            key: value for key, value in suggestion["plant_details"].items()
+            if key in requested_details
+        }
+        if "similar_images" not in payload.get("modifiers", []):
+            del suggestion["similar_images"]
+    if "health" in payload:
+        for suggestion in suggestions:
+            suggestion["health_assessment"] = {
+                "is_healthy": False,
+                "diseases": [
+                    {"name": "leaf spot", "probability": 0.4, "treatment": {"overview": "Remove affected leaves"}}
+                ],
+            }
+    return {
+        "id": random.randint(1, 10 ** 9),
+        "is_plant": True,
+        "images": [{"file_name": f"image-{index}.jpg"} for index in range(len(payload.get("images", [])))],
+        "suggestions": suggestions,
+    }
+
+
+@app.get("/plants/{plant_id}")
+async def plant_details(plant_id: str):
+    counters["plants"] += 1
+    error = await _apply_faults()
+    if error is not None:
+        return error
+    return {"plant": _suggestion(0, plant_id)}
+
+
+@app.put("/_faults")
+async def set_faults(new_faults: Faults):
+    global faults
+    faults = new_faults
+    return faults
+
+
+@app.get("/_stats")
+async def stats():
+    return counters
@@ -0,0 +1,114 @@
+"""
+Upload Encoding
+Streaming helpers that hash and base64-encode uploaded images in fixed-size chunks,
+so a large upload is never held in memory as bytes, base64 bytes and a decoded
+string at the same time.
+"""
+import binascii
+import hashlib
+import shutil
+import tempfile
+from typing import BinaryIO
+
+# Read size for uploads; a multiple of 3 so every full chunk encodes without padding
+CHUNK_SIZE = 3 * 64 * 1024
+
+# Copies larger than this are spooled to disk, like starlette's uploads
+SPOOL_MAX_SIZE = 1024 * 1024
+
+
+def base64_length(size: int) -> int:
+    """Length of the base64 encoding of ``size`` bytes"""
+    return 4 * ((size + 2) // 3)
+
+
+def file_size(fileobj: BinaryIO) -> int:
+    """Return the size of a seekable file and rewind it"""
+    fileobj.seek(0, 2)
+    size = fileobj.tell()
+    fileobj.seek(0)
+    return size
+
+
+def spool_copy(fileobj: BinaryIO) -> BinaryIO:
+    """
+    Copy an uploaded file into a new spooled temporary file
+
+    Used to keep an upload beyond the request that received it, since the
+    framework closes the original once the response has been sent.
+
+    Args:
+        fileobj: Seekable binary file (e.g. ``UploadFile.file``)
+
+    Returns:
+        The copy, rewound
+    """
+    copy = tempfile.SpooledTemporaryFile(max_size=SPOOL_MAX_SIZE)
+    fileobj.seek(0)
+    shutil.copyfileobj(fileobj, copy, CHUNK_SIZE)
+    fileobj.seek(0)
+    copy.seek(0)
+    return copy
+
+
+def upload_digest(fileobj: BinaryIO) -> str:
+    """
+    Compute the SHA-256 digest of an uploaded file without loading it at once
+
+    Args:
+        fileobj: Seekable binary file (e.g. ``UploadFile.file``)
+
+    Returns:
+        Hex digest of the file contents
+    """
+    fileobj.seek(0)
+    digest = hashlib.sha256()
+    while True:
+        chunk = fileobj.read(CHUNK_SIZE)
+        if not chunk:
+            break
+        digest.update(chunk)
+    fileobj.seek(0)
+    return digest.hexdigest()
+
+
+def encode_upload(fileobj: BinaryIO) -> bytearray:
+    """
+    Base64-encode an uploaded file into a pre-sized buffer
+
+    The file is read in chunks and each chunk is encoded straight into its slot of
+    the output buffer, so peak memory is the encoded size plus one chunk.
+
+    Args:
+        fileobj: Seekable binary file (e.g. ``UploadFile.file``)
+
+    Returns:
+        Base64-encoded file contents as ASCII bytes
+    """
+    size = file_size(fileobj)
+    encoded = bytearray(base64_length(size))
+    view = memoryview(encoded)
+    pending = b""
+    offset = 0
+
+    while True:
+        chunk = fileobj.read(CHUNK_SIZE)
+        if not chunk:
+            break
+        if pending:
+            chunk = pending + chunk
+        # Only encode whole 3-byte groups until the end of the file
+        usable = len(chunk) - len(chunk) % 3
+        pending = chunk[usable:]
+        if usable:
+            block = binascii.b2a_base64(memoryview(chunk)[:usable], newline=False)
+            view[offset:offset + len(block)] = block
+            offset += len(block)
+
+    if pending:
+        block = binascii.b2a_base64(pending, newline=False)
+        view[offset:offset + len(block)] = block
+        offset += len(block)
+
+    fileobj.seek(0)
+    return encoded
@@ -0,0 +1,174 @@
+"""
+Image Preprocessing
+Downscales and recompresses uploaded images with Pillow before they are sent to the
+Plant.id API. Decoding and encoding run in a process pool so they never block the
+event loop.
+"""
+import asyncio
+import io
+import logging
+import os
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any, Dict, Optional
+
+from PIL import Image, ImageOps
+
+logger = logging.getLogger(__name__)
+
+# Constants
+DEFAULT_MAX_EDGE = 1500
+DEFAULT_QUALITY = 85
+DEFAULT_FORMAT = "JPEG"
+SUPPORTED_FORMATS = ("JPEG", "WEBP")
+
+
+def preprocess_image(data: bytes, max_edge: int, quality: int, image_format: str) -> bytes:
+    """
+    Decode, strip metadata, downscale and re-encode an image
+
+    Args:
+        data: Raw image bytes
+        max_edge: Maximum length in pixels of the longest edge
+        quality: Encoder quality (1-95)
+        image_format: Output format, "JPEG" or "WEBP"
+
+    Returns:
+        Re-encoded image bytes
+    """
+    with Image.open(io.BytesIO(data)) as image:
+        # Let the JPEG decoder scale down while decoding
+        image.draft("RGB", (max_edge, max_edge))
+        # Bake the EXIF orientation into the pixels; EXIF is dropped on save
+        image = ImageOps.exif_transpose(image)
+        if image.mode != "RGB":
+            image = image.convert("RGB")
+        image.thumbnail((max_edge, max_edge), Image.Resampling.LANCZOS)
+
+        output = io.BytesIO()
+        image.save(output, format=image_format, quality=quality)
+        return output.getvalue()
+
+
+class ImagePreprocessor:
+    """Runs image preprocessing in a process pool and tracks byte savings"""
+
+    def __init__(
+        self,
+        max_edge: int = DEFAULT_MAX_EDGE,
+        quality: int = DEFAULT_QUALITY,
+        image_format: str = DEFAULT_FORMAT,
+        workers: Optional[int] = None,
+        enabled: bool = True
+    ):
+        """
+        Initialize the preprocessor
+
+        Args:
+            max_edge: Maximum length in pixels of the longest edge
+            quality: Encoder quality (1-95)
+            image_format: Output format, "JPEG" or "WEBP"
+            workers: Number of worker processes (defaults to the CPU count)
+            enabled: Whether images are preprocessed (latency is tracked either way)
+        """
+        image_format = image_format.upper()
+        if image_format not in SUPPORTED_FORMATS:
+            raise ValueError(f"Unsupported image format: {image_format}")
+
+        self.max_edge = max_edge
+        self.quality = quality
+        self.image_format = image_format
+        self.workers = workers or os.cpu_count() or 1
+        self.enabled = enabled
+        self._pool: Optional[ProcessPoolExecutor] = None
+        self.processed = 0
+        self.skipped = 0
+        self.original_bytes = 0
+        self.sent_bytes = 0
+        # Upstream latency totals for preprocessed and original uploads: [count, total_ms]
+        self._upstream_latency = {"preprocessed": [0, 0.0], "original": [0, 0.0]}
+
+    def start(self) -> None:
+        """Start the worker processes"""
+        if self.enabled and self._pool is None:
+            self._pool = ProcessPoolExecutor(max_workers=self.workers)
+            logger.info(
+                f"Image preprocessing started ({self.workers} workers, "
+                f"max_edge={self.max_edge}, format={self.image_format}, quality={self.quality})"
+            )
+
+    def close(self) -> None:
+        """Stop the worker processes"""
+        if self._pool is not None:
+            pool, self._pool = self._pool, None
+            pool.shutdown(wait=True, cancel_futures=True)
+
+    async def process(self, data: bytes) -> bytes:
+        """
+        Preprocess an image, falling back to the original bytes
+
+        The original is kept if Pillow cannot decode it or if re-encoding does
+        not make it smaller.
+
+        Args:
+            data: Raw image bytes
+
+        Returns:
+            Bytes to send upstream
+        """
+        if not self.enabled:
+            return data
+        if self._pool is None:
+            self.start()
+
+        loop = asyncio.get_running_loop()
+        try:
+            processed = await loop.run_in_executor(
+                self._pool,
+                preprocess_image,
+                data,
+                self.max_edge,
+                self.quality,
+                self.image_format
+            )
+        except (OSError, ValueError, Image.DecompressionBombError) as e:
+            logger.warning(f"Image preprocessing skipped: {str(e)}")
+            processed = data
+
+        if len(processed) >= len(data):
+            processed = data
+            self.skipped += 1
+        else:
+            self.processed += 1
+
+        self.original_bytes += len(data)
+        self.sent_bytes += len(processed)
+        return processed
+
+    def record_upstream_latency(self, latency_ms: float, preprocessed: bool) -> None:
+        """
+        Record the upstream latency of an identification request
+
+        Args:
+            latency_ms: Upstream request time in milliseconds
+            preprocessed: Whether a preprocessed image was sent
+        """
+        totals = self._upstream_latency["preprocessed" if preprocessed else "original"]
+        totals[0] += 1
+        totals[1] += latency_ms
+
+    def stats(self) -> Dict[str, Any]:
+        """Return preprocessing counters"""
+        saved = self.original_bytes - self.sent_bytes
+        return {
+            "enabled": self.enabled,
+            "processed": self.processed,
+            "skipped": self.skipped,
+            "original_bytes": self.original_bytes,
+            "sent_bytes": self.sent_bytes,
+            "saved_bytes": saved,
+            "saved_ratio": round(saved / self.original_bytes, 4) if self.original_bytes else 0.0,
+            "avg_upstream_latency_ms": {
+                name: round(total / count, 1) if count else None
+                for name, (count, total) in self._upstream_latency.items()
+            },
+        }
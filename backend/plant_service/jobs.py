@@ -0,0 +1,352 @@
+"""
+Identification Jobs
+In-process job queue for asynchronous identification. Submitting a job returns
+immediately; a fixed pool of workers drains the bounded queue, so bursts are
+smoothed into a steady upstream load. Results are kept for a while to be polled
+and can also be pushed to a callback URL.
+"""
+import asyncio
+import ipaddress
+import logging
+import socket
+import time
+import uuid
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Sequence, Set
+from urllib.parse import urlparse
+
+import httpx
+
+from plant_id_client import PlantIdError
+from resilience import RetryPolicy
+
+logger = logging.getLogger(__name__)
+
+# Constants
+DEFAULT_WORKERS = 4
+DEFAULT_MAX_QUEUED = 100
+DEFAULT_RESULT_TTL = 60 * 60
+DEFAULT_CALLBACK_TIMEOUT = 10.0
+CALLBACK_RETRIES = 3
+
+
+class JobQueueFull(Exception):
+    """Raised when a job is submitted while the queue is full"""
+
+
+class Job:
+    """State of one identification job"""
+
+    __slots__ = (
+        "id", "status", "created_at", "started_at", "finished_at", "result",
+        "error", "status_code", "callback_url", "callback_status", "work", "cleanup"
+    )
+
+    QUEUED = "queued"
+    RUNNING = "running"
+    SUCCEEDED = "succeeded"
+    FAILED = "failed"
+
+    def __init__(
+        self,
+        work: Callable[[], Awaitable[Dict[str, Any]]],
+        callback_url: Optional[str] = None,
+        cleanup: Optional[Callable[[], None]] = None
+    ):
+        self.id = uuid.uuid4().hex
+        self.status = self.QUEUED
+        self.created_at = time.time()
+        self.started_at: Optional[float] = None
+        self.finished_at: Optional[float] = None
+        self.result: Optional[Dict[str, Any]] = None
+        self.error: Optional[str] = None
+        self.status_code: Optional[int] = None
+        self.callback_url = callback_url
+        self.callback_status: Optional[str] = None
+        self.work = work
+        self.cleanup = cleanup
+
+    def to_dict(self) -> Dict[str, Any]:
+        """Public representation of the job"""
+        return {
+            "job_id": self.id,
+            "status": self.status,
+            "created_at": self.created_at,
+            "started_at": self.started_at,
+            "finished_at": self.finished_at,
+            "status_code": self.status_code,
+            "result": self.result,
+            "error": self.error,
+            "callback_status": self.callback_status,
+        }
+
+
+class JobManager:
+    """Bounded job queue drained by a pool of worker tasks"""
+
+    def __init__(
+        self,
+        workers: int = DEFAULT_WORKERS,
+        max_queued: int = DEFAULT_MAX_QUEUED,
+        result_ttl: float = DEFAULT_RESULT_TTL,
+        callback_timeout: float = DEFAULT_CALLBACK_TIMEOUT,
+        callback_hosts: Optional[Sequence[str]] = None
+    ):
+        """
+        Initialize the job manager
+
+        Args:
+            workers: Number of jobs processed concurrently
+            max_queued: Maximum number of jobs waiting for a worker
+            result_ttl: Seconds a finished job is kept for polling
+            callback_timeout: Timeout in seconds of a callback delivery
+            callback_hosts: Hosts callbacks may be sent to (callbacks are refused if
+                None or empty)
+        """
+        self.workers = workers
+        self.max_queued = max_queued
+        self.result_ttl = result_ttl
+        self.callback_timeout = callback_timeout
+        self.callback_hosts = set(callback_hosts or ())
+        self.callback_retry_policy = RetryPolicy(max_retries=CALLBACK_RETRIES, base_delay=1.0, max_delay=10.0)
+        self._queue: Optional["asyncio.Queue[Job]"] = None
+        self._workers: List["asyncio.Task[None]"] = []
+        self._callbacks: Set["asyncio.Task[None]"] = set()
+        self._jobs: Dict[str, Job] = {}
+        self._finished: "OrderedDict[str, Job]" = OrderedDict()
+        self._http: Optional[httpx.AsyncClient] = None
+        self.submitted = 0
+        self.rejected = 0
+        self.succeeded = 0
+        self.failed = 0
+        self.callbacks_delivered = 0
+        self.callbacks_failed = 0
+
+    async def start(self) -> None:
+        """Start the worker tasks"""
+        if self._queue is not None:
+            return
+        self._queue = asyncio.Queue(maxsize=self.max_queued)
+        self._http = httpx.AsyncClient(timeout=self.callback_timeout)
+        self._workers = [asyncio.ensure_future(self._worker()) for _ in range(self.workers)]
+        logger.info(f"Identification job queue started with {self.workers} workers")
+
+    async def close(self, drain_timeout: float = 0) -> None:
+        """
+        Stop the workers
+
+        Args:
+            drain_timeout: Seconds queued and running jobs and pending callbacks may
+                take to finish; whatever is left after that is abandoned
+        """
+        if self._queue is not None and drain_timeout > 0:
+            deadline = time.monotonic() + drain_timeout
+            try:
+                await asyncio.wait_for(self._queue.join(), drain_timeout)
+                if self._callbacks:
+                    await asyncio.wait(self._callbacks, timeout=max(0, deadline - time.monotonic()))
+            except asyncio.TimeoutError:
+                pass
+            if self._queue.qsize() or self._callbacks:
+                logger.warning(
+                    f"Abandoning {self._queue.qsize()} queued jobs and "
+                    f"{len(self._callbacks)} callbacks on shutdown"
+                )
+
+        tasks = self._workers + list(self._callbacks)
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        self._workers = []
+        if self._queue is not None:
+            while not self._queue.empty():
+                self._release(self._queue.get_nowait())
+            self._queue = None
+        if self._http is not None:
+            await self._http.aclose()
+            self._http = None
+
+    async def validate_callback_url(self, callback_url: str) -> None:
+        """
+        Check that a callback URL may be used
+
+        The host must be in the allow-list and resolve only to public addresses,
+        so callbacks cannot be aimed at the service's own network.
+
+        Raises:
+            ValueError: If the URL is not http(s), its host is not allowed or it
+                resolves to a loopback, private, link-local or reserved address
+        """
+        if not self.callback_hosts:
+            raise ValueError("Callbacks are disabled (no callback hosts are configured)")
+        parsed = urlparse(callback_url)
+        if parsed.scheme not in ("http", "https") or not parsed.hostname:
+            raise ValueError("callback_url must be an http or https URL")
+        if parsed.hostname not in self.callback_hosts:
+            raise ValueError(f"Callbacks to {parsed.hostname} are not allowed")
+
+        try:
+            addresses = await asyncio.get_running_loop().getaddrinfo(
+                parsed.hostname, parsed.port or 443, type=socket.SOCK_STREAM
+            )
+        except (socket.gaierror, UnicodeError):
+            raise ValueError(f"Could not resolve callback host {parsed.hostname}")
+        for address in addresses:
+            if not _is_public_address(address[4][0]):
+                raise ValueError(f"Callbacks to {parsed.hostname} are not allowed (non-public address)")
+
+    def submit(
+        self,
+        work: Callable[[], Awaitable[Dict[str, Any]]],
+        callback_url: Optional[str] = None,
+        cleanup: Optional[Callable[[], None]] = None
+    ) -> Job:
+        """
+        Queue a job
+
+        Args:
+            work: Coroutine function producing the job result
+            callback_url: URL the finished job is POSTed to
+            cleanup: Called once the job no longer needs its inputs
+
+        Returns:
+            The queued job
+
+        Raises:
+            JobQueueFull: If the queue is full
+        """
+        if self._queue is None:
+            raise RuntimeError("Job manager is not started")
+        self._expire()
+
+        job = Job(work, callback_url, cleanup)
+        try:
+            self._queue.put_nowait(job)
+        except asyncio.QueueFull:
+            self.rejected += 1
+            raise JobQueueFull(f"Job queue is full ({self.max_queued} jobs waiting)")
+        self._jobs[job.id] = job
+        self.submitted += 1
+        return job
+
+    def get(self, job_id: str) -> Optional[Job]:
+        """Return a job that is queued, running or recently finished"""
+        self._expire()
+        return self._jobs.get(job_id)
+
+    def stats(self) -> Dict[str, Any]:
+        """Return queue counters"""
+        return {
+            "queued": self._queue.qsize() if self._queue is not None else 0,
+            "max_queued": self.max_queued,
+            "workers": self.workers,
+            "retained": len(self._jobs),
+            "submitted": self.submitted,
+            "rejected": self.rejected,
+            "succeeded": self.succeeded,
+            "failed": self.failed,
+            "callbacks_delivered": self.callbacks_delivered,
+            "callbacks_failed": self.callbacks_failed,
+        }
+
+    async def _worker(self) -> None:
+        """Run queued jobs one at a time"""
+        while True:
+            job = await self._queue.get()
+            try:
+                await self._run(job)
+            finally:
+                self._queue.task_done()
+
+    async def _run(self, job: Job) -> None:
+        """Run a job and start delivering its callback"""
+        job.status = Job.RUNNING
+        job.started_at = time.time()
+        try:
+            job.result = await job.work()
+            job.status = Job.SUCCEEDED
+            job.status_code = 200
+            self.succeeded += 1
+        except asyncio.CancelledError:
+            self._release(job)
+            raise
+        except PlantIdError as e:
+            logger.error(f"Plant.id API error for job {job.id}: {str(e)}")
+            job.status = Job.FAILED
+            job.status_code = e.status_code
+            job.error = str(e)
+            self.failed += 1
+        except Exception as e:
+            logger.error(f"Error processing job {job.id}: {str(e)}")
+            job.status = Job.FAILED
+            job.status_code = 500
+            job.error = f"Error processing request: {str(e)}"
+            self.failed += 1
+        finally:
+            job.finished_at = time.time()
+
+        self._release(job)
+        self._finished[job.id] = job
+        if job.callback_url:
+            # Slow or failing callbacks must not hold up the worker
+            task = asyncio.ensure_future(self._deliver_callback(job))
+            self._callbacks.add(task)
+            task.add_done_callback(self._callbacks.discard)
+
+    async def _deliver_callback(self, job: Job) -> None:
+        """POST the finished job to its callback URL, retrying failures"""
+        try:
+            # The host may resolve differently than when the job was submitted
+            await self.validate_callback_url(job.callback_url)
+        except ValueError as e:
+            logger.warning(f"Callback for job {job.id} to {job.callback_url} refused: {str(e)}")
+            job.callback_status = "failed"
+            self.callbacks_failed += 1
+            return
+
+        delay = None
+        for attempt in range(CALLBACK_RETRIES + 1):
+            try:
+                response = await self._http.post(job.callback_url, json=job.to_dict())
+                if response.status_code < 400:
+                    job.callback_status = "delivered"
+                    self.callbacks_delivered += 1
+                    return
+                error = f"status {response.status_code}"
+            except httpx.HTTPError as e:
+                error = str(e) or type(e).__name__
+            if attempt < CALLBACK_RETRIES:
+                delay = self.callback_retry_policy.next_delay(delay)
+                await asyncio.sleep(delay)
+
+        logger.warning(f"Callback for job {job.id} to {job.callback_url} failed: {error}")
+        job.callback_status = "failed"
+        self.callbacks_failed += 1
+
+    def _release(self, job: Job) -> None:
+        """Drop the job's inputs once they are no longer needed"""
+        job.work = None
+        if job.cleanup is not None:
+            cleanup, job.cleanup = job.cleanup, None
+            try:
+                cleanup()
+            except Exception as e:
+                logger.warning(f"Cleanup of job {job.id} failed: {str(e)}")
+
+    def _expire(self) -> None:
+        """Forget finished jobs older than the result TTL"""
+        cutoff = time.time() - self.result_ttl
+        while self._finished:
+            job_id, job = next(iter(self._finished.items()))
+            if job.finished_at > cutoff:
+                break
+            self._finished.popitem(last=False)
+            self._jobs.pop(job_id, None)
+
+
+def _is_public_address(address: str) -> bool:
+    """Whether an IP address is globally routable (not loopback, private, link-local, ...)"""
+    ip = ipaddress.ip_address(address.split("%", 1)[0])
+    if isinstance(ip, ipaddress.IPv6Address) and ip.ipv4_mapped is not None:
+        ip = ip.ipv4_mapped
+    return ip.is_global and not ip.is_multicast
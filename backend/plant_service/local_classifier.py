@@ -0,0 +1,471 @@
+"""
+Local Plant Classifier
+Optional CPU-only fallback for when the Plant.id API is slow or down. A small ONNX
+image classifier runs in a process pool; concurrent requests are grouped into
+batches so each inference call uses the model efficiently. ``IdentificationRouter``
+puts it behind the same ``identify_plant`` interface as ``PlantIdClient`` and
+decides per request whether the upstream or the local answer is used.
+
+Requires the packages in requirements-local-model.txt (onnxruntime and numpy).
+"""
+import asyncio
+import base64
+import io
+import json
+import logging
+import uuid
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any, Dict, List, Optional, Sequence, Set, Tuple, Union
+
+from PIL import Image, ImageOps
+
+from plant_id_client import Base64Image, PlantIdClient, PlantIdError, project_fields
+
+try:
+    import numpy as np
+    import onnxruntime
+    LOCAL_MODEL_AVAILABLE = True
+except ImportError:
+    LOCAL_MODEL_AVAILABLE = False
+
+logger = logging.getLogger(__name__)
+
+# Constants
+DEFAULT_INPUT_SIZE = 224
+DEFAULT_MAX_BATCH = 8
+DEFAULT_BATCH_DELAY = 0.01
+DEFAULT_TOP_K = 5
+DEFAULT_LATENCY_BUDGET = 5.0
+# ImageNet normalization used by common pretrained classifiers
+MEAN = (0.485, 0.456, 0.406)
+STD = (0.229, 0.224, 0.225)
+
+POLICY_FALLBACK = "fallback"
+POLICY_RACE = "race"
+POLICIES = (POLICY_FALLBACK, POLICY_RACE)
+
+# Per-process model state, set by _load_model in each worker
+_session = None
+_input_name = ""
+_input_size = DEFAULT_INPUT_SIZE
+
+
+def _load_model(model_path: str, threads: int) -> None:
+    """Load the ONNX model once per worker process"""
+    global _session, _input_name, _input_size
+    options = onnxruntime.SessionOptions()
+    options.intra_op_num_threads = threads
+    options.inter_op_num_threads = 1
+    _session = onnxruntime.InferenceSession(
+        model_path, sess_options=options, providers=["CPUExecutionProvider"]
+    )
+    model_input = _session.get_inputs()[0]
+    _input_name = model_input.name
+    # NCHW input; dynamic dimensions are strings or None
+    if len(model_input.shape) == 4 and isinstance(model_input.shape[2], int):
+        _input_size = model_input.shape[2]
+
+
+def _prepare_image(image_base64: bytes, size: int) -> "np.ndarray":
+    """Decode, center-crop, resize and normalize one image to a CHW float array"""
+    with Image.open(io.BytesIO(base64.b64decode(image_base64))) as image:
+        image.draft("RGB", (size * 2, size * 2))
+        image = ImageOps.exif_transpose(image)
+        if image.mode != "RGB":
+            image = image.convert("RGB")
+        image = ImageOps.fit(image, (size, size), Image.Resampling.BILINEAR)
+        pixels = np.asarray(image, dtype=np.float32) / 255.0
+    pixels = (pixels - np.array(MEAN, dtype=np.float32)) / np.array(STD, dtype=np.float32)
+    return pixels.transpose(2, 0, 1)
+
+
+def _classify_batch(
+    groups: List[List[bytes]],
+    top_k: int
+) -> List[Optional[List[Tuple[int, float]]]]:
+    """
+    Classify several submissions in one inference call (runs in a worker)
+
+    Args:
+        groups: Base64-encoded images per submission
+        top_k: Number of classes returned per submission
+
+    Returns:
+        Per submission, the top (class index, probability) pairs averaged over its
+        images, or None if none of its images could be decoded
+    """
+    inputs = []
+    owners = []
+    for group_index, images in enumerate(groups):
+        for image in images:
+            try:
+                inputs.append(_prepare_image(image, _input_size))
+                owners.append(group_index)
+            except (OSError, ValueError, Image.DecompressionBombError) as e:
+                logger.warning(f"Local classifier skipped an image: {str(e)}")
+
+    results: List[Optional[List[Tuple[int, float]]]] = [None] * len(groups)
+    if not inputs:
+        return results
+
+    scores = _session.run(None, {_input_name: np.stack(inputs)})[0]
+    scores = scores.reshape(len(inputs), -1).astype(np.float64)
+    # Models exporting logits get a softmax; probability outputs are kept as they are
+    if not np.allclose(scores.sum(axis=1), 1.0, atol=1e-3) or (scores < 0).any():
+        scores = np.exp(scores - scores.max(axis=1, keepdims=True))
+        scores /= scores.sum(axis=1, keepdims=True)
+
+    owners_array = np.array(owners)
+    for group_index in set(owners):
+        probabilities = scores[owners_array == group_index].mean(axis=0)
+        best = np.argsort(probabilities)[::-1][:top_k]
+        results[group_index] = [(int(index), float(probabilities[index])) for index in best]
+    return results
+
+
+def load_labels(path: str) -> List[Dict[str, Any]]:
+    """
+    Load class labels
+
+    A .json file holds a list of scientific names or of objects with
+    ``scientific_name`` and optionally ``common_name``, ``family`` and ``id`` (a
+    Plant.id plant ID, so /plant lookups work for local answers). Any other file
+    holds one scientific name per line.
+
+    Args:
+        path: Labels file, in model output order
+
+    Returns:
+        One dict per class
+    """
+    with open(path, "r", encoding="utf-8") as f:
+        if path.endswith(".json"):
+            entries = json.load(f)
+        else:
+            entries = [line.strip() for line in f if line.strip()]
+    return [
+        entry if isinstance(entry, dict) else {"scientific_name": entry}
+        for entry in entries
+    ]
+
+
+class LocalClassifier:
+    """Batched ONNX plant classifier running in a process pool"""
+
+    def __init__(
+        self,
+        model_path: str,
+        labels_path: str,
+        workers: int = 1,
+        threads: int = 1,
+        max_batch: int = DEFAULT_MAX_BATCH,
+        batch_delay: float = DEFAULT_BATCH_DELAY,
+        top_k: int = DEFAULT_TOP_K
+    ):
+        """
+        Initialize the classifier
+
+        Args:
+            model_path: ONNX model taking a NCHW float image batch and returning
+                class scores (logits or probabilities)
+            labels_path: Class labels (see ``load_labels``)
+            workers: Number of inference worker processes
+            threads: Inference threads per worker process
+            max_batch: Maximum number of images per inference call
+            batch_delay: Seconds to wait for more requests before running a batch
+            top_k: Number of suggestions returned
+        """
+        if not LOCAL_MODEL_AVAILABLE:
+            raise ImportError("The local classifier requires onnxruntime and numpy")
+
+        self.model_path = model_path
+        self.labels = load_labels(labels_path)
+        self.workers = workers
+        self.threads = threads
+        self.max_batch = max_batch
+        self.batch_delay = batch_delay
+        self.top_k = top_k
+        self._pool: Optional[ProcessPoolExecutor] = None
+        self._queue: Optional["asyncio.Queue[Tuple[List[bytes], asyncio.Future]]"] = None
+        self._batcher: Optional["asyncio.Task[None]"] = None
+        self._batches: Set["asyncio.Task[None]"] = set()
+        self.batches = 0
+        self.images = 0
+        self.failures = 0
+
+    def start(self) -> None:
+        """Start the worker processes and the batching task"""
+        if self._pool is not None:
+            return
+        self._pool = ProcessPoolExecutor(
+            max_workers=self.workers,
+            initializer=_load_model,
+            initargs=(self.model_path, self.threads)
+        )
+        self._queue = asyncio.Queue()
+        self._batcher = asyncio.ensure_future(self._batch_loop())
+        logger.info(
+            f"Local classifier started ({self.model_path}, {len(self.labels)} classes, "
+            f"{self.workers} workers, max_batch={self.max_batch})"
+        )
+
+    async def close(self) -> None:
+        """Stop the batching task and the worker processes"""
+        tasks = list(self._batches)
+        if self._batcher is not None:
+            tasks.append(self._batcher)
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        self._batcher = None
+        if self._pool is not None:
+            pool, self._pool = self._pool, None
+            pool.shutdown(wait=True, cancel_futures=True)
+
+    async def identify_plant(
+        self,
+        image_base64: Union[Base64Image, Sequence[Base64Image]],
+        include_health_assessment: bool = True,
+        detailed_info: bool = True,
+        fields: Optional[Sequence[str]] = None
+    ) -> Dict[str, Any]:
+        """
+        Identify a plant from one or more base64-encoded images
+
+        Same interface and result shape as ``PlantIdClient.identify_plant``. The
+        local model only knows names, so details, health assessment and images
+        are empty.
+
+        Returns:
+            Plant identification results with ``source`` set to "local"
+
+        Raises:
+            PlantIdError: If no image could be classified
+        """
+        if self._pool is None:
+            self.start()
+
+        if isinstance(image_base64, (str, bytes, bytearray)):
+            image_base64 = [image_base64]
+        images = [
+            image.encode("ascii") if isinstance(image, str) else bytes(image)
+            for image in image_base64
+        ]
+
+        future = asyncio.get_running_loop().create_future()
+        self._queue.put_nowait((images, future))
+        suggestions = await future
+        if suggestions is None:
+            raise PlantIdError("Local classifier could not decode the images", status_code=400)
+
+        return {
+            "results": [
+                self._suggestion(index, probability, fields)
+                for index, probability in suggestions
+                if index < len(self.labels)
+            ],
+            "is_plant": True,
+            "submission_id": f"local-{uuid.uuid4().hex}",
+            "source": "local"
+        }
+
+    def stats(self) -> Dict[str, Any]:
+        """Return batching counters"""
+        return {
+            "batches": self.batches,
+            "images": self.images,
+            "avg_batch_size": round(self.images / self.batches, 2) if self.batches else None,
+            "failures": self.failures,
+            "queued": self._queue.qsize() if self._queue is not None else 0,
+        }
+
+    def _suggestion(
+        self,
+        index: int,
+        probability: float,
+        fields: Optional[Sequence[str]]
+    ) -> Dict[str, Any]:
+        """Build a suggestion with the shape of ``PlantIdentificationResult``"""
+        label = self.labels[index]
+        scientific_name = label.get("scientific_name", "")
+        return project_fields({
+            "id": str(label.get("id", f"local-{index}")),
+            "scientific_name": scientific_name,
+            "common_name": label.get("common_name") or scientific_name,
+            "family": label.get("family"),
+            "probability": round(probability, 4),
+            "description": None,
+            "care_info": None,
+            "health_assessment": None,
+            "image_url": None
+        }, fields)
+
+    async def _batch_loop(self) -> None:
+        """Group queued requests into batches and hand them to the workers"""
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = [await self._queue.get()]
+            size = len(batch[0][0])
+            deadline = loop.time() + self.batch_delay
+            while size < self.max_batch:
+                timeout = deadline - loop.time()
+                if timeout <= 0:
+                    break
+                try:
+                    item = await asyncio.wait_for(self._queue.get(), timeout)
+                except asyncio.TimeoutError:
+                    break
+                batch.append(item)
+                size += len(item[0])
+
+            # Keep batching while the workers run this batch
+            task = asyncio.ensure_future(self._run_batch(batch))
+            self._batches.add(task)
+            task.add_done_callback(self._batches.discard)
+
+    async def _run_batch(self, batch: List[Tuple[List[bytes], asyncio.Future]]) -> None:
+        """Run one batch in a worker process and resolve its requests"""
+        loop = asyncio.get_running_loop()
+        try:
+            results = await loop.run_in_executor(
+                self._pool, _classify_batch, [images for images, _ in batch], self.top_k
+            )
+        except Exception as e:
+            self.failures += 1
+            logger.error(f"Local classifier batch failed: {str(e)}")
+            for _, future in batch:
+                if not future.done():
+                    future.set_exception(PlantIdError(f"Local classifier error: {str(e)}", status_code=500))
+            return
+
+        self.batches += 1
+        self.images += sum(len(images) for images, _ in batch)
+        for (_, future), result in zip(batch, results):
+            if not future.done():
+                future.set_result(result)
+
+
+class IdentificationRouter:
+    """
+    Routes identifications between the Plant.id API and the local classifier
+
+    Policies:
+        fallback: Use the upstream; answer locally when it fails with a server
+            error, rate limiting, an open circuit or a timeout.
+        race: Start both. Take the upstream answer if it arrives within the
+            latency budget; after that, take whichever answer arrives first.
+    """
+
+    def __init__(
+        self,
+        upstream: PlantIdClient,
+        local: Optional[LocalClassifier] = None,
+        policy: str = POLICY_FALLBACK,
+        latency_budget: float = DEFAULT_LATENCY_BUDGET
+    ):
+        """
+        Args:
+            upstream: Plant.id API client
+            local: Local classifier (None always uses the upstream)
+            policy: "fallback" or "race"
+            latency_budget: Seconds the upstream gets before a local answer is
+                used ("race" only)
+        """
+        if policy not in POLICIES:
+            raise ValueError(f"Unknown local model policy: {policy}")
+        self.upstream = upstream
+        self.local = local
+        self.policy = policy
+        self.latency_budget = latency_budget
+        self.upstream_answers = 0
+        self.local_answers = 0
+
+    async def identify_plant(self, image_base64: Any, **kwargs) -> Dict[str, Any]:
+        """
+        Identify a plant like ``PlantIdClient.identify_plant``
+
+        Local answers have ``source`` set to "local".
+        """
+        if self.local is None:
+            return await self.upstream.identify_plant(image_base64, **kwargs)
+        if self.policy == POLICY_RACE:
+            return await self._race(image_base64, **kwargs)
+
+        try:
+            result = await self.upstream.identify_plant(image_base64, **kwargs)
+        except PlantIdError as e:
+            if not self._should_fall_back(e):
+                raise
+            logger.warning(f"Answering locally after upstream error: {e.message}")
+            return await self._identify_locally(image_base64, e, **kwargs)
+        self.upstream_answers += 1
+        return result
+
+    def stats(self) -> Dict[str, Any]:
+        """Return routing and classifier counters"""
+        return {
+            "policy": self.policy if self.local is not None else None,
+            "upstream_answers": self.upstream_answers,
+            "local_answers": self.local_answers,
+            "local_classifier": self.local.stats() if self.local is not None else None,
+        }
+
+    @staticmethod
+    def _should_fall_back(error: PlantIdError) -> bool:
+        """Whether an upstream error is an outage rather than a bad request"""
+        return error.status_code >= 500 or error.status_code == 429
+
+    def _raise_final_error(self, upstream: "asyncio.Future[Dict[str, Any]]") -> None:
+        """Re-raise the failed upstream's error unless it is an outage to fall back from"""
+        error = upstream.exception()
+        if not isinstance(error, PlantIdError) or not self._should_fall_back(error):
+            raise error
+
+    async def _identify_locally(
+        self,
+        image_base64: Any,
+        upstream_error: PlantIdError,
+        **kwargs
+    ) -> Dict[str, Any]:
+        """Answer with the local classifier, reporting the upstream error if it fails too"""
+        try:
+            result = await self.local.identify_plant(image_base64, **kwargs)
+        except PlantIdError as e:
+            logger.error(f"Local classifier failed: {e.message}")
+            raise upstream_error
+        self.local_answers += 1
+        return result
+
+    async def _race(self, image_base64: Any, **kwargs) -> Dict[str, Any]:
+        """Run the upstream and the local classifier against the latency budget"""
+        upstream = asyncio.ensure_future(self.upstream.identify_plant(image_base64, **kwargs))
+        local = asyncio.ensure_future(self.local.identify_plant(image_base64, **kwargs))
+        pending = {upstream, local}
+        try:
+            # The upstream answer is preferred while it is within budget
+            await asyncio.wait({upstream}, timeout=self.latency_budget)
+            if upstream.done():
+                pending.discard(upstream)
+                if upstream.exception() is None:
+                    self.upstream_answers += 1
+                    return upstream.result()
+                self._raise_final_error(upstream)
+
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                if upstream in done and upstream.exception() is not None:
+                    # Also after the budget: a rejected request is not answered locally
+                    self._raise_final_error(upstream)
+                for task in (upstream, local):
+                    if task in done and task.exception() is None:
+                        if task is upstream:
+                            self.upstream_answers += 1
+                        else:
+                            self.local_answers += 1
+                        return task.result()
+
+            # Both failed; the upstream error is the more meaningful one
+            raise upstream.exception()
+        finally:
+            for task in pending:
+                task.cancel()
@@ -0,0 +1,176 @@
+"""
+Logging Configuration
+Non-blocking logging for the service. Log calls only put the record on a bounded
+queue; a background thread formats it (as one JSON object per line by default)
+and writes it. Bursts of the same warning or error are sampled per call site, and
+long messages are truncated, so an upstream error storm cannot stall the event
+loop on log output.
+
+Settings are read from the environment (see .env.example): LOG_LEVEL,
+LOG_FORMAT, LOG_QUEUE_SIZE, LOG_MAX_MESSAGE_CHARS, LOG_SAMPLE_WINDOW and
+LOG_SAMPLE_BURST.
+"""
+import atexit
+import logging
+import logging.handlers
+import os
+import queue
+import sys
+import time
+from datetime import datetime, timezone
+from typing import Any, Dict, Optional, Tuple
+
+import orjson
+
+# Constants
+DEFAULT_QUEUE_SIZE = 10000
+DEFAULT_MAX_MESSAGE_CHARS = 2000
+DEFAULT_SAMPLE_WINDOW = 10.0
+DEFAULT_SAMPLE_BURST = 5
+TEXT_FORMAT = "%(asctime)s - %(name)s - %(levelname)s - %(message)s"
+# Attributes every LogRecord has; anything else was passed with extra={...}
+RECORD_ATTRIBUTES = frozenset(logging.makeLogRecord({}).__dict__) | {"message", "asctime", "suppressed", "color_message"}
+
+_listener: Optional[logging.handlers.QueueListener] = None
+
+
+class JsonFormatter(logging.Formatter):
+    """Format records as one JSON object per line"""
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry: Dict[str, Any] = {
+            "time": datetime.fromtimestamp(record.created, timezone.utc).isoformat(timespec="milliseconds"),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+            "process": record.process,
+        }
+        suppressed = getattr(record, "suppressed", 0)
+        if suppressed:
+            entry["suppressed"] = suppressed
+        if record.exc_info and not record.exc_text:
+            record.exc_text = self.formatException(record.exc_info)
+        if record.exc_text:
+            entry["exception"] = record.exc_text
+        for key, value in record.__dict__.items():
+            if key not in RECORD_ATTRIBUTES:
+                entry[key] = value
+        return orjson.dumps(entry, default=str).decode("utf-8")
+
+
+class SamplingFilter(logging.Filter):
+    """
+    Let through at most ``burst`` warnings or errors per call site and window
+
+    The first record let through after a window with dropped records carries
+    their count in its ``suppressed`` attribute. Records below WARNING are not
+    sampled.
+    """
+
+    def __init__(self, window: float = DEFAULT_SAMPLE_WINDOW, burst: int = DEFAULT_SAMPLE_BURST):
+        super().__init__()
+        self.window = window
+        self.burst = burst
+        # (path, line) -> [window start, records let through, records dropped]
+        self._sites: Dict[Tuple[str, int], list] = {}
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if record.levelno < logging.WARNING or self.burst <= 0:
+            return True
+
+        now = time.monotonic()
+        site = self._sites.get((record.pathname, record.lineno))
+        if site is None or now - site[0] >= self.window:
+            dropped = site[2] if site is not None else 0
+            self._sites[(record.pathname, record.lineno)] = [now, 1, 0]
+            if dropped:
+                record.suppressed = dropped
+            return True
+        if site[1] < self.burst:
+            site[1] += 1
+            return True
+        site[2] += 1
+        return False
+
+
+class NonBlockingQueueHandler(logging.handlers.QueueHandler):
+    """
+    Queue handler that does as little as possible on the calling thread
+
+    Unlike ``QueueHandler`` it neither formats nor copies the record here; it
+    only merges the message arguments in place, truncates long messages and
+    renders tracebacks (which reference the caller's frames). When the queue is
+    full the record is dropped instead of waiting.
+    """
+
+    def __init__(self, log_queue: "queue.Queue[logging.LogRecord]", max_message_chars: int):
+        super().__init__(log_queue)
+        self.max_message_chars = max_message_chars
+        self.dropped = 0
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        message = record.getMessage()
+        if self.max_message_chars and len(message) > self.max_message_chars:
+            message = (
+                f"{message[:self.max_message_chars]}... "
+                f"[{len(message) - self.max_message_chars} chars truncated]"
+            )
+        record.msg = message
+        record.args = None
+        if record.exc_info:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+    def enqueue(self, record: logging.LogRecord) -> None:
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+
+def configure_logging(level: Optional[str] = None) -> None:
+    """
+    Route all logging through a background thread
+
+    Replaces the root logger's handlers; calling it again only updates the level.
+
+    Args:
+        level: Log level name (defaults to LOG_LEVEL, then INFO)
+    """
+    global _listener
+    root = logging.getLogger()
+    root.setLevel((level or os.getenv("LOG_LEVEL", "INFO")).upper())
+    if _listener is not None:
+        return
+
+    # Skip thread and process name lookups for every record; neither is logged
+    logging.logThreads = False
+    logging.logMultiprocessing = False
+
+    output = logging.StreamHandler(sys.stdout)
+    if os.getenv("LOG_FORMAT", "json").lower() == "json":
+        output.setFormatter(JsonFormatter())
+    else:
+        output.setFormatter(logging.Formatter(TEXT_FORMAT))
+
+    log_queue: "queue.Queue[logging.LogRecord]" = queue.Queue(
+        maxsize=int(os.getenv("LOG_QUEUE_SIZE", str(DEFAULT_QUEUE_SIZE)))
+    )
+    handler = NonBlockingQueueHandler(
+        log_queue,
+        max_message_chars=int(os.getenv("LOG_MAX_MESSAGE_CHARS", str(DEFAULT_MAX_MESSAGE_CHARS))),
+    )
+    handler.addFilter(SamplingFilter(
+        window=float(os.getenv("LOG_SAMPLE_WINDOW", str(DEFAULT_SAMPLE_WINDOW))),
+        burst=int(os.getenv("LOG_SAMPLE_BURST", str(DEFAULT_SAMPLE_BURST))),
+    ))
+
+    for existing in root.handlers[:]:
+        root.removeHandler(existing)
+    root.addHandler(handler)
+
+    _listener = logging.handlers.QueueListener(log_queue, output)
+    _listener.start()
+    # Flush what is queued when the process exits
+    atexit.register(_listener.stop)
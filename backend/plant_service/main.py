@@ -3,24 +3,38 @@ Plant.id API Integration Microservice
 This FastAPI service handles plant identification and health assessment using the Plant.id API.
 """
 import os
+import time
 import base64
+import asyncio
 import logging
-from typing import List, Optional
-from fastapi import FastAPI, File, UploadFile, HTTPException, Depends
+import orjson
+from typing import Any, Dict, List, Optional, Set, Tuple, Union
+from fastapi import FastAPI, File, UploadFile, HTTPException, Depends, Query
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import ORJSONResponse, PlainTextResponse, StreamingResponse
 from pydantic import BaseModel
-from dotenv import load_dotenv
 
-from plant_id_client import PlantIdClient, PlantIdError
-
-# Load environment variables
-load_dotenv()
-
-# Configure logging
-logging.basicConfig(
-    level=logging.INFO,
-    format="%(asctime)s - %(name)s - %(levelname)s - %(message)s",
+from plant_id_client import (
+    PlantIdClient, PlantIdError, PLANT_ID_API_BASE_URL, HEALTH_CHECK_FIELDS, RESPONSE_FIELDS,
+    project_fields
 )
+from admission import AdmissionController
+from resilience import CircuitBreaker, RetryPolicy
+from cache_backends import CacheBackend, MmapBackend, RedisBackend
+from cache import IdentificationCache, combined_digest, identification_cache_key, modifiers_key
+from singleflight import SingleFlight
+from plant_store import DEFAULT_STORE_PATH, PlantDetailsStore
+from image_encoding import encode_upload, file_size, spool_copy, upload_digest
+from image_processing import ImagePreprocessor
+from jobs import JobManager, JobQueueFull
+from phash import PerceptualIndex
+from metrics import CONTENT_TYPE, REGISTRY, STAGE_SECONDS, MetricsMiddleware
+from local_classifier import IdentificationRouter, LocalClassifier
+from logging_config import configure_logging
+
+# Environment variables are loaded from .env before this module is imported: by
+# serve.py, by `python main.py`, or with `uvicorn main:app --env-file .env`.
+# Logging is configured on startup
 logger = logging.getLogger(__name__)
 
 # Initialize FastAPI app
@@ -39,14 +53,239 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-# Get API key from environment variables
-PLANT_ID_API_KEY = os.getenv("PLANT_ID_API_KEY")
-if not PLANT_ID_API_KEY:
-    logger.error("PLANT_ID_API_KEY environment variable not set")
-    raise ValueError("PLANT_ID_API_KEY environment variable not set")
+# Count and time every request by route
+app.add_middleware(MetricsMiddleware)
+
+# Upstream quotas are for the whole service; each server worker gets its share
+SERVER_WORKERS = max(1, int(os.getenv("SERVER_WORKERS", "1")))
+
+# Seconds queued identification jobs may take to finish on shutdown
+GRACEFUL_TIMEOUT = float(os.getenv("GRACEFUL_TIMEOUT", "30"))
+
+# Plant.id client, created on startup so importing the app stays cheap
+plant_id_client: Optional[PlantIdClient] = None
+
+# Chooses between the Plant.id API and the optional local classifier
+identification_router: Optional[IdentificationRouter] = None
+
+# Local fallback classifier: "off", "fallback" (on upstream outages) or "race"
+LOCAL_MODEL_POLICY = os.getenv("LOCAL_MODEL_POLICY", "off").lower()
+
+
+def create_plant_id_client() -> PlantIdClient:
+    """
+    Create the Plant.id client from environment variables
+    
+    Returns:
+        Plant.id client (its connection pool is opened by ``start``)
+        
+    Raises:
+        ValueError: If PLANT_ID_API_KEY is not set
+    """
+    api_key = os.getenv("PLANT_ID_API_KEY")
+    if not api_key:
+        logger.error("PLANT_ID_API_KEY environment variable not set")
+        raise ValueError("PLANT_ID_API_KEY environment variable not set")
+    
+    return PlantIdClient(
+        api_key=api_key,
+        base_url=os.getenv("PLANT_ID_API_BASE_URL", PLANT_ID_API_BASE_URL),
+        timeout=float(os.getenv("PLANT_ID_TIMEOUT", "30")),
+        connect_timeout=float(os.getenv("PLANT_ID_CONNECT_TIMEOUT", "5")),
+        max_connections=int(os.getenv("PLANT_ID_MAX_CONNECTIONS", "100")),
+        max_keepalive_connections=int(os.getenv("PLANT_ID_MAX_KEEPALIVE_CONNECTIONS", "20")),
+        keepalive_expiry=float(os.getenv("PLANT_ID_KEEPALIVE_EXPIRY", "30")),
+        http2=os.getenv("PLANT_ID_HTTP2", "true").lower() == "true",
+        admission=AdmissionController(
+            rate=float(os.getenv("PLANT_ID_RATE_LIMIT", "5")) / SERVER_WORKERS,
+            burst=max(1, int(os.getenv("PLANT_ID_RATE_BURST", "10")) // SERVER_WORKERS),
+            min_concurrency=int(os.getenv("PLANT_ID_MIN_CONCURRENCY", "1")),
+            max_concurrency=max(1, int(os.getenv("PLANT_ID_MAX_CONCURRENCY", "20")) // SERVER_WORKERS),
+            target_latency=float(os.getenv("PLANT_ID_TARGET_LATENCY", "10")),
+            max_queue_wait=float(os.getenv("PLANT_ID_MAX_QUEUE_WAIT", "10")),
+        ),
+        retry_policy=RetryPolicy(
+            max_retries=int(os.getenv("PLANT_ID_MAX_RETRIES", "2")),
+            base_delay=float(os.getenv("PLANT_ID_RETRY_BASE_DELAY", "0.2")),
+            max_delay=float(os.getenv("PLANT_ID_RETRY_MAX_DELAY", "2")),
+        ),
+        circuit_breaker=CircuitBreaker(
+            failure_threshold=int(os.getenv("PLANT_ID_BREAKER_FAILURES", "5")),
+            reset_timeout=float(os.getenv("PLANT_ID_BREAKER_RESET_TIMEOUT", "30")),
+        ),
+        hedge_percentile=float(os.getenv("PLANT_ID_HEDGE_PERCENTILE", "95")) or None,
+    )
+
+
+def create_local_classifier() -> Optional[LocalClassifier]:
+    """
+    Create the local fallback classifier from environment variables
+    
+    Returns:
+        Local classifier, or None if LOCAL_MODEL_POLICY is "off"
+        
+    Raises:
+        ValueError: If the model or labels path is not set
+    """
+    if LOCAL_MODEL_POLICY == "off":
+        return None
+    model_path = os.getenv("LOCAL_MODEL_PATH")
+    labels_path = os.getenv("LOCAL_MODEL_LABELS")
+    if not model_path or not labels_path:
+        raise ValueError("LOCAL_MODEL_PATH and LOCAL_MODEL_LABELS must be set to use a local model")
+    
+    return LocalClassifier(
+        model_path=model_path,
+        labels_path=labels_path,
+        workers=int(os.getenv("LOCAL_MODEL_WORKERS", "1")),
+        threads=int(os.getenv("LOCAL_MODEL_THREADS", "1")),
+        max_batch=int(os.getenv("LOCAL_MODEL_MAX_BATCH", "8")),
+        batch_delay=float(os.getenv("LOCAL_MODEL_BATCH_DELAY_MS", "10")) / 1000,
+        top_k=int(os.getenv("LOCAL_MODEL_TOP_K", "5")),
+    )
+
+
+
+def create_shared_cache() -> Optional[CacheBackend]:
+    """
+    Create the cache backend shared by the server workers from environment variables
+    
+    Returns:
+        Shared backend, or None if CACHE_BACKEND is "none"
+        
+    Raises:
+        ValueError: If CACHE_BACKEND is unknown
+    """
+    backend = os.getenv("CACHE_BACKEND", "none").lower()
+    if backend == "none":
+        return None
+    if backend == "mmap":
+        return MmapBackend(
+            path=os.getenv("CACHE_MMAP_PATH", "/tmp/florai-plant-cache.bin"),
+            slots=int(os.getenv("CACHE_MMAP_SLOTS", "4096")),
+            slot_size=int(os.getenv("CACHE_MMAP_SLOT_SIZE", "65536")),
+        )
+    if backend == "redis":
+        return RedisBackend(
+            url=os.getenv("CACHE_REDIS_URL", "redis://localhost:6379/0"),
+            prefix=os.getenv("CACHE_REDIS_PREFIX", "florai:"),
+            timeout=float(os.getenv("CACHE_REDIS_TIMEOUT", "0.5")),
+        )
+    raise ValueError(f"Unknown CACHE_BACKEND: {backend}")
+
+
+# Cache shared by the server workers (opened on startup)
+shared_cache = create_shared_cache()
+
+# Initialize identification result cache
+identification_cache = IdentificationCache(
+    max_entries=int(os.getenv("IDENTIFY_CACHE_MAX_ENTRIES", "1024")),
+    ttl_seconds=float(os.getenv("IDENTIFY_CACHE_TTL", "86400")),
+    disk_path=os.getenv("IDENTIFY_CACHE_DIR") or None,
+    shared=shared_cache,
+    disk_max_entries=int(os.getenv("IDENTIFY_CACHE_DISK_MAX_ENTRIES", "10000")),
+)
+
+# Initialize persistent plant details store (served stale-while-revalidate)
+plant_details_store = PlantDetailsStore(
+    path=os.getenv("PLANT_STORE_PATH") or DEFAULT_STORE_PATH,
+    ttl_seconds=float(os.getenv("PLANT_DETAILS_TTL", "604800")),
+    max_stale_seconds=float(os.getenv("PLANT_DETAILS_MAX_STALE", "0")) or None,
+    hot_entries=int(os.getenv("PLANT_DETAILS_HOT_ENTRIES", "1024")),
+    shared=shared_cache,
+)
+
+# Initialize image preprocessing (downscale/recompress before upload)
+image_preprocessor = ImagePreprocessor(
+    max_edge=int(os.getenv("IMAGE_MAX_EDGE", "1500")),
+    quality=int(os.getenv("IMAGE_QUALITY", "85")),
+    image_format=os.getenv("IMAGE_FORMAT", "JPEG"),
+    workers=int(os.getenv("IMAGE_PREPROCESS_WORKERS", "0")) or None,
+    enabled=os.getenv("IMAGE_PREPROCESS_ENABLED", "false").lower() == "true",
+)
+
+# Initialize near-duplicate lookup (reuses results for visually similar photos)
+perceptual_index = PerceptualIndex(
+    max_distance=int(os.getenv("PHASH_MAX_DISTANCE", "4")),
+    max_entries=int(os.getenv("PHASH_MAX_ENTRIES", "10000")),
+    ttl_seconds=float(os.getenv("IDENTIFY_CACHE_TTL", "86400")),
+    workers=int(os.getenv("PHASH_WORKERS", "0")) or None,
+    enabled=os.getenv("PHASH_ENABLED", "false").lower() == "true",
+)
+
+# Maximum number of photos of one plant sent in a single identification
+MAX_IMAGES_PER_SUBMISSION = int(os.getenv("IDENTIFY_MAX_IMAGES", "5"))
+
+# Batch identification limits
+BATCH_MAX_FILES = int(os.getenv("IDENTIFY_BATCH_MAX_FILES", "50"))
+BATCH_CONCURRENCY = int(os.getenv("IDENTIFY_BATCH_CONCURRENCY", "4"))
+
+# Coalesce concurrent identical upstream lookups
+identify_flight = SingleFlight()
+plant_details_flight = SingleFlight()
+
+# Optionally load the details of a health check's top suggestion into the plant
+# details store, so the client's follow-up /plant request is served locally. Off by
+# default: details are otherwise only fetched when /plant/{id} is requested
+HEALTH_CHECK_PREFETCH_DETAILS = os.getenv("HEALTH_CHECK_PREFETCH_DETAILS", "false").lower() == "true"
+detail_prefetches: Set["asyncio.Task[None]"] = set()
+
+# Asynchronous identification jobs
+identification_jobs = JobManager(
+    workers=int(os.getenv("IDENTIFY_JOB_WORKERS", "4")),
+    max_queued=int(os.getenv("IDENTIFY_JOB_QUEUE_SIZE", "100")),
+    result_ttl=float(os.getenv("IDENTIFY_JOB_RESULT_TTL", "3600")),
+    callback_timeout=float(os.getenv("IDENTIFY_JOB_CALLBACK_TIMEOUT", "10")),
+    callback_hosts=[
+        host.strip() for host in os.getenv("IDENTIFY_JOB_CALLBACK_HOSTS", "").split(",") if host.strip()
+    ],
+)
+
+
+@app.on_event("startup")
+async def startup():
+    """Open the upstream connection pool, local classifier, shared cache, plant details store,
+    image worker processes and job workers"""
+    global plant_id_client, identification_router
+    # Queued logging, written by a background thread (a no-op if serve.py already did it)
+    configure_logging()
+    if plant_id_client is None:
+        plant_id_client = create_plant_id_client()
+    await plant_id_client.start()
+    if identification_router is None:
+        local_classifier = create_local_classifier()
+        if local_classifier is not None:
+            local_classifier.start()
+        identification_router = IdentificationRouter(
+            plant_id_client,
+            local=local_classifier,
+            policy=LOCAL_MODEL_POLICY if local_classifier is not None else "fallback",
+            latency_budget=float(os.getenv("LOCAL_MODEL_LATENCY_BUDGET", "5")),
+        )
+    if shared_cache is not None:
+        shared_cache.open()
+    plant_details_store.open()
+    image_preprocessor.start()
+    perceptual_index.start()
+    await identification_jobs.start()
+
 
-# Initialize Plant.id client
-plant_id_client = PlantIdClient(api_key=PLANT_ID_API_KEY)
+@app.on_event("shutdown")
+async def shutdown():
+    """Finish queued jobs, then close the upstream connection pool, local classifier, shared
+    cache, plant details store, image worker processes and job workers"""
+    await identification_jobs.close(drain_timeout=GRACEFUL_TIMEOUT)
+    for task in list(detail_prefetches):
+        task.cancel()
+    await asyncio.gather(*detail_prefetches, return_exceptions=True)
+    await plant_details_store.close()
+    if shared_cache is not None:
+        await shared_cache.close()
+    await plant_id_client.close()
+    if identification_router is not None and identification_router.local is not None:
+        await identification_router.local.close()
+    image_preprocessor.close()
+    perceptual_index.close()
 
 
 # Response models
@@ -81,6 +320,26 @@ class IdentificationResponse(BaseModel):
     results: List[PlantIdentificationResult]
     is_plant: bool
     submission_id: str
+    source: str = "plant_id"  # "local" when answered by the local classifier
+
+
+class HealthCheckSuggestion(BaseModel):
+    id: str
+    scientific_name: str
+    common_name: str
+    probability: float
+    details_url: str  # GET for care info, description and image
+
+
+class HealthCheckResponse(BaseModel):
+    is_plant: bool
+    is_healthy: Optional[bool] = None  # None if no health assessment was returned
+    disease_name: Optional[str] = None
+    probability: Optional[float] = None
+    treatment: Optional[str] = None
+    suggestions: List[HealthCheckSuggestion]
+    submission_id: str
+    source: str = "plant_id"
 
 
 @app.get("/")
@@ -89,34 +348,368 @@ async def root():
     return {"status": "healthy", "service": "FlorAI Plant Identification Service"}
 
 
+@app.get("/stats")
+async def stats():
+    """Cache, store, coalescing, preprocessing, job, local model and upstream admission/resilience statistics"""
+    return {
+        "upstream_admission": plant_id_client.admission.stats(),
+        "upstream_resilience": plant_id_client.resilience_stats(),
+        "identification_cache": identification_cache.stats(),
+        "plant_details_store": plant_details_store.stats(),
+        "image_preprocessing": image_preprocessor.stats(),
+        "near_duplicates": perceptual_index.stats(),
+        "identify_coalescing": identify_flight.stats(),
+        "plant_details_coalescing": plant_details_flight.stats(),
+        "identification_jobs": identification_jobs.stats(),
+        "identification_routing": identification_router.stats(),
+    }
+
+
+@app.get("/metrics", response_class=PlainTextResponse)
+async def metrics():
+    """Request, pipeline stage and upstream metrics in the Prometheus text format"""
+    return PlainTextResponse(REGISTRY.render(), media_type=CONTENT_TYPE)
+
+
+def json_response(content: Any, headers: Optional[Dict[str, str]] = None) -> ORJSONResponse:
+    """Serialize a result that already has its response model's shape, without re-validation"""
+    with STAGE_SECONDS.time("serialize"):
+        return ORJSONResponse(content, headers=headers)
+
+
+async def encode_for_upstream(file: UploadFile) -> Tuple[Union[bytes, bytearray], int, int]:
+    """
+    Base64-encode one uploaded image for the upstream request
+    
+    Args:
+        file: Uploaded image file
+        
+    Returns:
+        Encoded image, uploaded size in bytes and size sent upstream in bytes
+    """
+    if image_preprocessor.enabled:
+        # Downscale and recompress in the worker processes
+        with STAGE_SECONDS.time("upload_read"):
+            image_data = await asyncio.to_thread(file.file.read)
+            file.file.seek(0)
+        original_bytes = len(image_data)
+        with STAGE_SECONDS.time("preprocess"):
+            image_data = await image_preprocessor.process(image_data)
+        with STAGE_SECONDS.time("encode"):
+            encoded_image = base64.b64encode(image_data)
+        return encoded_image, original_bytes, len(image_data)
+    
+    # Stream the upload into a pre-sized base64 buffer
+    with STAGE_SECONDS.time("encode"):
+        encoded_image = await asyncio.to_thread(encode_upload, file.file)
+    original_bytes = file_size(file.file)
+    return encoded_image, original_bytes, original_bytes
+
+
+def parse_fields(fields: Optional[str]) -> Optional[Tuple[str, ...]]:
+    """
+    Parse the comma-separated ``fields`` query parameter
+    
+    Args:
+        fields: Requested response fields, e.g. "scientific_name,common_name"
+        
+    Returns:
+        The requested fields, or None when every field is wanted (also when
+        the parameter is empty)
+        
+    Raises:
+        HTTPException: If a field is unknown
+    """
+    if fields is None:
+        return None
+    requested = tuple(dict.fromkeys(
+        field.strip() for field in fields.split(",") if field.strip()
+    ))
+    if not requested:
+        return None
+    unknown = [field for field in requested if field not in RESPONSE_FIELDS]
+    if unknown:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Unknown fields: {','.join(unknown)} (available: {','.join(RESPONSE_FIELDS)})"
+        )
+    if set(requested) == set(RESPONSE_FIELDS):
+        return None
+    return requested
+
+
+def limit_results(
+    result: Dict[str, Any],
+    top_k: Optional[int],
+    min_probability: Optional[float],
+    fields: Optional[Tuple[str, ...]],
+    project: bool = False
+) -> Dict[str, Any]:
+    """
+    Apply top_k, min_probability and the field projection to a (cached) result
+    
+    The result is not modified, since it may be shared through the cache.
+    
+    Args:
+        result: Identification result
+        top_k: Maximum number of suggestions to return
+        min_probability: Minimum probability of the returned suggestions
+        fields: Suggestion fields to return, None for all
+        project: Whether the result has every field (e.g. a cached unprojected
+            result), so its suggestions must be projected to ``fields``
+    """
+    if top_k is None and min_probability is None and not project:
+        return result
+    results = result["results"]
+    if min_probability is not None:
+        results = [item for item in results if item["probability"] >= min_probability]
+    if top_k is not None:
+        results = results[:top_k]
+    if fields is not None and (project or "probability" not in fields):
+        # Drop the fields that were not requested (probability may have been
+        # fetched only for filtering)
+        results = [project_fields(item, fields) for item in results]
+    return {**result, "results": results}
+
+
+async def identify_upload(
+    files: List[UploadFile],
+    include_health_assessment: bool,
+    detailed_info: bool,
+    fields: Optional[Tuple[str, ...]] = None,
+    top_k: Optional[int] = None,
+    min_probability: Optional[float] = None
+) -> Tuple[Dict[str, Any], Dict[str, str]]:
+    """
+    Run the identification pipeline for one submission
+    
+    Args:
+        files: Uploaded images of the same plant, identified together
+        include_health_assessment: Whether to include plant health assessment
+        detailed_info: Whether to include detailed plant information
+        fields: Suggestion fields to return, None for all
+        top_k: Maximum number of suggestions to return
+        min_probability: Minimum probability of the returned suggestions
+        
+    Returns:
+        Identification result and the per-request report headers
+        
+    Raises:
+        PlantIdError: If the upstream identification fails
+    """
+    if len(files) > MAX_IMAGES_PER_SUBMISSION:
+        raise PlantIdError(
+            f"Too many images: {len(files)} (maximum {MAX_IMAGES_PER_SUBMISSION})",
+            status_code=413
+        )
+    
+    # Hash the spooled uploads in chunks, off the event loop
+    with STAGE_SECONDS.time("upload_read"):
+        image_digests = [
+            await asyncio.to_thread(upload_digest, file.file) for file in files
+        ]
+    
+    # Filtering on probability needs it even when it is not returned
+    fetch_fields = fields
+    if fields is not None and min_probability is not None and "probability" not in fields:
+        fetch_fields = fields + ("probability",)
+    
+    # Serve repeated submissions from the cache
+    cache_key = identification_cache_key(
+        combined_digest(image_digests), include_health_assessment, detailed_info, fetch_fields
+    )
+    cached_result = await identification_cache.get(cache_key)
+    if cached_result is not None:
+        return limit_results(cached_result, top_k, min_probability, fields), {}
+    if fetch_fields is not None:
+        # A cached full result for the same images has every projected field
+        full_result = await identification_cache.get(identification_cache_key(
+            combined_digest(image_digests), include_health_assessment, detailed_info
+        ))
+        if full_result is not None:
+            return limit_results(full_result, top_k, min_probability, fields, project=True), {}
+    
+    # Serve re-taken or recompressed photos of an identified plant from the
+    # near-duplicate index (single-image submissions only)
+    modifiers = modifiers_key(include_health_assessment, detailed_info, fetch_fields)
+    image_hash = None
+    if perceptual_index.enabled and len(files) == 1:
+        with STAGE_SECONDS.time("perceptual_hash"):
+            image_data = await asyncio.to_thread(files[0].file.read)
+            files[0].file.seek(0)
+            image_hash = await perceptual_index.hash(image_data)
+            del image_data
+        match = perceptual_index.lookup(modifiers, image_hash) if image_hash is not None else None
+        if match is not None:
+            distance, similar_result = match
+            await identification_cache.set(cache_key, similar_result)
+            report = {"X-Near-Duplicate-Distance": str(distance)}
+            return limit_results(similar_result, top_k, min_probability, fields), report
+    
+    async def identify_upstream():
+        encoded_images = []
+        original_bytes = sent_bytes = 0
+        for file in files:
+            encoded_image, original_size, sent_size = await encode_for_upstream(file)
+            encoded_images.append(encoded_image)
+            original_bytes += original_size
+            sent_bytes += sent_size
+        
+        # Call Plant.id API with all images in one request (or the local
+        # classifier, depending on the routing policy)
+        started = time.perf_counter()
+        result = await identification_router.identify_plant(
+            encoded_images,
+            include_health_assessment=include_health_assessment,
+            detailed_info=detailed_info,
+            fields=fetch_fields
+        )
+        latency_ms = (time.perf_counter() - started) * 1000
+        
+        image_preprocessor.record_upstream_latency(latency_ms, sent_bytes < original_bytes)
+        logger.info(
+            f"Identified submission {cache_key} ({len(files)} images): "
+            f"{original_bytes} bytes uploaded, {sent_bytes} bytes sent upstream, "
+            f"upstream latency {latency_ms:.0f} ms"
+        )
+        
+        # Local answers are a stopgap; the next request should try the upstream again
+        source = result.get("source", "plant_id")
+        if source != "local":
+            await identification_cache.set(cache_key, result)
+            if image_hash is not None:
+                perceptual_index.add(modifiers, image_hash, result)
+        report = {
+            "X-Image-Original-Bytes": str(original_bytes),
+            "X-Image-Sent-Bytes": str(sent_bytes),
+            "X-Upstream-Latency-Ms": f"{latency_ms:.0f}",
+            "X-Identification-Source": source,
+        }
+        return result, report
+    
+    # Concurrent identical submissions share one upstream call
+    result, report = await identify_flight.do(cache_key, identify_upstream)
+    return limit_results(result, top_k, min_probability, fields), report
+
+
 @app.post("/identify", response_model=IdentificationResponse)
 async def identify_plant(
-    file: UploadFile = File(...),
+    file: List[UploadFile] = File(...),
     include_health_assessment: bool = True,
     detailed_info: bool = True,
+    top_k: Optional[int] = Query(None, ge=1),
+    min_probability: Optional[float] = Query(None, ge=0, le=1),
+    fields: Optional[str] = None,
 ):
     """
-    Identify a plant from an uploaded image
+    Identify a plant from one or more uploaded images
     
-    - **file**: Image file to analyze
+    - **file**: Image file to analyze; repeat the field to send several photos of
+      the same plant (e.g. leaf, flower and whole plant), which are identified together
     - **include_health_assessment**: Whether to include plant health assessment
     - **detailed_info**: Whether to include detailed plant information
+    - **top_k**: Return at most this many suggestions
+    - **min_probability**: Only return suggestions at least this probable
+    - **fields**: Comma-separated suggestion fields to return (e.g.
+      `scientific_name,common_name,probability`); only the plant details these
+      fields need are requested from Plant.id
     """
+    projection = parse_fields(fields)
     try:
-        # Read image file
-        image_data = await file.read()
+        identification_result, report = await identify_upload(
+            file, include_health_assessment, detailed_info,
+            projection, top_k, min_probability
+        )
         
-        # Encode image to base64
-        encoded_image = base64.b64encode(image_data).decode("ascii")
+        # The result already has the response model's shape; skip re-validation
+        return json_response(identification_result, headers=report)
+    
+    except PlantIdError as e:
+        logger.error(f"Plant.id API error: {str(e)}")
+        raise HTTPException(status_code=e.status_code, detail=str(e))
+    
+    except Exception as e:
+        logger.error(f"Error processing request: {str(e)}")
+        raise HTTPException(status_code=500, detail=f"Error processing request: {str(e)}")
+
+
+def health_check_result(result: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Build a health check response from an identification result
+    
+    Args:
+        result: Identification result with the ``HEALTH_CHECK_FIELDS`` of each suggestion
         
-        # Call Plant.id API
-        identification_result = await plant_id_client.identify_plant(
-            encoded_image,
-            include_health_assessment=include_health_assessment,
-            detailed_info=detailed_info
+    Returns:
+        Dict with the shape of ``HealthCheckResponse``; the health verdict is the
+        assessment of the most probable suggestion
+    """
+    suggestions = result["results"]
+    health = (suggestions[0].get("health_assessment") if suggestions else None) or {}
+    return {
+        "is_plant": result["is_plant"],
+        "is_healthy": health.get("is_healthy"),
+        "disease_name": health.get("disease_name"),
+        "probability": health.get("probability"),
+        "treatment": health.get("treatment"),
+        "suggestions": [
+            {
+                "id": suggestion["id"],
+                "scientific_name": suggestion["scientific_name"],
+                "common_name": suggestion["common_name"],
+                "probability": suggestion["probability"],
+                "details_url": f"/plant/{suggestion['id']}",
+            }
+            for suggestion in suggestions
+        ],
+        "submission_id": result["submission_id"],
+        "source": result.get("source", "plant_id"),
+    }
+
+
+def prefetch_plant_details(plant_id: str) -> None:
+    """Load plant details into the store in the background, ignoring failures"""
+    async def prefetch():
+        try:
+            await fetch_plant_details(plant_id)
+        except Exception as e:
+            logger.warning(f"Prefetching details of plant {plant_id} failed: {str(e)}")
+    
+    task = asyncio.ensure_future(prefetch())
+    detail_prefetches.add(task)
+    task.add_done_callback(detail_prefetches.discard)
+
+
+@app.post("/health-check", response_model=HealthCheckResponse)
+async def check_plant_health(
+    file: List[UploadFile] = File(...),
+    top_k: Optional[int] = Query(None, ge=1),
+):
+    """
+    Quick "is this plant sick?" check from one or more uploaded images
+    
+    Only the names and the health assessment are requested from Plant.id, which
+    keeps the upstream response small and fast. Care info, descriptions and
+    images of a suggestion are fetched later from its `details_url`
+    (`/plant/{id}`, which also accepts `fields`).
+    
+    - **file**: Image file to analyze; repeat the field to send several photos of the same plant
+    - **top_k**: Return at most this many suggestions
+    """
+    try:
+        identification_result, report = await identify_upload(
+            file, True, False, HEALTH_CHECK_FIELDS, top_k
         )
+        result = health_check_result(identification_result)
+        
+        if (
+            HEALTH_CHECK_PREFETCH_DETAILS
+            and result["suggestions"]
+            and result["source"] != "local"
+        ):
+            prefetch_plant_details(result["suggestions"][0]["id"])
         
-        return identification_result
+        return json_response(result, headers=report)
     
     except PlantIdError as e:
         logger.error(f"Plant.id API error: {str(e)}")
@@ -127,16 +720,174 @@ async def identify_plant(
         raise HTTPException(status_code=500, detail=f"Error processing request: {str(e)}")
 
 
+@app.post("/identify/batch")
+async def identify_plants_batch(
+    files: List[UploadFile] = File(...),
+    include_health_assessment: bool = True,
+    detailed_info: bool = True,
+    top_k: Optional[int] = Query(None, ge=1),
+    min_probability: Optional[float] = Query(None, ge=0, le=1),
+    fields: Optional[str] = None,
+):
+    """
+    Identify plants from several uploaded images
+    
+    Results are streamed back as newline-delimited JSON, one line per image in
+    completion order. Each line carries the image's `index` in the upload and
+    either a `result` or an `error`; a failed image does not affect the others.
+    
+    - **files**: Image files to analyze
+    - **include_health_assessment**: Whether to include plant health assessment
+    - **detailed_info**: Whether to include detailed plant information
+    - **top_k**, **min_probability**, **fields**: As for `/identify`
+    """
+    projection = parse_fields(fields)
+    if len(files) > BATCH_MAX_FILES:
+        raise HTTPException(
+            status_code=413,
+            detail=f"Too many files: {len(files)} (maximum {BATCH_MAX_FILES})"
+        )
+    
+    semaphore = asyncio.Semaphore(BATCH_CONCURRENCY)
+    
+    async def identify_item(index: int, file: UploadFile) -> Dict[str, Any]:
+        item = {"index": index, "filename": file.filename}
+        try:
+            async with semaphore:
+                result, _ = await identify_upload(
+                    [file], include_health_assessment, detailed_info,
+                    projection, top_k, min_probability
+                )
+            item.update(status=200, result=result)
+        except PlantIdError as e:
+            logger.error(f"Plant.id API error for batch item {index}: {str(e)}")
+            item.update(status=e.status_code, error=str(e))
+        except Exception as e:
+            logger.error(f"Error processing batch item {index}: {str(e)}")
+            item.update(status=500, error=f"Error processing request: {str(e)}")
+        return item
+    
+    async def stream_results():
+        tasks = [
+            asyncio.ensure_future(identify_item(index, file))
+            for index, file in enumerate(files)
+        ]
+        try:
+            for next_item in asyncio.as_completed(tasks):
+                item = await next_item
+                with STAGE_SECONDS.time("serialize"):
+                    line = orjson.dumps(item) + b"\n"
+                yield line
+        finally:
+            # Stop outstanding work if the client goes away mid-stream
+            for task in tasks:
+                task.cancel()
+    
+    return StreamingResponse(stream_results(), media_type="application/x-ndjson")
+
+
+@app.post("/identify/jobs", status_code=202)
+async def submit_identification_job(
+    file: List[UploadFile] = File(...),
+    include_health_assessment: bool = True,
+    detailed_info: bool = True,
+    top_k: Optional[int] = Query(None, ge=1),
+    min_probability: Optional[float] = Query(None, ge=0, le=1),
+    fields: Optional[str] = None,
+    callback_url: Optional[str] = None,
+):
+    """
+    Queue a plant identification and return its job ID immediately
+    
+    Poll `/identify/jobs/{job_id}` for the result, or pass a `callback_url` the
+    finished job is POSTed to. Responds with 503 when the job queue is full.
+    
+    - **file**, **include_health_assessment**, **detailed_info**, **top_k**,
+      **min_probability**, **fields**: As for `/identify`
+    - **callback_url**: http(s) URL that receives the finished job as JSON
+    """
+    projection = parse_fields(fields)
+    if len(file) > MAX_IMAGES_PER_SUBMISSION:
+        raise HTTPException(
+            status_code=413,
+            detail=f"Too many images: {len(file)} (maximum {MAX_IMAGES_PER_SUBMISSION})"
+        )
+    if callback_url is not None:
+        try:
+            await identification_jobs.validate_callback_url(callback_url)
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+    
+    # The uploads are closed once this response is sent, so the job keeps copies
+    uploads = [
+        UploadFile(filename=upload.filename, file=await asyncio.to_thread(spool_copy, upload.file))
+        for upload in file
+    ]
+    
+    async def work():
+        result, _ = await identify_upload(
+            uploads, include_health_assessment, detailed_info,
+            projection, top_k, min_probability
+        )
+        return result
+    
+    def cleanup():
+        for upload in uploads:
+            upload.file.close()
+    
+    try:
+        job = identification_jobs.submit(work, callback_url, cleanup)
+    except JobQueueFull as e:
+        cleanup()
+        raise HTTPException(status_code=503, detail=str(e), headers={"Retry-After": "1"})
+    
+    return {
+        "job_id": job.id,
+        "status": job.status,
+        "status_url": f"/identify/jobs/{job.id}",
+    }
+
+
+@app.get("/identify/jobs/{job_id}")
+async def get_identification_job(job_id: str):
+    """
+    Get the status and, once finished, the result of an identification job
+    
+    - **job_id**: ID returned when the job was submitted
+    """
+    job = identification_jobs.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail=f"Unknown or expired job: {job_id}")
+    return json_response(job.to_dict())
+
+
+async def fetch_plant_details(plant_id: str) -> Dict[str, Any]:
+    """
+    Plant details from the local store
+    
+    The upstream is only hit for unknown or expired plants, and expired ones are
+    refreshed in the background.
+    """
+    return await plant_details_store.get(
+        plant_id,
+        lambda: plant_details_flight.do(
+            plant_id, lambda: plant_id_client.get_plant_details(plant_id)
+        )
+    )
+
+
 @app.get("/plant/{plant_id}", response_model=PlantIdentificationResult)
-async def get_plant_details(plant_id: str):
+async def get_plant_details(plant_id: str, fields: Optional[str] = None):
     """
     Get detailed information about a specific plant
     
     - **plant_id**: ID of the plant to retrieve details for
+    - **fields**: Comma-separated fields to return, as for `/identify`
     """
+    projection = parse_fields(fields)
     try:
-        plant_details = await plant_id_client.get_plant_details(plant_id)
-        return plant_details
+        plant_details = await fetch_plant_details(plant_id)
+        return json_response(project_fields(plant_details, projection))
     
     except PlantIdError as e:
         logger.error(f"Plant.id API error: {str(e)}")
@@ -148,5 +899,15 @@ async def get_plant_details(plant_id: str):
 
 
 if __name__ == "__main__":
+    # Development server; production runs through serve.py
     import uvicorn
-    uvicorn.run("main:app", host="0.0.0.0", port=8000, reload=True)
+    from dotenv import load_dotenv
+    
+    # Loaded before uvicorn imports the app, whose settings are read at import
+    load_dotenv()
+    uvicorn.run(
+        "main:app",
+        host=os.getenv("HOST", "0.0.0.0"),
+        port=int(os.getenv("PORT", "8000")),
+        reload=os.getenv("RELOAD", "false").lower() == "true",
+    )
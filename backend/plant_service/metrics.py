@@ -0,0 +1,328 @@
+"""
+Service Metrics
+Minimal in-process counters, gauges and histograms rendered in the Prometheus text
+exposition format, the metrics the service records, and an ASGI middleware that
+counts and times every HTTP request.
+
+Metrics are per process; with several server workers each one is scraped (or
+aggregated) separately.
+"""
+import bisect
+import time
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Iterator, List, Sequence, Tuple
+
+# Constants
+DEFAULT_BUCKETS = (
+    0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0
+)
+CONTENT_TYPE = "text/plain; version=0.0.4"
+
+LabelValues = Tuple[str, ...]
+
+
+def _escape(value: str) -> str:
+    """Escape a label value for the text format"""
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(names: Sequence[str], values: Sequence[str]) -> str:
+    """Render a label set, e.g. {stage="encode"}"""
+    if not names:
+        return ""
+    pairs = ",".join(f'{name}="{_escape(value)}"' for name, value in zip(names, values))
+    return "{" + pairs + "}"
+
+
+def _format_value(value: float) -> str:
+    """Render a sample value"""
+    if value == float("inf"):
+        return "+Inf"
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+
+class Metric:
+    """Base class of a named metric with a fixed set of label names"""
+
+    kind = "untyped"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+
+    def _key(self, labelvalues: Sequence[Any]) -> LabelValues:
+        if len(labelvalues) != len(self.labelnames):
+            raise ValueError(f"{self.name} expects labels {self.labelnames}, got {labelvalues}")
+        return tuple(str(value) for value in labelvalues)
+
+    def samples(self) -> Iterator[str]:
+        raise NotImplementedError
+
+    def render(self) -> str:
+        lines = [
+            f"# HELP {self.name} {self.documentation}",
+            f"# TYPE {self.name} {self.kind}",
+        ]
+        lines.extend(self.samples())
+        return "\n".join(lines)
+
+
+class Counter(Metric):
+    """Monotonically increasing count"""
+
+    kind = "counter"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        super().__init__(name, documentation, labelnames)
+        self._values: Dict[LabelValues, float] = {}
+
+    def inc(self, *labelvalues: Any, amount: float = 1) -> None:
+        key = self._key(labelvalues)
+        self._values[key] = self._values.get(key, 0) + amount
+
+    def value(self, *labelvalues: Any) -> float:
+        return self._values.get(self._key(labelvalues), 0)
+
+    def samples(self) -> Iterator[str]:
+        for key, value in sorted(self._values.items()):
+            yield f"{self.name}{_format_labels(self.labelnames, key)} {_format_value(value)}"
+
+
+class Gauge(Metric):
+    """Value that goes up and down"""
+
+    kind = "gauge"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        super().__init__(name, documentation, labelnames)
+        self._values: Dict[LabelValues, float] = {}
+
+    def inc(self, *labelvalues: Any, amount: float = 1) -> None:
+        key = self._key(labelvalues)
+        self._values[key] = self._values.get(key, 0) + amount
+
+    def dec(self, *labelvalues: Any, amount: float = 1) -> None:
+        self.inc(*labelvalues, amount=-amount)
+
+    def set(self, value: float, *labelvalues: Any) -> None:
+        self._values[self._key(labelvalues)] = value
+
+    def value(self, *labelvalues: Any) -> float:
+        return self._values.get(self._key(labelvalues), 0)
+
+    @contextmanager
+    def track(self, *labelvalues: Any) -> Iterator[None]:
+        """Increment the gauge for the duration of a block"""
+        self.inc(*labelvalues)
+        try:
+            yield
+        finally:
+            self.dec(*labelvalues)
+
+    def samples(self) -> Iterator[str]:
+        for key, value in sorted(self._values.items()):
+            yield f"{self.name}{_format_labels(self.labelnames, key)} {_format_value(value)}"
+
+
+class Histogram(Metric):
+    """Distribution of observations in cumulative buckets"""
+
+    kind = "histogram"
+
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        labelnames: Sequence[str] = (),
+        buckets: Sequence[float] = DEFAULT_BUCKETS
+    ):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+        # Per label set: [per-bucket counts (last is +Inf), sum]
+        self._values: Dict[LabelValues, List[Any]] = {}
+
+    def observe(self, value: float, *labelvalues: Any) -> None:
+        key = self._key(labelvalues)
+        entry = self._values.get(key)
+        if entry is None:
+            entry = self._values[key] = [[0] * (len(self.buckets) + 1), 0.0]
+        entry[0][bisect.bisect_left(self.buckets, value)] += 1
+        entry[1] += value
+
+    @contextmanager
+    def time(self, *labelvalues: Any) -> Iterator[None]:
+        """Observe the duration of a block in seconds"""
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - started, *labelvalues)
+
+    def count(self, *labelvalues: Any) -> int:
+        entry = self._values.get(self._key(labelvalues))
+        return sum(entry[0]) if entry is not None else 0
+
+    def samples(self) -> Iterator[str]:
+        names = self.labelnames + ("le",)
+        for key, (counts, total) in sorted(self._values.items()):
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float("inf"),), counts):
+                cumulative += count
+                labels = _format_labels(names, key + (_format_value(bound),))
+                yield f"{self.name}_bucket{labels} {cumulative}"
+            labels = _format_labels(self.labelnames, key)
+            yield f"{self.name}_sum{labels} {_format_value(total)}"
+            yield f"{self.name}_count{labels} {cumulative}"
+
+
+class Registry:
+    """Collection of metrics rendered together"""
+
+    def __init__(self):
+        self._metrics: List[Metric] = []
+
+    def register(self, metric: Metric) -> Metric:
+        self._metrics.append(metric)
+        return metric
+
+    def render(self) -> str:
+        """Render every metric in the Prometheus text format"""
+        return "\n".join(metric.render() for metric in self._metrics) + "\n"
+
+
+REGISTRY = Registry()
+
+HTTP_REQUESTS = REGISTRY.register(Counter(
+    "plant_service_http_requests_total",
+    "HTTP requests handled, by route and status code",
+    ("method", "route", "status"),
+))
+HTTP_REQUEST_SECONDS = REGISTRY.register(Histogram(
+    "plant_service_http_request_duration_seconds",
+    "Time to handle an HTTP request, including streaming the response",
+    ("method", "route"),
+))
+HTTP_IN_FLIGHT = REGISTRY.register(Gauge(
+    "plant_service_http_requests_in_flight",
+    "HTTP requests currently being handled",
+))
+STAGE_SECONDS = REGISTRY.register(Histogram(
+    "plant_service_stage_duration_seconds",
+    "Time spent in each stage of the identify pipeline "
+    "(upload_read, perceptual_hash, preprocess, encode, parse, transform, serialize)",
+    ("stage",),
+))
+UPSTREAM_PHASE_SECONDS = REGISTRY.register(Histogram(
+    "plant_service_upstream_phase_duration_seconds",
+    "Time spent in each phase of a Plant.id request: connection_wait (pool, "
+    "connect and TLS), request_send, server (until response headers) and response_read",
+    ("operation", "phase"),
+))
+UPSTREAM_RESPONSES = REGISTRY.register(Counter(
+    "plant_service_upstream_responses_total",
+    "Plant.id responses, by status code",
+    ("operation", "status"),
+))
+UPSTREAM_IN_FLIGHT = REGISTRY.register(Gauge(
+    "plant_service_upstream_requests_in_flight",
+    "Plant.id requests currently in flight",
+    ("operation",),
+))
+PLANT_ID_ERRORS = REGISTRY.register(Counter(
+    "plant_service_plant_id_errors_total",
+    "PlantIdErrors raised for upstream attempts, by kind and status code "
+    "(circuit_open, admission_rejected, upstream_status, transport, invalid_response, unexpected)",
+    ("kind", "status"),
+))
+
+# Ordered trace events marking the boundaries of the upstream phases
+UPSTREAM_PHASES = (
+    ("connection_wait", "send_request_headers.started"),
+    ("request_send", "send_request_body.complete"),
+    ("server", "receive_response_headers.complete"),
+)
+
+
+def upstream_trace(timings: Dict[str, float]) -> Callable[[str, Dict[str, Any]], Any]:
+    """
+    Build an httpx "trace" extension that records when each event happened
+
+    Event names are stored without their "http11." / "http2." prefix.
+    """
+    async def trace(event_name: str, info: Dict[str, Any]) -> None:
+        timings[event_name.partition(".")[2]] = time.perf_counter()
+    return trace
+
+
+def record_upstream_phases(
+    operation: str,
+    started: float,
+    finished: float,
+    timings: Dict[str, float]
+) -> None:
+    """
+    Record the phases of one upstream request from its trace timings
+
+    Args:
+        operation: Upstream operation, e.g. "identify"
+        started: perf_counter() when the request was started
+        finished: perf_counter() when the response body was read
+        timings: Event times collected by ``upstream_trace``
+    """
+    previous = started
+    for phase, event in UPSTREAM_PHASES:
+        at = timings.get(event)
+        if at is None:
+            return
+        UPSTREAM_PHASE_SECONDS.observe(at - previous, operation, phase)
+        previous = at
+    UPSTREAM_PHASE_SECONDS.observe(finished - previous, operation, "response_read")
+
+
+class MetricsMiddleware:
+    """ASGI middleware counting and timing HTTP requests by route template"""
+
+    def __init__(self, app: Callable):
+        self.app = app
+        self._routes: Dict[Any, str] = {}
+
+    async def __call__(self, scope: Dict[str, Any], receive: Callable, send: Callable) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        status = 500
+        started = time.perf_counter()
+
+        async def send_with_status(message: Dict[str, Any]) -> None:
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        HTTP_IN_FLIGHT.inc()
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            HTTP_IN_FLIGHT.dec()
+            route = self._route(scope)
+            HTTP_REQUESTS.inc(scope["method"], route, status)
+            HTTP_REQUEST_SECONDS.observe(time.perf_counter() - started, scope["method"], route)
+
+    def _route(self, scope: Dict[str, Any]) -> str:
+        """Route template of the matched endpoint, so IDs do not become labels"""
+        endpoint = scope.get("endpoint")
+        if endpoint is None:
+            return "unmatched"
+        route = self._routes.get(endpoint)
+        if route is None:
+            route = "unmatched"
+            for candidate in getattr(scope.get("app"), "routes", ()):
+                if getattr(candidate, "endpoint", None) is endpoint:
+                    route = candidate.path
+                    break
+            self._routes[endpoint] = route
+        return route
@@ -0,0 +1,270 @@
+"""
+Perceptual Hash Index
+Near-duplicate lookup for identification results. Each identified image gets a
+64-bit difference hash (dHash) computed from a small grayscale thumbnail, which
+survives recompression, resizing and metadata changes. Hashes are kept in a
+BK-tree per request-modifier set, so a new photo whose hash is within a small
+Hamming distance of a previously identified one reuses that result instead of
+calling the upstream again.
+"""
+import asyncio
+import io
+import logging
+import os
+import time
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from PIL import Image, ImageOps
+
+logger = logging.getLogger(__name__)
+
+# Constants
+HASH_SIZE = 8
+DEFAULT_MAX_DISTANCE = 4
+DEFAULT_MAX_ENTRIES = 10000
+DEFAULT_TTL_SECONDS = 24 * 60 * 60
+# Fraction of the oldest entries dropped when the index is full
+EVICTION_FRACTION = 0.25
+
+
+def dhash(data: bytes, hash_size: int = HASH_SIZE) -> int:
+    """
+    Compute the difference hash of an image
+
+    Each bit tells whether a pixel of a (hash_size + 1) x hash_size grayscale
+    thumbnail is darker than its right-hand neighbour.
+
+    Args:
+        data: Raw image bytes
+        hash_size: Bits per row and number of rows
+
+    Returns:
+        The hash as an integer of hash_size * hash_size bits
+    """
+    with Image.open(io.BytesIO(data)) as image:
+        # Let the JPEG decoder scale down while decoding
+        image.draft("L", (hash_size * 8, hash_size * 8))
+        image = ImageOps.exif_transpose(image)
+        thumbnail = image.convert("L").resize((hash_size + 1, hash_size), Image.Resampling.LANCZOS)
+        pixels = list(thumbnail.getdata())
+
+    bits = 0
+    for row in range(hash_size):
+        offset = row * (hash_size + 1)
+        for col in range(offset, offset + hash_size):
+            bits = (bits << 1) | (pixels[col] < pixels[col + 1])
+    return bits
+
+
+def hamming_distance(a: int, b: int) -> int:
+    """Number of differing bits between two hashes"""
+    return bin(a ^ b).count("1")
+
+
+class BKTree:
+    """Burkhard-Keller tree over integer hashes with the Hamming distance"""
+
+    def __init__(self):
+        # A node is [hash, value, {distance: child node}]
+        self._root: Optional[List[Any]] = None
+        self.size = 0
+
+    def add(self, key: int, value: Any) -> None:
+        """Insert a hash, replacing the value of an identical hash"""
+        if self._root is None:
+            self._root = [key, value, {}]
+            self.size = 1
+            return
+
+        node = self._root
+        while True:
+            distance = hamming_distance(key, node[0])
+            if distance == 0:
+                node[1] = value
+                return
+            child = node[2].get(distance)
+            if child is None:
+                node[2][distance] = [key, value, {}]
+                self.size += 1
+                return
+            node = child
+
+    def nearest(
+        self,
+        key: int,
+        max_distance: int,
+        accept: Optional[Callable[[Any], bool]] = None
+    ) -> Optional[Tuple[int, Any]]:
+        """
+        Find the closest hash within a maximum distance
+
+        Args:
+            key: Hash to look up
+            max_distance: Maximum Hamming distance of a match
+            accept: Predicate a value must satisfy to match (e.g. not expired)
+
+        Returns:
+            (distance, value) of the closest match, or None
+        """
+        if self._root is None:
+            return None
+
+        best: Optional[Tuple[int, Any]] = None
+        radius = max_distance
+        stack = [self._root]
+        while stack:
+            node = stack.pop()
+            distance = hamming_distance(key, node[0])
+            if distance <= radius and (accept is None or accept(node[1])):
+                best = (distance, node[1])
+                if distance == 0:
+                    break
+                radius = distance
+            # By the triangle inequality only these children can hold matches
+            for child_distance, child in node[2].items():
+                if distance - radius <= child_distance <= distance + radius:
+                    stack.append(child)
+        return best
+
+
+class PerceptualIndex:
+    """Bounded, expiring near-duplicate index of identification results"""
+
+    def __init__(
+        self,
+        max_distance: int = DEFAULT_MAX_DISTANCE,
+        max_entries: int = DEFAULT_MAX_ENTRIES,
+        ttl_seconds: float = DEFAULT_TTL_SECONDS,
+        workers: Optional[int] = None,
+        enabled: bool = True
+    ):
+        """
+        Initialize the index
+
+        Args:
+            max_distance: Maximum Hamming distance (out of 64 bits) at which two
+                images are treated as the same photo
+            max_entries: Maximum number of indexed images
+            ttl_seconds: Time in seconds after which an entry is no longer used
+            workers: Number of hashing worker processes (defaults to the CPU count)
+            enabled: Whether near-duplicate lookup is used
+        """
+        self.max_distance = max_distance
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.workers = workers or os.cpu_count() or 1
+        self.enabled = enabled
+        self._pool: Optional[ProcessPoolExecutor] = None
+        self._trees: Dict[str, BKTree] = {}
+        # (namespace, hash) -> (expires_at, result), oldest first
+        self._entries: "OrderedDict[Tuple[str, int], Tuple[float, Dict[str, Any]]]" = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.hash_failures = 0
+        self.rebuilds = 0
+
+    def start(self) -> None:
+        """Start the hashing worker processes"""
+        if self.enabled and self._pool is None:
+            self._pool = ProcessPoolExecutor(max_workers=self.workers)
+            logger.info(
+                f"Perceptual hash index started ({self.workers} workers, "
+                f"max_distance={self.max_distance})"
+            )
+
+    def close(self) -> None:
+        """Stop the hashing worker processes"""
+        if self._pool is not None:
+            pool, self._pool = self._pool, None
+            pool.shutdown(wait=True, cancel_futures=True)
+
+    async def hash(self, data: bytes) -> Optional[int]:
+        """
+        Hash an image in a worker process
+
+        Args:
+            data: Raw image bytes
+
+        Returns:
+            The image's dHash, or None if Pillow cannot decode it
+        """
+        if self._pool is None:
+            self.start()
+
+        loop = asyncio.get_running_loop()
+        try:
+            return await loop.run_in_executor(self._pool, dhash, data)
+        except (OSError, ValueError, Image.DecompressionBombError) as e:
+            logger.warning(f"Perceptual hashing skipped: {str(e)}")
+            self.hash_failures += 1
+            return None
+
+    def lookup(self, namespace: str, image_hash: int) -> Optional[Tuple[int, Dict[str, Any]]]:
+        """
+        Find the result of the most similar indexed image
+
+        Args:
+            namespace: Request modifiers the result must have been produced with
+            image_hash: Hash of the new image
+
+        Returns:
+            (distance, identification result), or None if no image is close enough
+        """
+        tree = self._trees.get(namespace)
+        now = time.time()
+        match = None
+        if tree is not None:
+            match = tree.nearest(image_hash, self.max_distance, lambda entry: entry[0] > now)
+        if match is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        distance, (_, result) = match
+        return distance, result
+
+    def add(self, namespace: str, image_hash: int, result: Dict[str, Any]) -> None:
+        """
+        Index the result of an identified image
+
+        Args:
+            namespace: Request modifiers the result was produced with
+            image_hash: Hash of the image
+            result: Identification result
+        """
+        entry = (time.time() + self.ttl_seconds, result)
+        key = (namespace, image_hash)
+        self._entries[key] = entry
+        self._entries.move_to_end(key)
+        self._trees.setdefault(namespace, BKTree()).add(image_hash, entry)
+        if len(self._entries) > self.max_entries:
+            self._evict()
+
+    def stats(self) -> Dict[str, Any]:
+        """Return index counters"""
+        return {
+            "enabled": self.enabled,
+            "entries": len(self._entries),
+            "max_distance": self.max_distance,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hash_failures": self.hash_failures,
+            "rebuilds": self.rebuilds,
+        }
+
+    def _evict(self) -> None:
+        """Drop expired and the oldest entries, then rebuild the trees"""
+        # BK-trees do not support removal, so a batch is dropped at once and the
+        # trees are rebuilt from what is left
+        now = time.time()
+        keep = int(self.max_entries * (1 - EVICTION_FRACTION))
+        entries = [
+            (key, entry) for key, entry in self._entries.items() if entry[0] > now
+        ]
+        entries = entries[max(0, len(entries) - keep):]
+        self._entries = OrderedDict(entries)
+        self._trees = {}
+        for (namespace, image_hash), entry in entries:
+            self._trees.setdefault(namespace, BKTree()).add(image_hash, entry)
+        self.rebuilds += 1
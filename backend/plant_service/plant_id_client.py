@@ -2,66 +2,479 @@
 Plant.id API Client
 Handles communication with the Plant.id API for plant identification and health assessment.
 """
-import json
-import logging
-from typing import Dict, Any, List, Optional
-import requests
+import time
 import asyncio
-from pydantic import BaseModel
+import logging
+from typing import Dict, Any, AsyncIterator, List, Optional, Sequence, Union
+import httpx
+import orjson
+
+from admission import CANCELLED, AdmissionController, AdmissionRejected
+from metrics import (
+    PLANT_ID_ERRORS, STAGE_SECONDS, UPSTREAM_IN_FLIGHT, UPSTREAM_RESPONSES,
+    record_upstream_phases, upstream_trace
+)
+from resilience import CircuitBreaker, LatencyTracker, RetryPolicy
 
-# Configure logging
-logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
 # Constants
 PLANT_ID_API_BASE_URL = "https://api.plant.id/v2"
+DEFAULT_TIMEOUT = 30.0
+DEFAULT_CONNECT_TIMEOUT = 5.0
+DEFAULT_MAX_CONNECTIONS = 100
+DEFAULT_MAX_KEEPALIVE_CONNECTIONS = 20
+DEFAULT_KEEPALIVE_EXPIRY = 30.0
+BODY_CHUNK_SIZE = 64 * 1024
+# Bytes of an upstream error body kept in logs and error messages
+MAX_ERROR_BODY_BYTES = 1024
+
+# Upstream statuses meaning the request was not processed, so any request may be resent
+RETRY_SAFE_STATUSES = (429, 502, 503, 504)
+# Transport errors raised before the request reached the upstream
+NOT_SENT_ERRORS = (httpx.ConnectError, httpx.ConnectTimeout, httpx.PoolTimeout)
+# Maximum fraction of hedgeable requests that may be hedged
+HEDGE_BUDGET = 0.1
+
+# Care fields extracted from the plant details
+CARE_FIELDS = ("watering", "sunlight", "soil", "propagation", "pruning")
+
+# Fields of a transformed suggestion, in response order
+RESPONSE_FIELDS = (
+    "id", "scientific_name", "common_name", "family", "probability",
+    "description", "care_info", "health_assessment", "image_url"
+)
+
+# Suggestion fields of a health check: with these only the common names and the
+# health assessment are requested upstream (no similar images or care details)
+HEALTH_CHECK_FIELDS = ("id", "scientific_name", "common_name", "probability", "health_assessment")
+
+# Upstream plant details each response field is built from
+FIELD_PLANT_DETAILS = {
+    "common_name": ("common_names",),
+    "family": ("taxonomy",),
+    "description": ("wiki_description",),
+    "care_info": CARE_FIELDS,
+}
+_EMPTY: Dict[str, Any] = {}
+
+# A base64-encoded image, as a string or ASCII bytes
+Base64Image = Union[str, bytes, bytearray]
+
+try:
+    import h2  # noqa: F401
+    HTTP2_AVAILABLE = True
+except ImportError:
+    HTTP2_AVAILABLE = False
 
 
 class PlantIdError(Exception):
     """Custom exception for Plant.id API errors"""
     
-    def __init__(self, message: str, status_code: int = 500):
+    def __init__(self, message: str, status_code: int = 500, retryable: bool = False):
         self.message = message
         self.status_code = status_code
+        self.retryable = retryable
         super().__init__(self.message)
 
 
+class ImageJsonBody:
+    """
+    JSON request body that embeds base64 images without copying them
+    
+    The body is sent as a sequence of chunks: the JSON prefix, slices of each
+    encoded image buffer and the JSON suffix. Base64 never needs JSON escaping,
+    so the images can be spliced in verbatim. The body can be iterated more than
+    once, so the request can be re-sent.
+    """
+    
+    def __init__(self, images: List[Union[bytes, bytearray]], payload: Dict[str, Any]):
+        """
+        Args:
+            images: Base64-encoded images as ASCII bytes
+            payload: Remaining (non-image) request fields
+        """
+        self.images = images
+        self.prefix = b'{"images":["'
+        self.separator = b'","'
+        rest = orjson.dumps(payload)
+        self.suffix = b'"]' + (b"," + rest[1:] if payload else b"}")
+        self.length = (
+            len(self.prefix)
+            + sum(len(image) for image in images)
+            + len(self.separator) * max(len(images) - 1, 0)
+            + len(self.suffix)
+        )
+    
+    async def __aiter__(self) -> AsyncIterator[Union[bytes, memoryview]]:
+        yield self.prefix
+        for index, image in enumerate(self.images):
+            if index:
+                yield self.separator
+            view = memoryview(image)
+            for start in range(0, len(view), BODY_CHUNK_SIZE):
+                yield view[start:start + BODY_CHUNK_SIZE]
+        yield self.suffix
+
+
 class PlantIdClient:
     """Client for interacting with the Plant.id API"""
     
-    def __init__(self, api_key: str):
+    def __init__(
+        self,
+        api_key: str,
+        base_url: str = PLANT_ID_API_BASE_URL,
+        timeout: float = DEFAULT_TIMEOUT,
+        connect_timeout: float = DEFAULT_CONNECT_TIMEOUT,
+        max_connections: int = DEFAULT_MAX_CONNECTIONS,
+        max_keepalive_connections: int = DEFAULT_MAX_KEEPALIVE_CONNECTIONS,
+        keepalive_expiry: float = DEFAULT_KEEPALIVE_EXPIRY,
+        http2: bool = True,
+        admission: Optional[AdmissionController] = None,
+        retry_policy: Optional[RetryPolicy] = None,
+        circuit_breaker: Optional[CircuitBreaker] = None,
+        hedge_percentile: Optional[float] = None,
+    ):
         """
         Initialize the Plant.id API client
         
+        The underlying connection pool is created lazily on first use (or by
+        ``start()``) and must be released with ``close()``.
+        
         Args:
             api_key: Plant.id API key
+            base_url: Base URL of the Plant.id API
+            timeout: Total timeout in seconds for reading an upstream response
+            connect_timeout: Timeout in seconds for establishing a connection
+            max_connections: Maximum number of concurrent connections to the upstream host
+            max_keepalive_connections: Maximum number of idle connections kept in the pool
+            keepalive_expiry: Seconds an idle connection is kept alive
+            http2: Whether to negotiate HTTP/2 (used only if the ``h2`` package is installed)
+            admission: Admission controller limiting upstream rate and concurrency
+            retry_policy: Retry policy for failures that are safe to repeat (no retries if None)
+            circuit_breaker: Circuit breaker that fails fast while the upstream is unhealthy
+            hedge_percentile: Latency percentile after which a slow plant details
+                request is hedged with a second one (no hedging if None)
         """
         self.api_key = api_key
+        self.base_url = base_url.rstrip("/")
         self.headers = {
             "Content-Type": "application/json",
             "Api-Key": api_key
         }
+        self.timeout = httpx.Timeout(timeout, connect=connect_timeout)
+        # All requests go to a single upstream host, so the pool limits are
+        # effectively per-host limits.
+        self.limits = httpx.Limits(
+            max_connections=max_connections,
+            max_keepalive_connections=max_keepalive_connections,
+            keepalive_expiry=keepalive_expiry,
+        )
+        self.http2 = http2 and HTTP2_AVAILABLE
+        self.admission = admission
+        self.retry_policy = retry_policy
+        self.circuit_breaker = circuit_breaker
+        self.hedge_percentile = hedge_percentile
+        self.latency = LatencyTracker()
+        self.retries = 0
+        self.hedgeable_requests = 0
+        self.hedges = 0
+        self.hedge_wins = 0
+        self._http: Optional[httpx.AsyncClient] = None
+    
+    async def start(self) -> None:
+        """Open the pooled HTTP client used for upstream requests"""
+        if self._http is None:
+            self._http = httpx.AsyncClient(
+                base_url=self.base_url,
+                headers=self.headers,
+                timeout=self.timeout,
+                limits=self.limits,
+                http2=self.http2,
+            )
+            logger.info(
+                "Plant.id HTTP client started (base_url=%s, http2=%s, max_connections=%s)",
+                self.base_url, self.http2, self.limits.max_connections
+            )
+    
+    async def close(self) -> None:
+        """Close the pooled HTTP client and release all connections"""
+        if self._http is not None:
+            http, self._http = self._http, None
+            await http.aclose()
+            logger.info("Plant.id HTTP client closed")
+    
+    async def __aenter__(self) -> "PlantIdClient":
+        await self.start()
+        return self
+    
+    async def __aexit__(self, *exc_info) -> None:
+        await self.close()
+    
+    async def _request(
+        self,
+        method: str,
+        path: str,
+        idempotent: bool = False,
+        hedge: bool = False,
+        **kwargs
+    ) -> Dict[str, Any]:
+        """
+        Send a request to the Plant.id API and return the decoded JSON body
+        
+        Failures that are safe to repeat are retried with jittered backoff.
+        Non-idempotent requests are only retried when the upstream cannot have
+        processed them.
+        
+        Args:
+            method: HTTP method
+            path: Path relative to the API base URL
+            idempotent: Whether the request may safely be sent more than once
+            hedge: Whether to send a second request when the first one is slower
+                than the usual latency (idempotent requests only)
+            **kwargs: Extra arguments passed to ``httpx.AsyncClient.request``
+            
+        Returns:
+            Decoded JSON response
+            
+        Raises:
+            PlantIdError: If the request fails or the upstream returns an error
+        """
+        if self._http is None:
+            await self.start()
+        
+        attempt = 0
+        delay = None
+        while True:
+            try:
+                if hedge and idempotent and self.hedge_percentile:
+                    return await self._send_hedged(method, path, **kwargs)
+                return await self._send(method, path, idempotent, **kwargs)
+            
+            except PlantIdError as e:
+                if not e.retryable or self.retry_policy is None:
+                    raise
+                if attempt >= self.retry_policy.max_retries:
+                    raise
+                attempt += 1
+                delay = self.retry_policy.next_delay(delay)
+                self.retries += 1
+                logger.warning(
+                    f"Retrying {method} {path} in {delay:.2f}s "
+                    f"(attempt {attempt + 1}): {e.message}"
+                )
+                await asyncio.sleep(delay)
+    
+    async def _send_hedged(self, method: str, path: str, **kwargs) -> Dict[str, Any]:
+        """
+        Send an idempotent request, hedging it if it is slower than usual
+        
+        If no response has arrived after the tracked latency percentile, a
+        second identical request is sent and whichever succeeds first wins.
+        Hedges are capped at a fraction of requests so a slow upstream is not
+        hit with double the load.
+        """
+        self.hedgeable_requests += 1
+        hedge_after = self.latency.percentile(self.hedge_percentile)
+        first = asyncio.ensure_future(self._send(method, path, True, **kwargs))
+        tasks = pending = {first}
+        try:
+            if hedge_after is None or self.hedges >= self.hedgeable_requests * HEDGE_BUDGET:
+                return await first
+            
+            done, _ = await asyncio.wait({first}, timeout=hedge_after)
+            if done:
+                return first.result()
+            
+            self.hedges += 1
+            second = asyncio.ensure_future(self._send(method, path, True, **kwargs))
+            tasks = pending = {first, second}
+            while True:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if task.exception() is None:
+                        if task is second:
+                            self.hedge_wins += 1
+                        return task.result()
+                if not pending:
+                    # Both failed; report the original request's error
+                    return first.result()
+        finally:
+            # Also runs when the caller is cancelled: stop the outstanding requests and
+            # wait until they have given back their connection and admission slot
+            for task in pending:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+    
+    async def _send(self, method: str, path: str, idempotent: bool, **kwargs) -> Dict[str, Any]:
+        """
+        Send a single request through the circuit breaker and admission control
+        
+        Raises:
+            PlantIdError: With ``retryable`` set if repeating the request is safe
+        """
+        if self.circuit_breaker is not None and not self.circuit_breaker.allow():
+            PLANT_ID_ERRORS.inc("circuit_open", 503)
+            raise PlantIdError("Plant.id API unavailable (circuit open)", status_code=503)
+        # Only the request let through while half-open holds the trial, and only it
+        # may give the trial back
+        trial = self.circuit_breaker is not None and self.circuit_breaker.state == CircuitBreaker.HALF_OPEN
+        
+        if self.admission is not None:
+            try:
+                # Queue until the rate and concurrency limits allow the request
+                await self.admission.acquire()
+            except AdmissionRejected as e:
+                if trial:
+                    self.circuit_breaker.abandon()
+                logger.warning(f"Upstream request rejected by admission control: {str(e)}")
+                PLANT_ID_ERRORS.inc("admission_rejected", 503)
+                raise PlantIdError(f"Service busy: {str(e)}", status_code=503)
+            except BaseException:
+                # Cancelled while queued: a half-open trial must not stay claimed
+                if trial:
+                    self.circuit_breaker.abandon()
+                raise
+        
+        operation = "plant_details" if path.startswith("/plants/") else path.strip("/")
+        timings: Dict[str, float] = {}
+        started = time.monotonic()
+        status_code = None
+        healthy = None
+        try:
+            with UPSTREAM_IN_FLIGHT.track(operation):
+                request_started = time.perf_counter()
+                response = await self._http.request(
+                    method, path, extensions={"trace": upstream_trace(timings)}, **kwargs
+                )
+                record_upstream_phases(operation, request_started, time.perf_counter(), timings)
+            status_code = response.status_code
+            healthy = status_code < 500
+            UPSTREAM_RESPONSES.inc(operation, status_code)
+            
+            # Check for errors
+            if response.status_code != 200:
+                body = _error_body(response)
+                logger.error(f"Plant.id API error: {body}")
+                PLANT_ID_ERRORS.inc("upstream_status", status_code)
+                raise PlantIdError(
+                    f"Plant.id API error: {body}",
+                    status_code=response.status_code,
+                    retryable=status_code in RETRY_SAFE_STATUSES
+                    or (idempotent and status_code >= 500)
+                )
+            
+            # Parse response
+            with STAGE_SECONDS.time("parse"):
+                result = orjson.loads(response.content)
+            self.latency.record(time.monotonic() - started)
+            return result
+        
+        except PlantIdError:
+            raise
+        
+        except httpx.HTTPError as e:
+            healthy = False
+            logger.error(f"Request error: {str(e)}")
+            PLANT_ID_ERRORS.inc("transport", 503)
+            raise PlantIdError(
+                f"Request error: {str(e)}",
+                status_code=503,
+                # A request that never reached the upstream can always be resent
+                retryable=idempotent or isinstance(e, NOT_SENT_ERRORS)
+            )
+        
+        except asyncio.CancelledError:
+            status_code = CANCELLED
+            raise
+        
+        except orjson.JSONDecodeError as e:
+            logger.error(f"JSON decode error: {str(e)}")
+            PLANT_ID_ERRORS.inc("invalid_response", 500)
+            raise PlantIdError(f"Invalid response format: {str(e)}", status_code=500)
+        
+        except Exception as e:
+            logger.error(f"Unexpected error: {str(e)}")
+            PLANT_ID_ERRORS.inc("unexpected", 500)
+            raise PlantIdError(f"Unexpected error: {str(e)}", status_code=500)
+        
+        finally:
+            if self.circuit_breaker is not None:
+                if healthy is None:
+                    if trial:
+                        self.circuit_breaker.abandon()
+                elif healthy:
+                    self.circuit_breaker.record_success()
+                else:
+                    self.circuit_breaker.record_failure()
+            if self.admission is not None:
+                self.admission.release(time.monotonic() - started, status_code)
+    
+    def resilience_stats(self) -> Dict[str, Any]:
+        """Return retry, hedging and circuit breaker counters"""
+        p95 = self.latency.percentile(95)
+        return {
+            "retries": self.retries,
+            "hedges": self.hedges,
+            "hedge_wins": self.hedge_wins,
+            "latency_p95_ms": round(p95 * 1000, 1) if p95 is not None else None,
+            "circuit_breaker": self.circuit_breaker.stats() if self.circuit_breaker else None,
+        }
     
     async def identify_plant(
         self, 
-        image_base64: str,
+        image_base64: Union[Base64Image, Sequence[Base64Image]],
         include_health_assessment: bool = True,
-        detailed_info: bool = True
+        detailed_info: bool = True,
+        fields: Optional[Sequence[str]] = None
     ) -> Dict[str, Any]:
         """
-        Identify a plant from a base64-encoded image
+        Identify a plant from one or more base64-encoded images
+        
+        Several images (e.g. leaf, flower and whole plant shots of the same plant)
+        are sent in a single upstream request and identified together.
         
         Args:
-            image_base64: Base64-encoded image data
+            image_base64: Base64-encoded image data, as a string or ASCII bytes,
+                or a list of such images of the same plant
             include_health_assessment: Whether to include plant health assessment
             detailed_info: Whether to include detailed plant information
+            fields: Suggestion fields to return (see RESPONSE_FIELDS), None for all.
+                Only the plant details these fields need are requested upstream.
             
         Returns:
             Plant identification results
         """
-        # Prepare request payload
+        if fields is not None:
+            payload = self._projected_payload(fields, include_health_assessment, detailed_info)
+        else:
+            payload = self._full_payload(include_health_assessment, detailed_info)
+        
+        if isinstance(image_base64, (str, bytes, bytearray)):
+            image_base64 = [image_base64]
+        images = [
+            image.encode("ascii") if isinstance(image, str) else image
+            for image in image_base64
+        ]
+        if not images:
+            raise PlantIdError("At least one image is required", status_code=400)
+        body = ImageJsonBody(images, payload)
+        
+        result = await self._request(
+            "POST",
+            "/identify",
+            content=body,
+            headers={"Content-Length": str(body.length)}
+        )
+        
+        # Transform response to match our API schema
+        with STAGE_SECONDS.time("transform"):
+            return self._transform_identification_result(result, fields)
+    
+    def _full_payload(self, include_health_assessment: bool, detailed_info: bool) -> Dict[str, Any]:
+        """Request payload (without images) when every response field is wanted"""
+        # Prepare request payload (the images are spliced in by ImageJsonBody)
         payload = {
-            "images": [image_base64],
             "modifiers": ["similar_images"],
             "plant_details": [
                 "common_names",
@@ -87,46 +500,28 @@ class PlantIdClient:
                 "growth_rate"
             ])
         
-        try:
-            # Make the request in a non-blocking way
-            loop = asyncio.get_event_loop()
-            response = await loop.run_in_executor(
-                None,
-                lambda: requests.post(
-                    f"{PLANT_ID_API_BASE_URL}/identify",
-                    json=payload,
-                    headers=self.headers,
-                    timeout=30
-                )
-            )
-            
-            # Check for errors
-            if response.status_code != 200:
-                logger.error(f"Plant.id API error: {response.text}")
-                raise PlantIdError(
-                    f"Plant.id API error: {response.text}",
-                    status_code=response.status_code
-                )
-            
-            # Parse response
-            result = response.json()
-            
-            # Transform response to match our API schema
-            transformed_result = self._transform_identification_result(result)
-            
-            return transformed_result
-            
-        except requests.RequestException as e:
-            logger.error(f"Request error: {str(e)}")
-            raise PlantIdError(f"Request error: {str(e)}", status_code=503)
-        
-        except json.JSONDecodeError as e:
-            logger.error(f"JSON decode error: {str(e)}")
-            raise PlantIdError(f"Invalid response format: {str(e)}", status_code=500)
+        return payload
+    
+    def _projected_payload(
+        self,
+        fields: Sequence[str],
+        include_health_assessment: bool,
+        detailed_info: bool
+    ) -> Dict[str, Any]:
+        """Request payload (without images) asking only for what the fields need"""
+        plant_details: List[str] = []
+        for field in fields:
+            if field == "care_info" and not detailed_info:
+                continue
+            plant_details.extend(FIELD_PLANT_DETAILS.get(field, ()))
         
-        except Exception as e:
-            logger.error(f"Unexpected error: {str(e)}")
-            raise PlantIdError(f"Unexpected error: {str(e)}", status_code=500)
+        payload: Dict[str, Any] = {
+            "modifiers": ["similar_images"] if "image_url" in fields else [],
+            "plant_details": plant_details
+        }
+        if include_health_assessment and "health_assessment" in fields:
+            payload["health"] = "all"
+        return payload
     
     async def get_plant_details(self, plant_id: str) -> Dict[str, Any]:
         """
@@ -138,112 +533,41 @@ class PlantIdClient:
         Returns:
             Plant details
         """
-        try:
-            # Make the request in a non-blocking way
-            loop = asyncio.get_event_loop()
-            response = await loop.run_in_executor(
-                None,
-                lambda: requests.get(
-                    f"{PLANT_ID_API_BASE_URL}/plants/{plant_id}",
-                    headers=self.headers,
-                    timeout=30
-                )
-            )
-            
-            # Check for errors
-            if response.status_code != 200:
-                logger.error(f"Plant.id API error: {response.text}")
-                raise PlantIdError(
-                    f"Plant.id API error: {response.text}",
-                    status_code=response.status_code
-                )
-            
-            # Parse response
-            result = response.json()
-            
-            # Transform response to match our API schema
-            transformed_result = self._transform_plant_details(result)
-            
-            return transformed_result
-            
-        except requests.RequestException as e:
-            logger.error(f"Request error: {str(e)}")
-            raise PlantIdError(f"Request error: {str(e)}", status_code=503)
+        result = await self._request(
+            "GET", f"/plants/{plant_id}", idempotent=True, hedge=True
+        )
         
-        except json.JSONDecodeError as e:
-            logger.error(f"JSON decode error: {str(e)}")
-            raise PlantIdError(f"Invalid response format: {str(e)}", status_code=500)
-        
-        except Exception as e:
-            logger.error(f"Unexpected error: {str(e)}")
-            raise PlantIdError(f"Unexpected error: {str(e)}", status_code=500)
+        # Transform response to match our API schema
+        with STAGE_SECONDS.time("transform"):
+            return self._transform_plant_details(result)
     
-    def _transform_identification_result(self, result: Dict[str, Any]) -> Dict[str, Any]:
+    def _transform_identification_result(
+        self,
+        result: Dict[str, Any],
+        fields: Optional[Sequence[str]] = None
+    ) -> Dict[str, Any]:
         """
         Transform Plant.id API identification result to match our API schema
         
+        The output has exactly the shape of ``IdentificationResponse``, so it can be
+        serialized without being validated again.
+        
         Args:
             result: Raw Plant.id API response
+            fields: Suggestion fields to keep, None for all
             
         Returns:
             Transformed result
         """
-        # Extract suggestions
-        suggestions = result.get("suggestions", [])
-        
-        # Transform suggestions to our format
-        transformed_suggestions = []
-        for suggestion in suggestions:
-            plant_details = suggestion.get("plant_details", {})
-            
-            # Extract care information
-            care_info = {
-                "watering": self._extract_care_info(plant_details, "watering"),
-                "sunlight": self._extract_care_info(plant_details, "sunlight"),
-                "soil": self._extract_care_info(plant_details, "soil"),
-                "propagation": self._extract_care_info(plant_details, "propagation"),
-                "pruning": self._extract_care_info(plant_details, "pruning")
-            }
-            
-            # Extract health assessment if available
-            health_assessment = None
-            if "health_assessment" in suggestion:
-                health = suggestion["health_assessment"]
-                diseases = health.get("diseases", [])
-                
-                if diseases:
-                    top_disease = diseases[0]
-                    health_assessment = {
-                        "is_healthy": health.get("is_healthy", True),
-                        "disease_name": top_disease.get("name"),
-                        "probability": top_disease.get("probability"),
-                        "treatment": top_disease.get("treatment", {}).get("overview")
-                    }
-                else:
-                    health_assessment = {
-                        "is_healthy": health.get("is_healthy", True)
-                    }
-            
-            # Create transformed suggestion
-            transformed_suggestion = {
-                "id": suggestion.get("id", ""),
-                "scientific_name": suggestion.get("name", ""),
-                "common_name": self._get_common_name(suggestion),
-                "family": plant_details.get("taxonomy", {}).get("family"),
-                "probability": suggestion.get("probability", 0.0),
-                "description": plant_details.get("wiki_description", {}).get("value"),
-                "care_info": care_info,
-                "health_assessment": health_assessment,
-                "image_url": self._get_image_url(suggestion)
-            }
-            
-            transformed_suggestions.append(transformed_suggestion)
-        
-        # Create final response
+        transform = _transform_suggestion
         return {
-            "results": transformed_suggestions,
+            "results": [
+                transform(suggestion, suggestion.get("probability", 0.0), fields)
+                for suggestion in result.get("suggestions") or ()
+            ],
             "is_plant": result.get("is_plant", True),
-            "submission_id": result.get("id", "")
+            "submission_id": str(result.get("id", "")),
+            "source": "plant_id"
         }
     
     def _transform_plant_details(self, result: Dict[str, Any]) -> Dict[str, Any]:
@@ -256,54 +580,94 @@ class PlantIdClient:
         Returns:
             Transformed result
         """
-        plant = result.get("plant", {})
-        plant_details = plant.get("plant_details", {})
+        # Direct lookup has 100% confidence
+        return _transform_suggestion(result.get("plant") or {}, 1.0)
+
+
+def _error_body(response: httpx.Response) -> str:
+    """Upstream error body for logs and error messages, truncated to MAX_ERROR_BODY_BYTES"""
+    body = response.content[:MAX_ERROR_BODY_BYTES].decode(response.encoding or "utf-8", errors="replace")
+    if len(response.content) > MAX_ERROR_BODY_BYTES:
+        body += f"... [{len(response.content) - MAX_ERROR_BODY_BYTES} bytes truncated]"
+    return body
+
+
+def project_fields(item: Dict[str, Any], fields: Optional[Sequence[str]]) -> Dict[str, Any]:
+    """
+    Keep only the requested fields of a transformed suggestion
+    
+    Args:
+        item: Transformed suggestion or plant details
+        fields: Fields to keep, None to keep the item as it is
         
-        # Extract care information
-        care_info = {
-            "watering": self._extract_care_info(plant_details, "watering"),
-            "sunlight": self._extract_care_info(plant_details, "sunlight"),
-            "soil": self._extract_care_info(plant_details, "soil"),
-            "propagation": self._extract_care_info(plant_details, "propagation"),
-            "pruning": self._extract_care_info(plant_details, "pruning")
-        }
+    Returns:
+        The projected item
+    """
+    if fields is None:
+        return item
+    return {field: item.get(field) for field in fields}
+
+
+def _transform_suggestion(
+    suggestion: Dict[str, Any],
+    probability: float,
+    fields: Optional[Sequence[str]] = None
+) -> Dict[str, Any]:
+    """
+    Transform one Plant.id suggestion (or plant) in a single pass
+    
+    Args:
+        suggestion: Raw suggestion with its ``plant_details``
+        probability: Probability to report for the suggestion
+        fields: Fields to keep, None for all
         
-        # Create transformed result
-        return {
-            "id": plant.get("id", ""),
-            "scientific_name": plant.get("name", ""),
-            "common_name": self._get_common_name(plant),
-            "family": plant_details.get("taxonomy", {}).get("family"),
-            "probability": 1.0,  # Direct lookup has 100% confidence
-            "description": plant_details.get("wiki_description", {}).get("value"),
-            "care_info": care_info,
-            "image_url": self._get_image_url(plant)
-        }
+    Returns:
+        Dict with the shape of ``PlantIdentificationResult``
+    """
+    plant_details = suggestion.get("plant_details") or _EMPTY
     
-    def _extract_care_info(self, plant_details: Dict[str, Any], care_type: str) -> Optional[str]:
-        """Extract care information from plant details"""
-        if care_type in plant_details:
-            care_info = plant_details[care_type]
-            if isinstance(care_info, dict) and "text" in care_info:
-                return care_info["text"]
-            return str(care_info)
-        return None
+    # Extract care information
+    care_info = {}
+    for care_type in CARE_FIELDS:
+        value = plant_details.get(care_type)
+        if value is not None and value.__class__ is not str:
+            value = value["text"] if isinstance(value, dict) and "text" in value else str(value)
+        care_info[care_type] = value
     
-    def _get_common_name(self, plant_data: Dict[str, Any]) -> str:
-        """Extract common name from plant data"""
-        common_names = plant_data.get("common_names", [])
-        if common_names and len(common_names) > 0:
-            return common_names[0]
-        
-        plant_details = plant_data.get("plant_details", {})
-        if "common_names" in plant_details and plant_details["common_names"]:
-            return plant_details["common_names"][0]
-            
-        return plant_data.get("name", "")
+    # Extract health assessment if available
+    health_assessment = None
+    health = suggestion.get("health_assessment")
+    if health is not None:
+        diseases = health.get("diseases")
+        if diseases:
+            top_disease = diseases[0]
+            health_assessment = {
+                "is_healthy": health.get("is_healthy", True),
+                "disease_name": top_disease.get("name"),
+                "probability": top_disease.get("probability"),
+                "treatment": (top_disease.get("treatment") or _EMPTY).get("overview")
+            }
+        else:
+            health_assessment = {
+                "is_healthy": health.get("is_healthy", True),
+                "disease_name": None,
+                "probability": None,
+                "treatment": None
+            }
+    
+    # Prefer top-level common names, then the ones in the plant details
+    common_names = suggestion.get("common_names") or plant_details.get("common_names")
+    name = suggestion.get("name", "")
+    similar_images = suggestion.get("similar_images")
     
-    def _get_image_url(self, plant_data: Dict[str, Any]) -> Optional[str]:
-        """Extract image URL from plant data"""
-        similar_images = plant_data.get("similar_images", [])
-        if similar_images and len(similar_images) > 0:
-            return similar_images[0].get("url")
-        return None
+    return project_fields({
+        "id": str(suggestion.get("id", "")),
+        "scientific_name": name,
+        "common_name": common_names[0] if common_names else name,
+        "family": (plant_details.get("taxonomy") or _EMPTY).get("family"),
+        "probability": probability,
+        "description": (plant_details.get("wiki_description") or _EMPTY).get("value"),
+        "care_info": care_info,
+        "health_assessment": health_assessment,
+        "image_url": similar_images[0].get("url") if similar_images else None
+    }, fields)
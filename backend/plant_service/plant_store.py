@@ -0,0 +1,218 @@
+"""
+Plant Details Store
+Persistent SQLite store for transformed plant details with an in-memory hot tier and
+an optional tier shared by the server workers (see cache_backends.py).
+Entries are served stale-while-revalidate: once an entry is older than its TTL it is
+still returned immediately while a background task refreshes it from the upstream.
+"""
+import asyncio
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+from typing import Any, Awaitable, Callable, Dict, Optional, Tuple
+
+from cache_backends import CacheBackend, MemoryBackend
+
+logger = logging.getLogger(__name__)
+
+# Constants
+DEFAULT_TTL_SECONDS = 7 * 24 * 60 * 60
+DEFAULT_HOT_ENTRIES = 1024
+DEFAULT_STORE_PATH = os.path.join("data", "plant_details.db")
+
+# An entry is (fetched_at, transformed plant details)
+Entry = Tuple[float, Dict[str, Any]]
+
+
+class PlantDetailsStore:
+    """SQLite-backed plant details store with an LRU hot tier and an optional shared tier"""
+
+    def __init__(
+        self,
+        path: str = DEFAULT_STORE_PATH,
+        ttl_seconds: float = DEFAULT_TTL_SECONDS,
+        max_stale_seconds: Optional[float] = None,
+        hot_entries: int = DEFAULT_HOT_ENTRIES,
+        shared: Optional[CacheBackend] = None
+    ):
+        """
+        Initialize the store
+
+        Args:
+            path: SQLite database file, created with its directory if missing
+                (":memory:" keeps nothing across restarts)
+            ttl_seconds: Age in seconds after which an entry is refreshed
+            max_stale_seconds: How long past its TTL an entry may still be served while
+                it is refreshed (None serves stale entries indefinitely)
+            hot_entries: Maximum number of entries kept in memory
+            shared: Backend shared by the server workers, checked before the
+                database (disabled if None)
+        """
+        self.path = path
+        self.ttl_seconds = ttl_seconds
+        self.max_stale_seconds = max_stale_seconds
+        self.hot_entries = hot_entries
+        self.shared = shared
+        self._hot = MemoryBackend(hot_entries)
+        self._db: Optional[sqlite3.Connection] = None
+        self._db_lock = threading.Lock()
+        self._refreshing: Dict[str, "asyncio.Task[None]"] = {}
+        self.shared_hits = 0
+        self.store_hits = 0
+        self.stale_served = 0
+        self.misses = 0
+        self.refreshes = 0
+        self.refresh_failures = 0
+
+    def open(self) -> None:
+        """Open the database and create the schema"""
+        if self._db is not None:
+            return
+        directory = os.path.dirname(self.path) if self.path != ":memory:" else ""
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._db = sqlite3.connect(self.path, check_same_thread=False)
+        with self._db_lock:
+            if self.path != ":memory:":
+                self._db.execute("PRAGMA journal_mode=WAL")
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS plant_details ("
+                " plant_id TEXT PRIMARY KEY,"
+                " fetched_at REAL NOT NULL,"
+                " data TEXT NOT NULL)"
+            )
+            self._db.commit()
+        logger.info(f"Plant details store opened at {self.path}")
+
+    async def close(self) -> None:
+        """Cancel pending refreshes and close the database"""
+        for task in list(self._refreshing.values()):
+            task.cancel()
+        if self._refreshing:
+            await asyncio.gather(*self._refreshing.values(), return_exceptions=True)
+        if self._db is not None:
+            db, self._db = self._db, None
+            with self._db_lock:
+                db.close()
+
+    async def get(
+        self,
+        plant_id: str,
+        fetch: Callable[[], Awaitable[Dict[str, Any]]]
+    ) -> Dict[str, Any]:
+        """
+        Return plant details, fetching them from the upstream only when needed
+
+        Args:
+            plant_id: ID of the plant
+            fetch: Coroutine function returning fresh transformed plant details
+
+        Returns:
+            Transformed plant details
+        """
+        if self._db is None:
+            self.open()
+
+        entry = await self._hot.get(plant_id)
+        if entry is None and self.shared is not None:
+            shared_entry = await self.shared.get(f"plant:{plant_id}")
+            if shared_entry is not None:
+                entry = tuple(shared_entry)
+                await self._hot.set(plant_id, entry)
+                self.shared_hits += 1
+        if entry is None:
+            entry = await asyncio.to_thread(self._read, plant_id)
+            if entry is not None:
+                await self._hot.set(plant_id, entry)
+                self.store_hits += 1
+
+        if entry is not None:
+            fetched_at, data = entry
+            age = time.time() - fetched_at
+            if age <= self.ttl_seconds:
+                return data
+            if self.max_stale_seconds is None or age <= self.ttl_seconds + self.max_stale_seconds:
+                self.stale_served += 1
+                self._refresh_in_background(plant_id, fetch)
+                return data
+
+        self.misses += 1
+        data = await fetch()
+        await self.put(plant_id, data)
+        return data
+
+    async def put(self, plant_id: str, data: Dict[str, Any]) -> None:
+        """Store fresh plant details"""
+        if self._db is None:
+            self.open()
+        entry = (time.time(), data)
+        await self._hot.set(plant_id, entry)
+        if self.shared is not None:
+            # Kept for as long as the entry may be served, stale or not
+            shared_ttl = (
+                self.ttl_seconds + self.max_stale_seconds if self.max_stale_seconds is not None else None
+            )
+            await self.shared.set(f"plant:{plant_id}", list(entry), shared_ttl)
+        await asyncio.to_thread(self._write, plant_id, entry)
+
+    def stats(self) -> Dict[str, Any]:
+        """Return store counters"""
+        return {
+            "hot_entries": len(self._hot),
+            "hot_hits": self._hot.hits,
+            "shared_hits": self.shared_hits,
+            "store_hits": self.store_hits,
+            "stale_served": self.stale_served,
+            "misses": self.misses,
+            "refreshes": self.refreshes,
+            "refresh_failures": self.refresh_failures,
+            "refreshing": len(self._refreshing),
+        }
+
+    def _refresh_in_background(
+        self,
+        plant_id: str,
+        fetch: Callable[[], Awaitable[Dict[str, Any]]]
+    ) -> None:
+        """Start a refresh of an expired entry unless one is already running"""
+        if plant_id in self._refreshing:
+            return
+
+        async def refresh():
+            try:
+                await self.put(plant_id, await fetch())
+                self.refreshes += 1
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                # Keep serving the stale entry; the next read retries the refresh
+                self.refresh_failures += 1
+                logger.warning(f"Background refresh of plant {plant_id} failed: {str(e)}")
+            finally:
+                self._refreshing.pop(plant_id, None)
+
+        self._refreshing[plant_id] = asyncio.ensure_future(refresh())
+
+    def _read(self, plant_id: str) -> Optional[Entry]:
+        """Read an entry from the database"""
+        with self._db_lock:
+            row = self._db.execute(
+                "SELECT fetched_at, data FROM plant_details WHERE plant_id = ?",
+                (plant_id,)
+            ).fetchone()
+        if row is None:
+            return None
+        return row[0], json.loads(row[1])
+
+    def _write(self, plant_id: str, entry: Entry) -> None:
+        """Insert or replace an entry in the database"""
+        fetched_at, data = entry
+        with self._db_lock:
+            self._db.execute(
+                "INSERT OR REPLACE INTO plant_details (plant_id, fetched_at, data) VALUES (?, ?, ?)",
+                (plant_id, fetched_at, json.dumps(data))
+            )
+            self._db.commit()
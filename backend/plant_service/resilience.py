@@ -0,0 +1,176 @@
+"""
+Upstream Resilience
+Building blocks that keep Plant.id failures from reaching users or tying up workers:
+bounded retries with decorrelated jitter, a latency tracker used to decide when to
+hedge a slow request, and a circuit breaker that fails fast while the upstream is
+unhealthy.
+"""
+import collections
+import logging
+import random
+import time
+from typing import Any, Deque, Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+# Constants
+DEFAULT_MAX_RETRIES = 2
+DEFAULT_RETRY_BASE_DELAY = 0.2
+DEFAULT_RETRY_MAX_DELAY = 2.0
+DEFAULT_FAILURE_THRESHOLD = 5
+DEFAULT_RESET_TIMEOUT = 30.0
+DEFAULT_LATENCY_WINDOW = 200
+MIN_LATENCY_SAMPLES = 20
+
+
+class RetryPolicy:
+    """Bounded retries with "decorrelated jitter" backoff"""
+
+    def __init__(
+        self,
+        max_retries: int = DEFAULT_MAX_RETRIES,
+        base_delay: float = DEFAULT_RETRY_BASE_DELAY,
+        max_delay: float = DEFAULT_RETRY_MAX_DELAY
+    ):
+        """
+        Args:
+            max_retries: Maximum number of retries after the first attempt
+            base_delay: Minimum delay in seconds before a retry
+            max_delay: Maximum delay in seconds before a retry
+        """
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+
+    def next_delay(self, previous_delay: Optional[float]) -> float:
+        """
+        Delay before the next retry
+
+        Each delay is drawn between the base delay and three times the previous
+        one, which spreads retries from many clients apart.
+
+        Args:
+            previous_delay: Delay used before the previous retry, None for the first
+
+        Returns:
+            Delay in seconds
+        """
+        upper = max(self.base_delay, (previous_delay or self.base_delay) * 3)
+        return min(self.max_delay, random.uniform(self.base_delay, upper))
+
+
+class LatencyTracker:
+    """Sliding window of recent latencies for percentile estimates"""
+
+    def __init__(self, window: int = DEFAULT_LATENCY_WINDOW):
+        """
+        Args:
+            window: Number of most recent samples kept
+        """
+        self._samples: Deque[float] = collections.deque(maxlen=window)
+
+    def record(self, latency: float) -> None:
+        """Add a latency sample in seconds"""
+        self._samples.append(latency)
+
+    def percentile(self, percentile: float) -> Optional[float]:
+        """
+        Return a latency percentile in seconds
+
+        Returns None until enough samples have been recorded.
+        """
+        if len(self._samples) < MIN_LATENCY_SAMPLES:
+            return None
+        ordered = sorted(self._samples)
+        index = min(len(ordered) - 1, int(len(ordered) * percentile / 100))
+        return ordered[index]
+
+
+class CircuitBreaker:
+    """
+    Circuit breaker for the upstream API
+
+    Closed: requests flow and consecutive failures are counted. Open: requests
+    fail immediately until the reset timeout has passed. Half-open: a single
+    trial request is let through; success closes the circuit, failure opens it
+    again.
+    """
+
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+    def __init__(
+        self,
+        failure_threshold: int = DEFAULT_FAILURE_THRESHOLD,
+        reset_timeout: float = DEFAULT_RESET_TIMEOUT
+    ):
+        """
+        Args:
+            failure_threshold: Consecutive failures that open the circuit
+            reset_timeout: Seconds the circuit stays open before a trial request
+        """
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.state = self.CLOSED
+        self.consecutive_failures = 0
+        self.opened_at = 0.0
+        self._trial_in_flight = False
+        self.rejected = 0
+        self.times_opened = 0
+
+    def allow(self) -> bool:
+        """
+        Return whether a request may be sent now
+
+        A request allowed while the circuit is half-open is the trial request;
+        if it ends without an upstream response it must call ``abandon()``.
+        """
+        if self.state == self.OPEN:
+            if time.monotonic() - self.opened_at < self.reset_timeout:
+                self.rejected += 1
+                return False
+            self.state = self.HALF_OPEN
+            self._trial_in_flight = False
+
+        if self.state == self.HALF_OPEN:
+            if self._trial_in_flight:
+                self.rejected += 1
+                return False
+            self._trial_in_flight = True
+
+        return True
+
+    def record_success(self) -> None:
+        """Record a healthy upstream response"""
+        if self.state != self.CLOSED:
+            logger.info("Plant.id circuit breaker closed")
+        self.state = self.CLOSED
+        self.consecutive_failures = 0
+        self._trial_in_flight = False
+
+    def record_failure(self) -> None:
+        """Record an upstream failure (transport error or 5xx)"""
+        self.consecutive_failures += 1
+        if self.state == self.HALF_OPEN or self.consecutive_failures >= self.failure_threshold:
+            if self.state != self.OPEN:
+                logger.warning(
+                    f"Plant.id circuit breaker opened after {self.consecutive_failures} failures"
+                )
+                self.times_opened += 1
+            self.state = self.OPEN
+            self.opened_at = time.monotonic()
+            self._trial_in_flight = False
+
+    def abandon(self) -> None:
+        """Give back the half-open trial after it ended without reaching the upstream"""
+        self._trial_in_flight = False
+
+    def stats(self) -> Dict[str, Any]:
+        """Return breaker state and counters"""
+        return {
+            "state": self.state,
+            "consecutive_failures": self.consecutive_failures,
+            "times_opened": self.times_opened,
+            "rejected": self.rejected,
+        }
@@ -0,0 +1,92 @@
+"""
+Production Server
+Runs the plant service under uvicorn with the uvloop event loop and the httptools
+HTTP parser (when installed), and a bounded graceful drain on shutdown. The .env
+file is loaded here, before the app is imported by the workers.
+
+    python serve.py
+
+Settings are read from the environment (see .env.example): HOST, PORT,
+SERVER_WORKERS, GRACEFUL_TIMEOUT, KEEPALIVE_TIMEOUT and LOG_LEVEL.
+
+One worker process is started by default. Identification jobs, /metrics, /stats,
+and the admission control and circuit breaker state live in each worker's memory,
+so with SERVER_WORKERS > 1 job IDs are only known to the worker that accepted
+them, and metrics and stats only describe the worker that served the request.
+"""
+import importlib.util
+import logging
+import os
+from typing import Any, Dict
+
+import uvicorn
+from dotenv import load_dotenv
+
+from logging_config import configure_logging
+
+logger = logging.getLogger(__name__)
+
+# Process pools sized from the CPU count unless configured
+PROCESS_POOL_SETTINGS = ("IMAGE_PREPROCESS_WORKERS", "PHASH_WORKERS")
+
+
+def cpu_count() -> int:
+    """Number of CPUs available"""
+    return os.cpu_count() or 1
+
+
+def server_config() -> Dict[str, Any]:
+    """
+    Build the uvicorn settings from environment variables
+
+    Returns:
+        Keyword arguments for ``uvicorn.run``
+    """
+    # 0 starts one worker per CPU (see the per-process state caveats above)
+    workers = int(os.getenv("SERVER_WORKERS", "1")) or cpu_count()
+    return {
+        "host": os.getenv("HOST", "0.0.0.0"),
+        "port": int(os.getenv("PORT", "8000")),
+        "workers": workers,
+        # Fall back to the pure-Python implementations when the extras are missing
+        "loop": "uvloop" if importlib.util.find_spec("uvloop") else "asyncio",
+        "http": "httptools" if importlib.util.find_spec("httptools") else "h11",
+        "timeout_keep_alive": int(os.getenv("KEEPALIVE_TIMEOUT", "5")),
+        "timeout_graceful_shutdown": int(float(os.getenv("GRACEFUL_TIMEOUT", "30"))),
+        "log_level": os.getenv("LOG_LEVEL", "INFO").lower(),
+        "access_log": os.getenv("ACCESS_LOG", "false").lower() == "true",
+        # uvicorn's own loggers propagate to the queued handlers of logging_config
+        "log_config": None,
+    }
+
+
+def configure_workers(workers: int) -> None:
+    """
+    Pass per-worker settings to the worker processes through the environment
+
+    Upstream rate and concurrency limits are split between the workers (see
+    ``SERVER_WORKERS`` in main.py), and the image process pools share the CPUs
+    instead of each worker starting one process per CPU.
+    """
+    os.environ["SERVER_WORKERS"] = str(workers)
+    pool_size = max(1, cpu_count() // workers)
+    for setting in PROCESS_POOL_SETTINGS:
+        if not int(os.getenv(setting, "0")):
+            os.environ[setting] = str(pool_size)
+
+
+def main():
+    load_dotenv()
+    config = server_config()
+    configure_workers(config["workers"])
+
+    configure_logging(config["log_level"])
+    logger.info(
+        f"Starting plant service on {config['host']}:{config['port']} with "
+        f"{config['workers']} workers (loop={config['loop']}, http={config['http']})"
+    )
+    uvicorn.run("main:app", **config)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,88 @@
+"""
+Request Coalescing
+Single-flight helper that lets concurrent callers with the same key share one
+in-flight upstream call instead of each issuing their own.
+"""
+import asyncio
+import logging
+from typing import Any, Awaitable, Callable, Dict, Hashable, TypeVar
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+
+class _Call:
+    """In-flight call shared by all waiters for one key"""
+
+    __slots__ = ("task", "waiters")
+
+    def __init__(self, task: "asyncio.Future[Any]"):
+        self.task = task
+        self.waiters = 0
+
+
+class SingleFlight:
+    """Coalesces concurrent calls with the same key into a single execution"""
+
+    def __init__(self):
+        self._calls: Dict[Hashable, _Call] = {}
+        self.executions = 0
+        self.coalesced = 0
+        self.abandoned = 0
+
+    async def do(self, key: Hashable, fn: Callable[[], Awaitable[T]]) -> T:
+        """
+        Run ``fn`` once for all concurrent callers using the same key
+
+        The call runs in its own task, so a waiter being cancelled (e.g. the
+        client disconnecting) does not cancel the call for the others. The call
+        is only cancelled once every waiter has gone away. Exceptions raised by
+        ``fn`` are propagated to every waiter.
+
+        Args:
+            key: Key identifying equivalent calls
+            fn: Zero-argument coroutine function performing the call
+
+        Returns:
+            Result of ``fn``
+        """
+        call = self._calls.get(key)
+        if call is None:
+            call = _Call(asyncio.ensure_future(fn()))
+            self._calls[key] = call
+            call.task.add_done_callback(lambda _: self._forget(key, call))
+            self.executions += 1
+        else:
+            self.coalesced += 1
+
+        call.waiters += 1
+        try:
+            return await asyncio.shield(call.task)
+        finally:
+            call.waiters -= 1
+            if call.waiters == 0 and not call.task.done():
+                # Nobody is waiting any more; stop the call and let the next
+                # caller start a fresh one instead of joining a cancelled task
+                self._forget(key, call)
+                call.task.cancel()
+                self.abandoned += 1
+                logger.info(f"Cancelled abandoned upstream call for key {key!r}")
+
+    def in_flight(self) -> int:
+        """Number of calls currently running"""
+        return len(self._calls)
+
+    def stats(self) -> Dict[str, int]:
+        """Return coalescing counters"""
+        return {
+            "in_flight": self.in_flight(),
+            "executions": self.executions,
+            "coalesced": self.coalesced,
+            "abandoned": self.abandoned,
+        }
+
+    def _forget(self, key: Hashable, call: _Call) -> None:
+        """Remove a finished or abandoned call, if it is still the registered one"""
+        if self._calls.get(key) is call:
+            del self._calls[key]
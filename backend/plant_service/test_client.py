@@ -1,13 +1,18 @@
 """
 Test script for Plant.id API client
 This script tests the functionality of the Plant.id API client
+
+Set PLANT_ID_API_BASE_URL to run it against the local fake API instead of Plant.id:
+
+    uvicorn fake_plant_id:app --port 9000
+    PLANT_ID_API_KEY=test PLANT_ID_API_BASE_URL=http://127.0.0.1:9000 python test_client.py
 """
 import os
 import sys
 import base64
 import asyncio
 from dotenv import load_dotenv
-from plant_id_client import PlantIdClient, PlantIdError
+from plant_id_client import PlantIdClient, PlantIdError, PLANT_ID_API_BASE_URL
 
 # Load environment variables
 load_dotenv()
@@ -39,7 +44,10 @@ async def test_plant_id_client():
     print("Testing Plant.id API client...")
     
     # Initialize client
-    client = PlantIdClient(api_key=PLANT_ID_API_KEY)
+    client = PlantIdClient(
+        api_key=PLANT_ID_API_KEY,
+        base_url=os.getenv("PLANT_ID_API_BASE_URL", PLANT_ID_API_BASE_URL)
+    )
     
     try:
         # Get image data
@@ -53,24 +61,25 @@ async def test_plant_id_client():
         )
         
         # Check if we got results
-        if 'result' in identification_result and 'classification' in identification_result['result']:
+        if identification_result.get('results'):
             print("✓ Plant identification successful")
+            print(f"Submission ID: {identification_result.get('submission_id')}")
             
-            # Get the submission ID for plant details test
-            submission_id = identification_result.get('id')
-            if submission_id:
-                print(f"Submission ID: {submission_id}")
+            # Get the top suggestion's plant ID for plant details test
+            plant_id = identification_result['results'][0].get('id')
+            if plant_id:
+                print(f"Top suggestion: {identification_result['results'][0].get('scientific_name')}")
                 
                 print("\n2. Testing plant details retrieval...")
-                plant_details = await client.get_plant_details(submission_id)
+                plant_details = await client.get_plant_details(plant_id)
                 
                 if plant_details:
                     print("✓ Plant details retrieval successful")
-                    print(f"Plant name: {plant_details.get('name', 'Unknown')}")
+                    print(f"Plant name: {plant_details.get('scientific_name', 'Unknown')}")
                 else:
                     print("✗ Plant details retrieval failed")
             else:
-                print("✗ No submission ID found in identification result")
+                print("✗ No plant ID found in identification result")
         else:
             print("✗ Plant identification failed or returned unexpected format")
             print(f"Response: {identification_result}")
@@ -79,6 +88,9 @@ async def test_plant_id_client():
         print(f"✗ API Error: {e.message} (Status code: {e.status_code})")
     except Exception as e:
         print(f"✗ Unexpected error: {str(e)}")
+    
+    finally:
+        await client.close()
         
     print("\nTest completed.")
 
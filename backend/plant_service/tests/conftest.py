@@ -0,0 +1,103 @@
+"""
+Shared fixtures for the plant service tests
+Runs the fake Plant.id API (fake_plant_id.py) in a background thread so the client
+can be exercised over real HTTP without an API key or network access.
+
+Run from backend/plant_service:
+
+    pip install -r requirements.txt -r requirements-dev.txt
+    python -m pytest tests
+"""
+import io
+import itertools
+import os
+import socket
+import sys
+import threading
+import time
+
+import pytest
+import uvicorn
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import fake_plant_id  # noqa: E402
+
+# Numbers the images built by make_jpeg, so each one is different
+_images = itertools.count(1)
+
+
+def _free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+@pytest.fixture(scope="session")
+def fake_upstream_server():
+    """Start the fake Plant.id API once for the whole test session"""
+    port = _free_port()
+    server = uvicorn.Server(uvicorn.Config(
+        fake_plant_id.app, host="127.0.0.1", port=port, log_level="warning", lifespan="off", ws="none"
+    ))
+    thread = threading.Thread(target=server.run, daemon=True)
+    thread.start()
+    deadline = time.monotonic() + 10
+    while not server.started:
+        if time.monotonic() > deadline:
+            raise RuntimeError("Fake Plant.id API did not start")
+        time.sleep(0.01)
+    yield f"http://127.0.0.1:{port}"
+    server.should_exit = True
+    thread.join(timeout=5)
+
+
+@pytest.fixture
+def fake_upstream(fake_upstream_server):
+    """Base URL of the fake Plant.id API, with faults and counters reset"""
+    fake_plant_id.faults = fake_plant_id.Faults(latency_ms=0)
+    for name in fake_plant_id.counters:
+        fake_plant_id.counters[name] = 0
+    yield fake_upstream_server
+    fake_plant_id.faults = fake_plant_id.Faults(latency_ms=0)
+
+
+
+@pytest.fixture(scope="session")
+def service(fake_upstream_server):
+    """Test client of the plant service, talking to the fake Plant.id API"""
+    from fastapi.testclient import TestClient
+
+    import main
+
+    with pytest.MonkeyPatch.context() as patch:
+        patch.setenv("PLANT_ID_API_KEY", "test")
+        patch.setenv("PLANT_ID_API_BASE_URL", fake_upstream_server)
+        patch.setenv("PLANT_ID_RATE_LIMIT", "0")
+        patch.setattr(main.plant_details_store, "path", ":memory:")
+        patch.setattr(main, "plant_id_client", None)
+        patch.setattr(main, "identification_router", None)
+        with TestClient(main.app) as client:
+            yield client
+
+
+@pytest.fixture
+def make_jpeg():
+    """Build a distinct JPEG image, so cached results of other tests are not hit"""
+    from PIL import Image
+
+    def make(size=(64, 64)) -> bytes:
+        index = next(_images)
+        # Draw the index as a 4x4 grid of black and white cells: nearby colors
+        # can compress to the same bytes, whole cells cannot
+        image = Image.new("RGB", size, (0, 128, 0))
+        cell_width, cell_height = size[0] // 4, size[1] // 4
+        for bit in range(16):
+            if index >> bit & 1:
+                x, y = bit % 4 * cell_width, bit // 4 * cell_height
+                image.paste((255, 255, 255), (x, y, x + cell_width, y + cell_height))
+        buffer = io.BytesIO()
+        image.save(buffer, format="JPEG", quality=90)
+        return buffer.getvalue()
+
+    return make
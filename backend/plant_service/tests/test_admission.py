@@ -0,0 +1,45 @@
+"""
+Tests for upstream admission control
+"""
+import asyncio
+
+import pytest
+
+from admission import CANCELLED, AdmissionController, AdmissionRejected
+
+
+def test_token_refunded_when_no_slot_frees_up():
+    async def scenario():
+        # Practically no refill during the test, so only refunds restore tokens
+        admission = AdmissionController(rate=0.01, burst=2, max_concurrency=1, max_queue_wait=0.1)
+        await admission.acquire()
+        with pytest.raises(AdmissionRejected):
+            await admission.acquire()
+        assert admission.bucket.tokens == pytest.approx(1, abs=0.01)
+        assert admission.rejected == 1
+
+        waiter = asyncio.ensure_future(admission.acquire())
+        await asyncio.sleep(0.02)
+        waiter.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await waiter
+        assert admission.bucket.tokens == pytest.approx(1, abs=0.01)
+
+    asyncio.run(scenario())
+
+
+def test_release_adapts_concurrency_limit():
+    async def scenario():
+        admission = AdmissionController(rate=0, max_concurrency=10)
+        await admission.acquire()
+        admission.release(0.1, 503)
+        assert admission.limit == pytest.approx(7)
+        await admission.acquire()
+        admission.release(0.1, CANCELLED)
+        assert admission.limit == pytest.approx(7)
+        await admission.acquire()
+        admission.release(0.1, 200)
+        assert admission.limit == pytest.approx(7 + 1 / 7)
+        assert admission.in_flight == 0
+
+    asyncio.run(scenario())
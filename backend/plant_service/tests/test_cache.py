@@ -0,0 +1,59 @@
+"""
+Tests for the identification result cache
+"""
+import asyncio
+import os
+import time
+
+from cache import IdentificationCache, identification_cache_key
+
+
+def key(index: int) -> str:
+    return identification_cache_key(f"{index:064x}", True, False)
+
+
+def disk_files(path) -> list:
+    return sorted(name for name in os.listdir(path) if name.endswith(".json"))
+
+
+def test_disk_tier_survives_restart(tmp_path):
+    async def scenario():
+        await IdentificationCache(disk_path=str(tmp_path)).set(key(1), {"results": []})
+        cache = IdentificationCache(disk_path=str(tmp_path))
+        assert await cache.get(key(1)) == {"results": []}
+        assert cache.disk_hits == 1
+
+    asyncio.run(scenario())
+
+
+def test_disk_tier_evicts_oldest_entries(tmp_path):
+    async def scenario():
+        cache = IdentificationCache(max_entries=1, disk_path=str(tmp_path), disk_max_entries=10)
+        written = time.time() - 100
+        for index in range(25):
+            await cache.set(key(index), {"index": index})
+            # Distinct modification times, oldest first
+            os.utime(cache._disk_file(key(index)), (written + index, written + index))
+        assert len(disk_files(tmp_path)) <= 10
+        assert cache.disk_evictions >= 15
+        assert await cache.get(key(24)) == {"index": 24}
+        assert await cache.get(key(0)) is None
+
+    asyncio.run(scenario())
+
+
+def test_disk_sweep_removes_expired_entries_first(tmp_path):
+    async def scenario():
+        cache = IdentificationCache(
+            max_entries=1, ttl_seconds=60, disk_path=str(tmp_path), disk_max_entries=5
+        )
+        for index in range(5):
+            await cache.set(key(index), {"index": index})
+            # Written long ago, so expired
+            os.utime(cache._disk_file(key(index)), (1000, 1000))
+        await cache.set(key(5), {"index": 5})
+        assert disk_files(tmp_path) == [os.path.basename(cache._disk_file(key(5)))]
+        assert cache.disk_evictions == 0
+        assert cache.disk_expirations == 5
+
+    asyncio.run(scenario())
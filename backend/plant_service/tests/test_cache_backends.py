@@ -0,0 +1,130 @@
+"""
+Tests for the cache backends
+"""
+import asyncio
+import time
+
+import pytest
+
+from cache_backends import MemoryBackend, MmapBackend, RedisBackend
+
+
+def redis_backend(tmp_path):
+    aioredis = pytest.importorskip("fakeredis.aioredis")
+    return RedisBackend(client=aioredis.FakeRedis())
+
+
+BACKENDS = {
+    "memory": lambda tmp_path: MemoryBackend(max_entries=100),
+    "mmap": lambda tmp_path: MmapBackend(str(tmp_path / "cache.mmap"), slots=64, slot_size=1024),
+    "redis": redis_backend,
+}
+
+
+@pytest.fixture(params=sorted(BACKENDS))
+def backend(request, tmp_path):
+    backend = BACKENDS[request.param](tmp_path)
+    backend.open()
+    yield backend
+    asyncio.run(backend.close())
+
+
+def test_set_get_delete(backend):
+    async def scenario():
+        value = {"id": "plant-1", "probability": 0.9, "names": ["Fern"]}
+        await backend.set("plant-1", value)
+        assert await backend.get("plant-1") == value
+        await backend.delete("plant-1")
+        assert await backend.get("plant-1") is None
+
+    asyncio.run(scenario())
+
+
+def test_entries_expire(backend):
+    async def scenario():
+        await backend.set("short", [1, 2], ttl_seconds=0.05)
+        await backend.set("long", [3, 4], ttl_seconds=60)
+        await asyncio.sleep(0.1)
+        assert await backend.get("short") is None
+        assert await backend.get("long") == [3, 4]
+
+    asyncio.run(scenario())
+
+
+def test_memory_backend_evicts_least_recently_used():
+    async def scenario():
+        backend = MemoryBackend(max_entries=2)
+        await backend.set("a", 1)
+        await backend.set("b", 2)
+        assert await backend.get("a") == 1
+        await backend.set("c", 3)
+        assert await backend.get("b") is None
+        assert await backend.get("a") == 1
+        assert backend.evictions == 1
+
+    asyncio.run(scenario())
+
+
+def test_mmap_backend_is_shared_through_the_file(tmp_path):
+    async def scenario():
+        path = str(tmp_path / "shared.mmap")
+        writer = MmapBackend(path, slots=64, slot_size=1024)
+        reader = MmapBackend(path, slots=64, slot_size=1024)
+        writer.open()
+        reader.open()
+        try:
+            await writer.set("plant-1", {"name": "Fern"}, ttl_seconds=60)
+            assert await reader.get("plant-1") == {"name": "Fern"}
+            # Values larger than a slot are skipped, not truncated
+            await writer.set("big", "x" * 2048)
+            assert await reader.get("big") is None
+            assert writer.oversized == 1
+        finally:
+            await writer.close()
+            await reader.close()
+
+    asyncio.run(scenario())
+
+
+def test_redis_backend_treats_unreachable_server_as_miss():
+    async def scenario():
+        backend = RedisBackend(url="redis://127.0.0.1:1/0", timeout=0.2)
+        backend.open()
+        try:
+            started = time.monotonic()
+            await backend.set("plant-1", 1)
+            assert await backend.get("plant-1") is None
+            assert time.monotonic() - started < 2
+            assert backend.errors == 1
+            assert backend.skipped == 1
+        finally:
+            await backend.close()
+
+    asyncio.run(scenario())
+
+
+def test_mmap_backend_keeps_one_slot_per_key(tmp_path):
+    async def scenario():
+        # One set, so every key shares it
+        backend = MmapBackend(str(tmp_path / "cache.mmap"), slots=4, slot_size=256)
+        backend.open()
+        try:
+            await backend.set("short-lived", 0, ttl_seconds=0.05)
+            await backend.set("plant-1", "old", ttl_seconds=60)
+            await asyncio.sleep(0.1)
+            # The expired slot before the key's slot must not receive a second copy
+            await backend.set("plant-1", "new", ttl_seconds=60)
+            assert await backend.get("plant-1") == "new"
+            await backend.delete("plant-1")
+            assert await backend.get("plant-1") is None
+
+            # Evicting the key's slot must not bring back an older copy
+            await backend.set("plant-1", "old", ttl_seconds=60)
+            await backend.set("plant-1", "new", ttl_seconds=1)
+            for index in range(4):
+                await backend.set(f"other-{index}", index, ttl_seconds=60)
+            assert await backend.get("plant-1") is None
+        finally:
+            await backend.close()
+
+    asyncio.run(scenario())
@@ -0,0 +1,66 @@
+"""
+Tests for streaming upload encoding and the spliced JSON request body
+"""
+import asyncio
+import base64
+import hashlib
+import io
+import os
+
+import orjson
+import pytest
+
+from image_encoding import CHUNK_SIZE, encode_upload, spool_copy, upload_digest
+from plant_id_client import ImageJsonBody
+
+
+def read_body(body: ImageJsonBody) -> bytes:
+    async def collect():
+        return b"".join([bytes(chunk) async for chunk in body])
+
+    return asyncio.run(collect())
+
+
+# Sizes around the chunk size and base64 padding boundaries
+@pytest.mark.parametrize("size", [0, 1, 2, 3, CHUNK_SIZE - 1, CHUNK_SIZE, CHUNK_SIZE + 1, 3 * CHUNK_SIZE + 2])
+def test_encode_upload_matches_base64(size):
+    data = os.urandom(size)
+    upload = io.BytesIO(data)
+    assert encode_upload(upload) == base64.b64encode(data)
+    # The upload is rewound for the next reader
+    assert upload.tell() == 0
+
+
+def test_upload_digest_and_spool_copy():
+    data = os.urandom(CHUNK_SIZE * 2 + 5)
+    upload = io.BytesIO(data)
+    assert upload_digest(upload) == hashlib.sha256(data).hexdigest()
+    copy = spool_copy(upload)
+    assert copy.read() == data
+    assert upload.tell() == 0
+
+
+def test_body_identical_to_orjson():
+    image = encode_upload(io.BytesIO(os.urandom(CHUNK_SIZE + 100)))
+    payload = {"modifiers": ["similar_images"], "plant_details": ["common_names"], "health": "all"}
+    body = ImageJsonBody([image], payload)
+    expected = orjson.dumps({"images": [image.decode("ascii")], **payload})
+    assert read_body(body) == expected
+    assert body.length == len(expected)
+
+
+def test_multi_image_body_identical_to_orjson():
+    images = [encode_upload(io.BytesIO(os.urandom(size))) for size in (10, 1000, 3 * CHUNK_SIZE)]
+    payload = {"plant_details": ["common_names", "taxonomy"]}
+    body = ImageJsonBody(images, payload)
+    expected = orjson.dumps({"images": [image.decode("ascii") for image in images], **payload})
+    assert read_body(body) == expected
+    assert body.length == len(expected)
+    # The body can be sent again (e.g. on a retry)
+    assert read_body(body) == expected
+
+
+def test_body_without_other_fields():
+    image = base64.b64encode(b"plant")
+    body = ImageJsonBody([image], {})
+    assert read_body(body) == orjson.dumps({"images": [image.decode("ascii")]})
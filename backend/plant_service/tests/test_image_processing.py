@@ -0,0 +1,81 @@
+"""
+Tests for image downscaling and recompression
+"""
+import asyncio
+import io
+import os
+
+import pytest
+from PIL import Image
+
+from image_processing import ImagePreprocessor, preprocess_image
+
+
+def image_bytes(size, image_format="PNG", mode="RGB", **options) -> bytes:
+    # Noise compresses badly, so the re-encoded JPEG is clearly smaller
+    image = Image.frombytes(mode, size, os.urandom(size[0] * size[1] * len(mode)))
+    output = io.BytesIO()
+    image.save(output, format=image_format, **options)
+    return output.getvalue()
+
+
+def decode(data: bytes) -> Image.Image:
+    image = Image.open(io.BytesIO(data))
+    image.load()
+    return image
+
+
+def test_large_image_downscaled_and_reencoded():
+    data = image_bytes((800, 400))
+    processed = preprocess_image(data, max_edge=200, quality=80, image_format="JPEG")
+    image = decode(processed)
+    assert image.format == "JPEG"
+    assert image.size == (200, 100)
+    assert len(processed) < len(data)
+
+
+def test_small_image_keeps_its_size():
+    processed = preprocess_image(image_bytes((100, 50), mode="RGBA"), 200, 80, "WEBP")
+    image = decode(processed)
+    assert image.format == "WEBP"
+    assert image.mode == "RGB"
+    assert image.size == (100, 50)
+
+
+def test_invalid_image_rejected():
+    with pytest.raises(OSError):
+        preprocess_image(b"not an image", 200, 80, "JPEG")
+
+
+def test_unsupported_format_rejected():
+    with pytest.raises(ValueError):
+        ImagePreprocessor(image_format="GIF")
+
+
+def test_preprocessor_passes_through_what_it_cannot_shrink():
+    async def scenario():
+        preprocessor = ImagePreprocessor(max_edge=200, quality=80, workers=1)
+        preprocessor.start()
+        try:
+            large = image_bytes((800, 800))
+            assert len(await preprocessor.process(large)) < len(large)
+
+            # Already small and compressed harder than the encoder quality:
+            # re-encoding would not save anything
+            small = image_bytes((4, 4), image_format="JPEG", quality=10)
+            assert await preprocessor.process(small) == small
+
+            # Not decodable: sent as uploaded and left to the upstream to reject
+            assert await preprocessor.process(b"not an image") == b"not an image"
+        finally:
+            preprocessor.close()
+        assert preprocessor.processed == 1
+        assert preprocessor.skipped == 2
+
+    asyncio.run(scenario())
+
+
+def test_disabled_preprocessor_returns_original():
+    preprocessor = ImagePreprocessor(enabled=False)
+    data = image_bytes((800, 800))
+    assert asyncio.run(preprocessor.process(data)) is data
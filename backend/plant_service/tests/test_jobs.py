@@ -0,0 +1,36 @@
+"""
+Tests for the identification job queue
+"""
+import asyncio
+
+import pytest
+
+from jobs import JobManager
+
+
+def validate(manager: JobManager, callback_url: str) -> None:
+    asyncio.run(manager.validate_callback_url(callback_url))
+
+
+def test_callbacks_refused_without_allowed_hosts():
+    with pytest.raises(ValueError, match="disabled"):
+        validate(JobManager(), "https://example.com/hook")
+
+
+def test_callback_host_must_be_allowed():
+    manager = JobManager(callback_hosts=["93.184.216.34"])
+    validate(manager, "https://93.184.216.34/hook")
+    with pytest.raises(ValueError, match="not allowed"):
+        validate(manager, "https://example.org/hook")
+    with pytest.raises(ValueError, match="http or https"):
+        validate(manager, "file:///etc/passwd")
+
+
+@pytest.mark.parametrize("host", [
+    "127.0.0.1", "localhost", "10.0.0.5", "192.168.1.1", "169.254.169.254", "0.0.0.0", "[::1]",
+    "[::ffff:127.0.0.1]",
+])
+def test_callbacks_to_non_public_addresses_refused(host):
+    manager = JobManager(callback_hosts=[host.strip("[]")])
+    with pytest.raises(ValueError, match="non-public"):
+        validate(manager, f"http://{host}:8000/hook")
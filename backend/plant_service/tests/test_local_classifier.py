@@ -0,0 +1,51 @@
+"""
+Tests for routing identifications between the Plant.id API and the local classifier
+"""
+import asyncio
+from typing import Any, Dict
+
+import pytest
+
+import fake_plant_id
+from local_classifier import IdentificationRouter
+from plant_id_client import PlantIdClient, PlantIdError
+
+IMAGE = "aGVsbG8="
+
+
+class SlowLocalClassifier:
+    """Stand-in for LocalClassifier that answers after a delay"""
+
+    def __init__(self, delay: float):
+        self.delay = delay
+
+    async def identify_plant(self, image_base64: Any, **kwargs) -> Dict[str, Any]:
+        await asyncio.sleep(self.delay)
+        return {"suggestions": [], "source": "local"}
+
+
+def race(base_url: str, local_delay: float) -> Dict[str, Any]:
+    async def scenario():
+        async with PlantIdClient(api_key="test", base_url=base_url, http2=False) as client:
+            router = IdentificationRouter(
+                client, local=SlowLocalClassifier(local_delay), policy="race", latency_budget=0.05
+            )
+            return await router.identify_plant(IMAGE)
+
+    return asyncio.run(scenario())
+
+
+def test_race_raises_upstream_client_error_after_budget(fake_upstream):
+    fake_plant_id.faults = fake_plant_id.Faults(latency_ms=200, error_rate=1.0, error_status=400)
+    with pytest.raises(PlantIdError) as error:
+        race(fake_upstream, local_delay=0.5)
+    assert error.value.status_code == 400
+
+
+def test_race_answers_locally_on_upstream_outage(fake_upstream):
+    fake_plant_id.faults = fake_plant_id.Faults(latency_ms=200, error_rate=1.0, error_status=503)
+    assert race(fake_upstream, local_delay=0.5)["source"] == "local"
+
+
+def test_race_prefers_upstream_within_budget(fake_upstream):
+    assert race(fake_upstream, local_delay=0.5)["source"] == "plant_id"
@@ -0,0 +1,135 @@
+"""
+Tests for the non-blocking, sampled JSON logging
+"""
+import io
+import logging
+import logging.handlers
+import queue
+import sys
+import time
+
+import orjson
+import pytest
+
+from logging_config import JsonFormatter, NonBlockingQueueHandler, SamplingFilter
+
+
+class ListHandler(logging.Handler):
+    def __init__(self):
+        super().__init__()
+        self.records = []
+
+    def emit(self, record):
+        self.records.append(record)
+
+
+@pytest.fixture
+def sampled_logger():
+    """A logger whose records go through a SamplingFilter into a list"""
+    def make(window, burst):
+        logger = logging.getLogger(f"test_logging_config.{window}.{burst}")
+        logger.propagate = False
+        logger.setLevel(logging.DEBUG)
+        handler = ListHandler()
+        handler.addFilter(SamplingFilter(window=window, burst=burst))
+        logger.addHandler(handler)
+        loggers.append((logger, handler))
+        return logger, handler.records
+
+    loggers = []
+    yield make
+    for logger, handler in loggers:
+        logger.removeHandler(handler)
+
+
+def log_upstream_error(logger, index):
+    # One call site for every record
+    logger.error(f"upstream failed {index}")
+
+
+def test_errors_sampled_per_call_site(sampled_logger):
+    logger, records = sampled_logger(window=0.2, burst=3)
+    for index in range(10):
+        log_upstream_error(logger, index)
+    # Another call site has its own budget
+    logger.warning("other call site")
+    assert [record.getMessage() for record in records] == [
+        "upstream failed 0", "upstream failed 1", "upstream failed 2", "other call site"
+    ]
+
+    # The first error of the next window reports how many were dropped
+    time.sleep(0.25)
+    for index in range(10, 12):
+        log_upstream_error(logger, index)
+    assert [record.getMessage() for record in records[4:]] == ["upstream failed 10", "upstream failed 11"]
+    assert [getattr(record, "suppressed", 0) for record in records[4:]] == [7, 0]
+
+
+def test_info_records_not_sampled(sampled_logger):
+    logger, records = sampled_logger(window=60, burst=1)
+    for index in range(20):
+        logger.info(f"identified {index}")
+        logger.debug(f"detail {index}")
+    assert len(records) == 40
+
+
+def test_zero_burst_disables_sampling(sampled_logger):
+    logger, records = sampled_logger(window=60, burst=0)
+    for index in range(20):
+        logger.error(f"upstream failed {index}")
+    assert len(records) == 20
+
+
+def test_json_formatter_emits_one_object_per_record():
+    record = logging.makeLogRecord({
+        "name": "plant_id_client", "levelno": logging.ERROR, "levelname": "ERROR",
+        "msg": "Plant.id API error: %s", "args": ("quote \" and\nnewline",),
+        "suppressed": 4, "submission_id": "abc",
+    })
+    line = JsonFormatter().format(record)
+    assert "\n" not in line
+    entry = orjson.loads(line)
+    assert entry["level"] == "ERROR"
+    assert entry["logger"] == "plant_id_client"
+    assert entry["message"] == "Plant.id API error: quote \" and\nnewline"
+    assert entry["suppressed"] == 4
+    assert entry["submission_id"] == "abc"
+    assert entry["time"].endswith("+00:00")
+
+
+def test_json_formatter_includes_exception():
+    try:
+        raise ValueError("bad image")
+    except ValueError:
+        record = logging.LogRecord("main", logging.ERROR, __file__, 1, "failed", None, sys.exc_info())
+    entry = orjson.loads(JsonFormatter().format(record))
+    assert "ValueError: bad image" in entry["exception"]
+
+
+def test_queue_handler_delivers_json_lines_in_background():
+    log_queue = queue.Queue()
+    output = io.StringIO()
+    stream = logging.StreamHandler(output)
+    stream.setFormatter(JsonFormatter())
+    listener = logging.handlers.QueueListener(log_queue, stream)
+    handler = NonBlockingQueueHandler(log_queue, max_message_chars=10)
+    logger = logging.getLogger("test_logging_config.queue")
+    logger.propagate = False
+    logger.addHandler(handler)
+    listener.start()
+    try:
+        logger.warning("short %d", 1)
+        logger.warning("x" * 25)
+    finally:
+        listener.stop()
+        logger.removeHandler(handler)
+    messages = [orjson.loads(line)["message"] for line in output.getvalue().splitlines()]
+    assert messages == ["short 1", "xxxxxxxxxx... [15 chars truncated]"]
+
+
+def test_full_queue_drops_records():
+    handler = NonBlockingQueueHandler(queue.Queue(maxsize=2), max_message_chars=0)
+    for index in range(5):
+        handler.handle(logging.makeLogRecord({"msg": f"record {index}", "levelno": logging.ERROR}))
+    assert handler.queue.qsize() == 2
+    assert handler.dropped == 3
@@ -0,0 +1,232 @@
+"""
+Tests for the plant service API
+"""
+import orjson
+import pytest
+from fastapi import HTTPException
+
+import fake_plant_id
+from main import limit_results, parse_fields
+from plant_id_client import PlantIdError
+
+
+def test_parse_fields():
+    assert parse_fields(None) is None
+    assert parse_fields("common_name, probability,common_name") == ("common_name", "probability")
+
+
+@pytest.mark.parametrize("fields", ["", " ", ",", " , "])
+def test_empty_fields_mean_no_projection(fields):
+    assert parse_fields(fields) is None
+
+
+def test_unknown_fields_rejected():
+    with pytest.raises(HTTPException) as error:
+        parse_fields("common_name,colour")
+    assert error.value.status_code == 400
+    assert "Unknown fields: colour" in error.value.detail
+
+
+RESULT = {
+    "results": [
+        {"id": "a", "common_name": "A", "probability": 0.9},
+        {"id": "b", "common_name": "B", "probability": 0.5},
+        {"id": "c", "common_name": "C", "probability": 0.1},
+    ],
+    "is_plant": True,
+    "submission_id": "1",
+    "source": "plant_id",
+}
+
+
+def test_limit_results_without_limits_returns_result_unchanged():
+    assert limit_results(RESULT, None, None, ("id", "common_name")) is RESULT
+
+
+def test_limit_results_top_k_and_min_probability():
+    limited = limit_results(RESULT, 2, 0.3, None)
+    assert [item["id"] for item in limited["results"]] == ["a", "b"]
+    assert limit_results(RESULT, 1, None, None)["results"] == [RESULT["results"][0]]
+    assert limit_results(RESULT, None, 0.95, None)["results"] == []
+    # The (possibly cached) result is not modified
+    assert len(RESULT["results"]) == 3
+
+
+def test_limit_results_drops_probability_fetched_only_for_filtering():
+    limited = limit_results(RESULT, None, 0.3, ("common_name",))
+    assert limited["results"] == [{"common_name": "A"}, {"common_name": "B"}]
+    assert limited["submission_id"] == "1"
+    assert "common_name" in RESULT["results"][0] and "probability" in RESULT["results"][0]
+
+
+def test_limit_results_projects_full_result():
+    # A full result is projected even when nothing is filtered
+    limited = limit_results(RESULT, None, None, ("id", "probability"), project=True)
+    assert limited["results"] == [
+        {"id": "a", "probability": 0.9}, {"id": "b", "probability": 0.5}, {"id": "c", "probability": 0.1}
+    ]
+
+
+def test_unknown_field_request_rejected_before_upstream(service, fake_upstream, make_jpeg):
+    response = service.post(
+        "/identify",
+        params={"fields": "common_name,colour"},
+        files={"file": ("plant.jpg", make_jpeg(), "image/jpeg")},
+    )
+    assert response.status_code == 400
+    assert "Unknown fields: colour" in response.json()["detail"]
+    assert fake_plant_id.counters["identify"] == 0
+
+
+def test_min_probability_filters_on_unrequested_probability(service, fake_upstream, make_jpeg):
+    response = service.post(
+        "/identify",
+        params={"fields": "common_name", "min_probability": 0.4},
+        files={"file": ("plant.jpg", make_jpeg(), "image/jpeg")},
+    )
+    assert response.status_code == 200
+    assert response.json()["results"] == [{"common_name": "Fake plant 0"}, {"common_name": "Fake plant 1"}]
+
+
+def test_projected_request_served_from_cached_full_result(service, fake_upstream, make_jpeg):
+    image = make_jpeg()
+    full = service.post("/identify", files={"file": ("plant.jpg", image, "image/jpeg")})
+    assert full.status_code == 200
+    identified = fake_plant_id.counters["identify"]
+
+    projected = service.post(
+        "/identify",
+        params={"fields": "scientific_name", "min_probability": 0.25, "top_k": 1},
+        files={"file": ("plant.jpg", image, "image/jpeg")},
+    )
+    assert projected.status_code == 200
+    assert projected.json()["results"] == [{"scientific_name": "Plantae fictus 0"}]
+    assert fake_plant_id.counters["identify"] == identified
+
+
+def test_batch_streams_error_line_for_failing_item(service, fake_upstream, make_jpeg, monkeypatch):
+    import main
+
+    encode_for_upstream = main.encode_for_upstream
+
+    async def encode_or_fail(file):
+        if file.filename == "broken.jpg":
+            raise PlantIdError("Plant.id API error: invalid image", status_code=400)
+        return await encode_for_upstream(file)
+
+    monkeypatch.setattr(main, "encode_for_upstream", encode_or_fail)
+    names = ["fern.jpg", "broken.jpg", "ivy.jpg"]
+    response = service.post(
+        "/identify/batch",
+        files=[("files", (name, make_jpeg(), "image/jpeg")) for name in names],
+    )
+    assert response.status_code == 200
+    assert response.headers["content-type"] == "application/x-ndjson"
+    lines = sorted((orjson.loads(line) for line in response.text.splitlines()), key=lambda item: item["index"])
+    assert [(item["index"], item["filename"], item["status"]) for item in lines] == [
+        (0, "fern.jpg", 200), (1, "broken.jpg", 400), (2, "ivy.jpg", 200)
+    ]
+    assert "invalid image" in lines[1]["error"]
+    assert "result" not in lines[1]
+    assert lines[0]["result"]["results"][0]["id"] == "fake-plant-0"
+    assert fake_plant_id.counters["identify"] == 2
+
+
+def test_several_images_identified_in_one_upstream_call(service, fake_upstream, make_jpeg):
+    response = service.post(
+        "/identify",
+        files=[("file", (f"photo-{index}.jpg", make_jpeg(), "image/jpeg")) for index in range(3)],
+    )
+    assert response.status_code == 200
+    assert fake_plant_id.counters["identify"] == 1
+    assert fake_plant_id.counters["images"] == 3
+
+
+def test_too_many_images_rejected(service, fake_upstream, make_jpeg, monkeypatch):
+    import main
+
+    monkeypatch.setattr(main, "MAX_IMAGES_PER_SUBMISSION", 2)
+    response = service.post(
+        "/identify",
+        files=[("file", (f"photo-{index}.jpg", make_jpeg(), "image/jpeg")) for index in range(3)],
+    )
+    assert response.status_code == 413
+    assert "maximum 2" in response.json()["detail"]
+    assert fake_plant_id.counters["identify"] == 0
+
+
+def metric_samples(text: str) -> dict:
+    samples = {}
+    for line in text.splitlines():
+        if line and not line.startswith("#"):
+            name, _, value = line.rpartition(" ")
+            samples[name] = float(value)
+    return samples
+
+
+def test_metrics_after_identification(service, fake_upstream, make_jpeg):
+    before = metric_samples(service.get("/metrics").text)
+    response = service.post("/identify", files={"file": ("plant.jpg", make_jpeg(), "image/jpeg")})
+    assert response.status_code == 200
+
+    metrics = service.get("/metrics")
+    assert metrics.status_code == 200
+    assert metrics.headers["content-type"].startswith("text/plain; version=0.0.4")
+    assert "# TYPE plant_service_http_request_duration_seconds histogram" in metrics.text
+    samples = metric_samples(metrics.text)
+
+    def increase(name):
+        return samples[name] - before.get(name, 0)
+
+    # Counted by route template and status
+    assert increase('plant_service_http_requests_total{method="POST",route="/identify",status="200"}') == 1
+    assert increase('plant_service_upstream_responses_total{operation="identify",status="200"}') == 1
+
+    # Histogram buckets are cumulative and end with +Inf, which equals _count
+    prefix = 'plant_service_http_request_duration_seconds'
+    labels = 'method="POST",route="/identify"'
+    buckets = [value for name, value in samples.items() if name.startswith(f"{prefix}_bucket{{{labels},")]
+    assert buckets == sorted(buckets)
+    assert samples[f'{prefix}_bucket{{{labels},le="+Inf"}}'] == samples[f"{prefix}_count{{{labels}}}"]
+    assert increase(f"{prefix}_count{{{labels}}}") == 1
+    assert increase(f"{prefix}_sum{{{labels}}}") > 0
+    assert increase('plant_service_stage_duration_seconds_count{stage="encode"}') == 1
+
+
+def test_health_check_requests_minimal_upstream_payload(service, fake_upstream, make_jpeg):
+    response = service.post(
+        "/health-check", params={"top_k": 2}, files={"file": ("plant.jpg", make_jpeg(), "image/jpeg")}
+    )
+    assert response.status_code == 200
+    # Only the common names and the health assessment: no images or care details
+    assert fake_plant_id.last_identify_payload == {
+        "modifiers": [], "plant_details": ["common_names"], "health": "all"
+    }
+    assert response.json() == {
+        "is_plant": True,
+        "is_healthy": False,
+        "disease_name": "leaf spot",
+        "probability": 0.4,
+        "treatment": "Remove affected leaves",
+        "suggestions": [
+            {
+                "id": f"fake-plant-{index}",
+                "scientific_name": f"Plantae fictus {index}",
+                "common_name": f"Fake plant {index}",
+                "probability": probability,
+                "details_url": f"/plant/fake-plant-{index}",
+            }
+            for index, probability in ((0, 0.9), (1, 0.45))
+        ],
+        "submission_id": response.json()["submission_id"],
+        "source": "plant_id",
+    }
+
+
+def test_health_check_reports_upstream_failure(service, fake_upstream, make_jpeg):
+    fake_plant_id.faults = fake_plant_id.Faults(latency_ms=0, error_rate=1.0, error_status=500)
+    response = service.post("/health-check", files={"file": ("plant.jpg", make_jpeg(), "image/jpeg")})
+    assert response.status_code == 500
+    assert "Plant.id API error" in response.json()["detail"]
+    # Not retried, since the identification may have been processed
+    assert fake_plant_id.counters["identify"] == 1
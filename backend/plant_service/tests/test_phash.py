@@ -0,0 +1,110 @@
+"""
+Tests for the perceptual hash index used for near-duplicate lookup
+"""
+import io
+import random
+
+from PIL import Image
+
+import fake_plant_id
+from phash import BKTree, PerceptualIndex, dhash, hamming_distance
+
+
+def reencode(data: bytes, size, quality: int) -> bytes:
+    with Image.open(io.BytesIO(data)) as image:
+        output = io.BytesIO()
+        image.resize(size).save(output, format="JPEG", quality=quality)
+        return output.getvalue()
+
+
+def test_bk_tree_finds_nearest_within_radius():
+    tree = BKTree()
+    for key in (0b0000, 0b0111, 0b1111_0000, 0xFFFF):
+        tree.add(key, hex(key))
+    assert tree.size == 4
+    assert tree.nearest(0b0001, 1) == (1, "0x0")
+    assert tree.nearest(0b0011, 1) == (1, "0x7")
+    assert tree.nearest(0b0011, 2) == (1, "0x7")
+    assert tree.nearest(0b1100_0000, 1) is None
+    assert tree.nearest(0b1100_0000, 2) == (2, "0xf0")
+    # A rejected value is skipped for the next closest one
+    assert tree.nearest(0b0011, 2, accept=lambda value: value != "0x7") == (2, "0x0")
+
+
+def test_bk_tree_replaces_identical_hash():
+    tree = BKTree()
+    tree.add(42, "old")
+    tree.add(42, "new")
+    assert tree.size == 1
+    assert tree.nearest(42, 0) == (0, "new")
+
+
+def test_bk_tree_matches_linear_scan():
+    rng = random.Random(7)
+    keys = [rng.getrandbits(64) for _ in range(500)]
+    tree = BKTree()
+    for key in keys:
+        tree.add(key, key)
+    for key in keys[:50]:
+        # Flip a few bits of an indexed hash
+        query = key
+        for bit in rng.sample(range(64), 3):
+            query ^= 1 << bit
+        expected = min(hamming_distance(query, other) for other in keys)
+        distance, value = tree.nearest(query, 4)
+        assert distance == expected == hamming_distance(query, value)
+
+
+def test_index_lookup_is_per_namespace():
+    index = PerceptualIndex(max_distance=2, workers=1)
+    index.add("health", 0b1010, {"submission_id": "a"})
+    assert index.lookup("health", 0b1011) == (1, {"submission_id": "a"})
+    assert index.lookup("no-health", 0b1010) is None
+    assert index.lookup("health", 0b0101) is None
+    assert (index.hits, index.misses) == (1, 2)
+
+
+def test_index_ignores_expired_entries():
+    index = PerceptualIndex(ttl_seconds=-1, workers=1)
+    index.add("modifiers", 1, {"submission_id": "a"})
+    assert index.lookup("modifiers", 1) is None
+
+
+def test_index_evicts_oldest_entries_when_full():
+    index = PerceptualIndex(max_distance=0, max_entries=8, workers=1)
+    for key in range(9):
+        index.add("modifiers", key, {"submission_id": str(key)})
+    # A quarter of the oldest entries were dropped and the tree rebuilt
+    assert index.rebuilds == 1
+    assert index.stats()["entries"] == 6
+    assert [index.lookup("modifiers", key) is None for key in range(9)] == [True] * 3 + [False] * 6
+    assert index.lookup("modifiers", 8) == (0, {"submission_id": "8"})
+
+
+def test_dhash_survives_recompression(make_jpeg):
+    image = make_jpeg(size=(128, 128))
+    recompressed = reencode(image, (96, 96), quality=50)
+    assert hamming_distance(dhash(image), dhash(recompressed)) <= 4
+    assert hamming_distance(dhash(image), dhash(make_jpeg(size=(128, 128)))) > 4
+
+
+def test_near_duplicate_served_from_index(service, fake_upstream, make_jpeg, monkeypatch):
+    import main
+
+    index = PerceptualIndex(workers=1)
+    monkeypatch.setattr(main, "perceptual_index", index)
+    try:
+        image = make_jpeg(size=(128, 128))
+        first = service.post("/identify", files={"file": ("plant.jpg", image, "image/jpeg")})
+        assert first.status_code == 200
+        assert fake_plant_id.counters["identify"] == 1
+
+        retaken = reencode(image, (96, 96), quality=50)
+        second = service.post("/identify", files={"file": ("plant.jpg", retaken, "image/jpeg")})
+        assert second.status_code == 200
+        assert second.json() == first.json()
+        assert int(second.headers["X-Near-Duplicate-Distance"]) <= index.max_distance
+        assert fake_plant_id.counters["identify"] == 1
+        assert index.hits == 1
+    finally:
+        index.close()
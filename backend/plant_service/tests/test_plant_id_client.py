@@ -0,0 +1,288 @@
+"""
+Tests for the Plant.id API client against the fake Plant.id API
+"""
+import asyncio
+import json
+
+import pytest
+
+import fake_plant_id
+from admission import CANCELLED, AdmissionController
+from benchmarks.transform_bench import legacy_transform, make_response
+from main import IdentificationResponse
+from plant_id_client import CARE_FIELDS, HEALTH_CHECK_FIELDS, PlantIdClient, PlantIdError
+from resilience import MIN_LATENCY_SAMPLES, CircuitBreaker, RetryPolicy
+
+IMAGE = "aGVsbG8="
+
+
+# Raw suggestions covering each branch of the original per-field helpers
+SUGGESTIONS = [
+    {
+        "id": 1,
+        "name": "Top-level common names",
+        "probability": 0.8,
+        "common_names": ["Top name"],
+        "plant_details": {
+            "common_names": ["Details name"],
+            "taxonomy": {"family": "Fictaceae"},
+            "wiki_description": {"value": "A plant."},
+            "watering": {"text": "Water weekly"},
+            "sunlight": ["full sun", "part shade"],
+            "soil": "loam",
+            "propagation": {"method": "cuttings"},
+        },
+        "similar_images": [{"url": "https://example.com/1.jpg"}, {"url": "https://example.com/2.jpg"}],
+    },
+    {
+        "id": "fake-plant-2",
+        "name": "Details common names",
+        "probability": 0.1,
+        "common_names": [],
+        "plant_details": {"common_names": ["Details name"], "taxonomy": {}},
+        "similar_images": [],
+        "health_assessment": {"is_healthy": True, "diseases": []},
+    },
+    {
+        "id": "fake-plant-3",
+        "name": "No common names",
+        "plant_details": {"common_names": None},
+        "health_assessment": {
+            "is_healthy": False,
+            "diseases": [{"name": "leaf spot", "probability": 0.4}],
+        },
+    },
+    {
+        "name": "Bare suggestion",
+        "similar_images": [{"id": "no-url"}],
+        "health_assessment": {"diseases": [{"name": "rust", "treatment": {"overview": "Remove leaves"}}]},
+    },
+]
+
+
+def make_client(base_url: str, **kwargs) -> PlantIdClient:
+    return PlantIdClient(api_key="test", base_url=base_url, http2=False, **kwargs)
+
+
+def fast_retries(max_retries: int = 2) -> RetryPolicy:
+    return RetryPolicy(max_retries=max_retries, base_delay=0.01, max_delay=0.02)
+
+
+def test_client_reuses_pooled_connection(fake_upstream):
+    async def scenario():
+        client = make_client(fake_upstream)
+        # The pool is opened lazily by the first request
+        assert client._http is None
+        for _ in range(3):
+            await client.get_plant_details("plant-1")
+        http = client._http
+        assert http is not None
+        assert len(http._transport._pool.connections) == 1
+        await client.close()
+        assert client._http is None
+        assert http.is_closed
+
+    asyncio.run(scenario())
+    assert fake_plant_id.counters["plants"] == 3
+
+
+def test_identify_plant_transforms_response(fake_upstream):
+    async def scenario():
+        async with make_client(fake_upstream) as client:
+            return await client.identify_plant(IMAGE)
+
+    result = asyncio.run(scenario())
+    assert result["source"] == "plant_id"
+    assert [suggestion["id"] for suggestion in result["results"]] == [
+        "fake-plant-0", "fake-plant-1", "fake-plant-2"
+    ]
+
+
+@pytest.mark.parametrize("result", [
+    {"id": 42, "is_plant": False, "suggestions": SUGGESTIONS},
+    {"suggestions": []},
+    json.loads(make_response(suggestions=3, similar_images=2, description_bytes=100)),
+])
+def test_transform_matches_original_helpers(result):
+    client = make_client("http://unused")
+    # The original output went through the response model before being serialized
+    expected = json.loads(IdentificationResponse(**legacy_transform(result)).json())
+    assert client._transform_identification_result(result) == expected
+
+
+def test_projected_payload_requests_only_needed_details():
+    client = make_client("http://unused")
+    payload = client._projected_payload(("scientific_name", "common_name", "care_info"), True, False)
+    # care_info needs detailed_info, health_assessment was not requested as a field
+    assert payload == {"modifiers": [], "plant_details": ["common_names"]}
+
+    payload = client._projected_payload(("family", "care_info", "image_url"), False, True)
+    assert payload == {"modifiers": ["similar_images"], "plant_details": ["taxonomy", *CARE_FIELDS]}
+
+    payload = client._projected_payload(HEALTH_CHECK_FIELDS, True, False)
+    assert payload == {"modifiers": [], "plant_details": ["common_names"], "health": "all"}
+    assert "health" not in client._projected_payload(HEALTH_CHECK_FIELDS, False, False)
+
+
+def test_projected_identification_returns_only_requested_fields(fake_upstream):
+    async def scenario():
+        async with make_client(fake_upstream) as client:
+            return await client.identify_plant(IMAGE, fields=("id", "family", "image_url"))
+
+    result = asyncio.run(scenario())
+    assert result["results"][0] == {
+        "id": "fake-plant-0", "family": "Fictaceae", "image_url": "https://example.com/images/0-0.jpg"
+    }
+    assert all(set(item) == {"id", "family", "image_url"} for item in result["results"])
+
+
+def test_idempotent_request_is_retried(fake_upstream):
+    async def scenario():
+        async with make_client(fake_upstream, retry_policy=fast_retries()) as client:
+            with pytest.raises(PlantIdError) as error:
+                await client.get_plant_details("plant-1")
+            assert error.value.status_code == 500
+            assert client.retries == 2
+
+    fake_plant_id.faults = fake_plant_id.Faults(latency_ms=0, error_rate=1.0, error_status=500)
+    asyncio.run(scenario())
+    assert fake_plant_id.counters["plants"] == 3
+
+
+def test_identification_not_retried_after_it_may_have_been_processed(fake_upstream):
+    async def scenario():
+        async with make_client(fake_upstream, retry_policy=fast_retries()) as client:
+            with pytest.raises(PlantIdError):
+                await client.identify_plant(IMAGE)
+
+    # A 500 may come after the upstream processed (and billed) the identification
+    fake_plant_id.faults = fake_plant_id.Faults(latency_ms=0, error_rate=1.0, error_status=500)
+    asyncio.run(scenario())
+    assert fake_plant_id.counters["identify"] == 1
+
+    # A 503 means it was not processed, so it is safe to resend
+    fake_plant_id.faults = fake_plant_id.Faults(latency_ms=0, error_rate=1.0, error_status=503)
+    asyncio.run(scenario())
+    assert fake_plant_id.counters["identify"] == 4
+
+
+def test_client_errors_are_not_retried(fake_upstream):
+    async def scenario():
+        async with make_client(fake_upstream, retry_policy=fast_retries()) as client:
+            with pytest.raises(PlantIdError) as error:
+                await client.get_plant_details("plant-1")
+            assert error.value.status_code == 404
+
+    fake_plant_id.faults = fake_plant_id.Faults(latency_ms=0, error_rate=1.0, error_status=404)
+    asyncio.run(scenario())
+    assert fake_plant_id.counters["plants"] == 1
+
+
+def test_breaker_opens_and_fails_fast(fake_upstream):
+    async def scenario():
+        breaker = CircuitBreaker(failure_threshold=3, reset_timeout=60)
+        async with make_client(fake_upstream, circuit_breaker=breaker) as client:
+            for _ in range(5):
+                with pytest.raises(PlantIdError) as error:
+                    await client.get_plant_details("plant-1")
+                assert error.value.status_code == 503
+            assert breaker.state == CircuitBreaker.OPEN
+            assert breaker.rejected == 2
+
+    fake_plant_id.faults = fake_plant_id.Faults(latency_ms=0, error_rate=1.0, error_status=503)
+    asyncio.run(scenario())
+    assert fake_plant_id.counters["plants"] == 3
+
+
+def test_cancelled_hedged_request_stops_both_requests(fake_upstream):
+    async def scenario():
+        admission = AdmissionController(rate=0, max_concurrency=20)
+        async with make_client(fake_upstream, admission=admission, hedge_percentile=50) as client:
+            for _ in range(MIN_LATENCY_SAMPLES):
+                client.latency.record(0.01)
+            fake_plant_id.faults = fake_plant_id.Faults(latency_ms=1000)
+            request = asyncio.ensure_future(client.get_plant_details("plant-1"))
+            await asyncio.sleep(0.2)
+            assert client.hedges == 1
+            assert admission.in_flight == 2
+            request.cancel()
+            with pytest.raises(asyncio.CancelledError):
+                await request
+            # Both upstream requests were cancelled before the caller saw the cancellation
+            assert admission.in_flight == 0
+
+    asyncio.run(scenario())
+
+
+def test_breaker_recovers_after_cancelled_trial(fake_upstream):
+    async def scenario():
+        breaker = CircuitBreaker(failure_threshold=2, reset_timeout=0.2)
+        admission = AdmissionController(rate=0, max_concurrency=1)
+        async with make_client(fake_upstream, admission=admission, circuit_breaker=breaker) as client:
+            # Open the circuit
+            fake_plant_id.faults = fake_plant_id.Faults(latency_ms=0, error_rate=1.0, error_status=503)
+            for _ in range(2):
+                with pytest.raises(PlantIdError):
+                    await client.get_plant_details("plant-1")
+            assert breaker.state == CircuitBreaker.OPEN
+            with pytest.raises(PlantIdError, match="circuit open"):
+                await client.get_plant_details("plant-1")
+
+            # Half-open: the trial request is cancelled while queued for admission
+            await asyncio.sleep(0.25)
+            await admission.acquire()
+            trial = asyncio.ensure_future(client.get_plant_details("plant-1"))
+            await asyncio.sleep(0.05)
+            assert breaker.state == CircuitBreaker.HALF_OPEN
+            trial.cancel()
+            with pytest.raises(asyncio.CancelledError):
+                await trial
+            admission.release(0.0, 200)
+
+            # The next request becomes the new trial and closes the circuit
+            fake_plant_id.faults = fake_plant_id.Faults(latency_ms=0)
+            details = await client.get_plant_details("plant-1")
+            assert details["id"] == "plant-1"
+            assert breaker.state == CircuitBreaker.CLOSED
+
+    asyncio.run(scenario())
+
+
+def test_cancelled_request_leaves_concurrency_limit_unchanged(fake_upstream):
+    async def scenario():
+        admission = AdmissionController(rate=0, max_concurrency=20)
+        async with make_client(fake_upstream, admission=admission) as client:
+            fake_plant_id.faults = fake_plant_id.Faults(latency_ms=1000)
+            request = asyncio.ensure_future(client.get_plant_details("plant-1"))
+            await asyncio.sleep(0.1)
+            assert admission.in_flight == 1
+            request.cancel()
+            with pytest.raises(asyncio.CancelledError):
+                await request
+        assert admission.in_flight == 0
+        assert admission.limit == 20
+        assert admission.failures == 0
+
+    asyncio.run(scenario())
+
+
+def test_rejected_request_keeps_other_requests_trial(fake_upstream):
+    async def scenario():
+        breaker = CircuitBreaker(failure_threshold=1, reset_timeout=0.05)
+        admission = AdmissionController(rate=0, max_concurrency=1, max_queue_wait=0.2)
+        async with make_client(fake_upstream, admission=admission, circuit_breaker=breaker) as client:
+            await admission.acquire()
+            # Let through while the circuit is closed, then queued for admission
+            queued = asyncio.ensure_future(client.get_plant_details("plant-1"))
+            await asyncio.sleep(0.01)
+            breaker.record_failure()
+            await asyncio.sleep(0.06)
+            # Another request takes the half-open trial
+            assert breaker.allow()
+            with pytest.raises(PlantIdError, match="Service busy"):
+                await queued
+            # The rejected request must not have given back the other request's trial
+            assert not breaker.allow()
+            admission.release(0.0, CANCELLED)
+
+    asyncio.run(scenario())
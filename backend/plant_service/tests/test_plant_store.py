@@ -0,0 +1,30 @@
+"""
+Tests for the plant details store
+"""
+import asyncio
+
+from plant_store import PlantDetailsStore
+
+
+def test_details_persist_in_default_data_directory(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+
+    async def fetch():
+        return {"id": "plant-1", "common_name": "Fern"}
+
+    async def scenario():
+        store = PlantDetailsStore()
+        assert await store.get("plant-1", fetch) == {"id": "plant-1", "common_name": "Fern"}
+        await store.close()
+
+        # A new store (e.g. after a restart) is served from the database file
+        async def fail():
+            raise AssertionError("fetched again")
+
+        store = PlantDetailsStore()
+        assert await store.get("plant-1", fail) == {"id": "plant-1", "common_name": "Fern"}
+        assert store.store_hits == 1
+        await store.close()
+
+    asyncio.run(scenario())
+    assert (tmp_path / "data" / "plant_details.db").exists()
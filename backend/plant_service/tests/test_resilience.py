@@ -0,0 +1,64 @@
+"""
+Tests for the retry policy, latency tracker and circuit breaker
+"""
+import time
+
+from resilience import MIN_LATENCY_SAMPLES, CircuitBreaker, LatencyTracker, RetryPolicy
+
+
+def test_retry_delays_stay_within_bounds():
+    policy = RetryPolicy(max_retries=5, base_delay=0.1, max_delay=1.0)
+    for _ in range(200):
+        delay = None
+        for _ in range(policy.max_retries):
+            previous = delay
+            delay = policy.next_delay(previous)
+            assert 0.1 <= delay <= 1.0
+            assert delay <= max(0.1, (previous or 0.1) * 3)
+
+
+def test_latency_percentile_needs_enough_samples():
+    tracker = LatencyTracker(window=100)
+    for index in range(MIN_LATENCY_SAMPLES - 1):
+        tracker.record(index / 100)
+    assert tracker.percentile(95) is None
+    tracker.record(0.5)
+    assert tracker.percentile(50) == 0.1
+    assert tracker.percentile(100) == 0.5
+
+
+def test_latency_window_drops_old_samples():
+    tracker = LatencyTracker(window=MIN_LATENCY_SAMPLES)
+    for _ in range(MIN_LATENCY_SAMPLES):
+        tracker.record(10.0)
+    for _ in range(MIN_LATENCY_SAMPLES):
+        tracker.record(0.1)
+    assert tracker.percentile(99) == 0.1
+
+
+def test_breaker_cycle():
+    breaker = CircuitBreaker(failure_threshold=2, reset_timeout=0.05)
+    assert breaker.allow()
+    breaker.record_failure()
+    assert breaker.state == CircuitBreaker.CLOSED
+    breaker.record_failure()
+    assert breaker.state == CircuitBreaker.OPEN
+    assert not breaker.allow()
+
+    time.sleep(0.06)
+    # Half-open: a single trial at a time
+    assert breaker.allow()
+    assert breaker.state == CircuitBreaker.HALF_OPEN
+    assert not breaker.allow()
+    # A failed trial opens the circuit again
+    breaker.record_failure()
+    assert breaker.state == CircuitBreaker.OPEN
+
+    time.sleep(0.06)
+    assert breaker.allow()
+    breaker.abandon()
+    # An abandoned trial lets the next request try
+    assert breaker.allow()
+    breaker.record_success()
+    assert breaker.state == CircuitBreaker.CLOSED
+    assert breaker.stats()["times_opened"] == 2
@@ -0,0 +1,114 @@
+"""
+Tests for request coalescing
+"""
+import asyncio
+
+import pytest
+
+from singleflight import SingleFlight
+
+
+def test_concurrent_callers_share_one_execution():
+    async def scenario():
+        flight = SingleFlight()
+        calls = 0
+
+        async def fetch():
+            nonlocal calls
+            calls += 1
+            await asyncio.sleep(0.05)
+            return {"id": "plant-1"}
+
+        results = await asyncio.gather(*(flight.do("plant-1", fetch) for _ in range(5)))
+        assert calls == 1
+        assert all(result is results[0] for result in results)
+        assert flight.stats() == {"in_flight": 0, "executions": 1, "coalesced": 4, "abandoned": 0}
+
+        # Once finished, the next call runs again
+        await flight.do("plant-1", fetch)
+        assert calls == 2
+
+    asyncio.run(scenario())
+
+
+def test_different_keys_run_separately():
+    async def scenario():
+        flight = SingleFlight()
+
+        async def fetch(value):
+            await asyncio.sleep(0.01)
+            return value
+
+        results = await asyncio.gather(
+            flight.do("a", lambda: fetch("a")), flight.do("b", lambda: fetch("b"))
+        )
+        assert results == ["a", "b"]
+        assert flight.executions == 2
+
+    asyncio.run(scenario())
+
+
+def test_error_reaches_every_waiter():
+    async def scenario():
+        flight = SingleFlight()
+
+        async def fail():
+            await asyncio.sleep(0.02)
+            raise ValueError("upstream failed")
+
+        results = await asyncio.gather(
+            *(flight.do("plant-1", fail) for _ in range(3)), return_exceptions=True
+        )
+        assert [str(result) for result in results] == ["upstream failed"] * 3
+        assert all(isinstance(result, ValueError) for result in results)
+        assert flight.in_flight() == 0
+
+    asyncio.run(scenario())
+
+
+def test_cancelling_first_waiter_keeps_call_for_others():
+    async def scenario():
+        flight = SingleFlight()
+        calls = 0
+
+        async def fetch():
+            nonlocal calls
+            calls += 1
+            await asyncio.sleep(0.05)
+            return "details"
+
+        first = asyncio.ensure_future(flight.do("plant-1", fetch))
+        await asyncio.sleep(0)
+        second = asyncio.ensure_future(flight.do("plant-1", fetch))
+        await asyncio.sleep(0.01)
+        first.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await first
+        assert await second == "details"
+        assert calls == 1
+        assert flight.abandoned == 0
+
+    asyncio.run(scenario())
+
+
+def test_call_cancelled_when_every_waiter_is_gone():
+    async def scenario():
+        flight = SingleFlight()
+        finished = False
+
+        async def fetch():
+            nonlocal finished
+            await asyncio.sleep(0.05)
+            finished = True
+
+        waiter = asyncio.ensure_future(flight.do("plant-1", fetch))
+        await asyncio.sleep(0.01)
+        waiter.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await waiter
+        await asyncio.sleep(0.1)
+        assert not finished
+        assert flight.abandoned == 1
+        assert flight.in_flight() == 0
+
+    asyncio.run(scenario())